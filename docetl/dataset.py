@@ -5,6 +5,7 @@ from typing import Any, Callable, Dict, List, Literal, Optional, Union
 from pydantic import BaseModel
 
 from docetl.base_schemas import ParsingTool
+from docetl.operations.utils import load_function
 from docetl.parsing_tools import get_parser, get_parsing_tools
 
 
@@ -272,15 +273,14 @@ class Dataset:
                     self.user_defined_parsing_tool_map
                     and tool["function"] in self.user_defined_parsing_tool_map
                 ):
-                    # Define the custom function in the current scope
-                    exec(
+                    func = load_function(
                         "from typing import List, Dict\n"
                         + self.user_defined_parsing_tool_map[
                             tool["function"]
-                        ].function_code
+                        ].function_code,
+                        tool["function"],
+                        globals(),
                     )
-                    # Get the function object
-                    func = locals()[tool["function"]]
                 else:
                     raise ValueError(
                         f"Parsing tool {tool['function']} not found. Please define it or use one of our existing parsing tools: {get_parsing_tools()}"
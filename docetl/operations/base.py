@@ -3,7 +3,7 @@ The BaseOperation class is an abstract base class for all operations in the doce
 """
 
 from abc import ABC, ABCMeta, abstractmethod
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 import jsonschema
 from pydantic import BaseModel
@@ -11,6 +11,7 @@ from rich.console import Console
 from rich.status import Status
 
 from docetl.console import DOCETL_CONSOLE
+from docetl.operations.utils import split_prompt_message
 
 
 # FIXME: This should probably live in some utils module?
@@ -146,3 +147,20 @@ class BaseOperation(ABC, metaclass=BaseOperationMeta):
             raise ValueError(
                 "'validation_prompt' in 'gleaning' configuration cannot be empty"
             )
+
+    def prompt_message(self, template: str, prompt: str) -> Dict[str, Any]:
+        """
+        Wraps a prompt rendered from `template` in a user message. When the
+        pipeline enables `prompt_caching`, the template's static prefix becomes a
+        separate content block that providers can cache across documents.
+
+        Args:
+            template (str): The Jinja2 template the prompt was rendered from.
+            prompt (str): The rendered prompt.
+
+        Returns:
+            Dict[str, Any]: The user message.
+        """
+        if self.runner.config.get("prompt_caching", False):
+            return split_prompt_message(template, prompt)
+        return {"role": "user", "content": prompt}
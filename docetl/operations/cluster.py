@@ -1,12 +1,20 @@
+import math
+import queue
 from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Tuple
 
 import numpy as np
-from jinja2 import Template
 
 from .base import BaseOperation
-from .clustering_utils import get_embeddings_for_clustering
-from .utils import RichLoopBar, strict_render
+from .clustering_utils import (
+    get_embeddings_for_clustering,
+    hnsw_neighbors,
+    knn_graph_merges,
+    two_level_merges,
+)
+from .utils import RichLoopBar, compile_template, strict_render
+
+CLUSTERING_METHODS = ["agglomerative", "kmeans", "birch", "hnsw"]
 
 
 class ClusterOperation(BaseOperation):
@@ -50,7 +58,7 @@ class ClusterOperation(BaseOperation):
 
         # Check if the prompt is a valid Jinja2 template
         try:
-            Template(self.config["summary_prompt"])
+            compile_template(self.config["summary_prompt"])
         except Exception as e:
             raise ValueError(f"Invalid Jinja2 template in 'prompt': {str(e)}")
 
@@ -63,6 +71,15 @@ class ClusterOperation(BaseOperation):
             if not isinstance(self.config["embedding_model"], str):
                 raise TypeError("'embedding_model' must be a string")
 
+        method = self.config.get("clustering_method", "agglomerative")
+        if method not in CLUSTERING_METHODS:
+            raise ValueError(f"'clustering_method' must be one of {CLUSTERING_METHODS}")
+
+        for key in ["leaf_cluster_size", "num_neighbors"]:
+            if key in self.config:
+                if not isinstance(self.config[key], int) or self.config[key] <= 0:
+                    raise ValueError(f"'{key}' must be a positive integer")
+
         if "model" in self.config:
             if not isinstance(self.config["model"], str):
                 raise TypeError("'model' must be a string")
@@ -101,17 +118,62 @@ class ClusterOperation(BaseOperation):
             input_data, self.config, self.runner.api
         )
 
-        tree = self.agglomerative_cluster_of_embeddings(input_data, embeddings)
+        tree = self.cluster_tree(input_data, embeddings)
 
         if "collapse" in self.config:
             tree = self.collapse_tree(tree, collapse=self.config["collapse"])
 
-        self.prompt_template = Template(self.config["summary_prompt"])
+        self.prompt_template = compile_template(self.config["summary_prompt"])
         cost += self.annotate_clustering_tree(tree)
         self.annotate_leaves(tree)
 
         return input_data, cost
 
+    def cluster_tree(self, input_data, embeddings):
+        """
+        Builds a binary cluster tree over the items with the configured clustering method.
+
+        "agglomerative" clusters all embeddings exactly, which takes quadratic time
+        and memory. "kmeans" and "birch" first split the embeddings into flat
+        clusters of about `leaf_cluster_size` items, cluster the items of each one
+        exactly, and then join the clusters by their centroids. "hnsw" builds a
+        single-linkage tree from the `num_neighbors` approximate nearest neighbors
+        of each embedding.
+
+        Args:
+            input_data (List[Dict]): The items to cluster.
+            embeddings (List[List[float]]): The embedding of each item.
+
+        Returns:
+            Dict: The root of the tree.
+        """
+        method = self.config.get("clustering_method", "agglomerative")
+        if method == "agglomerative":
+            return self.agglomerative_cluster_of_embeddings(input_data, embeddings)
+
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if method == "hnsw":
+            children, distances = knn_graph_merges(
+                *hnsw_neighbors(embeddings, self.config.get("num_neighbors", 10))
+            )
+        else:
+            import sklearn.cluster
+
+            num_clusters = math.ceil(
+                len(embeddings) / self.config.get("leaf_cluster_size", 100)
+            )
+            flat = sklearn.cluster.MiniBatchKMeans(
+                n_clusters=num_clusters, random_state=42, n_init=3
+            )
+            if method == "birch":
+                # Group BIRCH's subclusters with k-means too, as agglomerative
+                # clustering of many subclusters would be quadratic again
+                flat = sklearn.cluster.Birch(n_clusters=flat)
+            labels = flat.fit_predict(embeddings)
+            children, distances = two_level_merges(embeddings, labels)
+
+        return self.build_tree(input_data, children, distances)
+
     def agglomerative_cluster_of_embeddings(self, input_data, embeddings):
         import sklearn.cluster
 
@@ -120,67 +182,78 @@ class ClusterOperation(BaseOperation):
         )
         cl.fit(embeddings)
 
-        nsamples = len(embeddings)
+        return self.build_tree(input_data, cl.children_, cl.distances_)
 
-        def build_tree(i):
-            if i < nsamples:
-                res = input_data[i]
-                #                res["embedding"] = list(embeddings[i])
-                return res
-            return {
-                "children": [
-                    build_tree(cl.children_[i - nsamples, 0]),
-                    build_tree(cl.children_[i - nsamples, 1]),
-                ],
-                "distance": cl.distances_[i - nsamples],
-            }
+    def build_tree(self, leaves, children, distances):
+        """
+        Builds a cluster tree from the merges of an agglomerative clustering.
 
-        return build_tree(nsamples + len(cl.children_) - 1)
+        Merge i joins the nodes children[i] and creates node len(leaves) + i, where
+        nodes below len(leaves) are the leaves themselves. A merge only refers to
+        earlier nodes, so the tree is built in one pass over the merges, without
+        recursion.
+
+        Args:
+            leaves (List[Dict]): The clustered items.
+            children (array-like): The pair of nodes joined by each merge.
+            distances (array-like): The distance at which each merge happened.
+
+        Returns:
+            Dict: The root of the tree.
+        """
+        nodes = list(leaves)
+        for (left, right), distance in zip(children, distances):
+            nodes.append(
+                {"children": [nodes[left], nodes[right]], "distance": distance}
+            )
+        return nodes[-1]
 
     def get_tree_distances(self, t):
         res = set()
-        if "distance" in t:
-            res.update(
-                set(
-                    [
-                        t["distance"] - child["distance"]
-                        for child in t["children"]
-                        if "distance" in child
-                    ]
+        stack = [t]
+        while stack:
+            node = stack.pop()
+            if "children" not in node:
+                continue
+            if "distance" in node:
+                res.update(
+                    node["distance"] - child["distance"]
+                    for child in node["children"]
+                    if "distance" in child
                 )
-            )
-        if "children" in t:
-            for child in t["children"]:
-                res.update(self.get_tree_distances(child))
+            stack.extend(node["children"])
         return res
 
-    def _collapse_tree(self, t, parent_dist=None, collapse=None):
-        if "children" in t:
-            if (
-                "distance" in t
+    def _collapse_tree(self, t, collapse=None):
+        # Each entry is a node, the distance of its closest kept ancestor, and the
+        # children list of that ancestor's copy. Children are pushed in reverse,
+        # so nodes are appended to their new parents in their original order.
+        root = []
+        stack = [(t, None, root)]
+        while stack:
+            node, parent_dist, siblings = stack.pop()
+            if "children" not in node:
+                siblings.append(node)
+            elif (
+                "distance" in node
                 and parent_dist is not None
                 and collapse is not None
-                and parent_dist - t["distance"] < collapse
+                and parent_dist - node["distance"] < collapse
             ):
-                return [
-                    grandchild
-                    for child in t["children"]
-                    for grandchild in self._collapse_tree(
-                        child, parent_dist=parent_dist, collapse=collapse
-                    )
-                ]
+                # Too close to its parent: replace the node with its children
+                stack.extend(
+                    (child, parent_dist, siblings)
+                    for child in reversed(node["children"])
+                )
             else:
-                res = dict(t)
-                res["children"] = [
-                    grandchild
-                    for idx, child in enumerate(t["children"])
-                    for grandchild in self._collapse_tree(
-                        child, parent_dist=t["distance"], collapse=collapse
-                    )
-                ]
-                return [res]
-        else:
-            return [t]
+                res = dict(node)
+                res["children"] = []
+                siblings.append(res)
+                stack.extend(
+                    (child, node["distance"], res["children"])
+                    for child in reversed(node["children"])
+                )
+        return root
 
     def collapse_tree(self, tree, collapse=None):
         if collapse is not None:
@@ -188,75 +261,125 @@ class ClusterOperation(BaseOperation):
             collapse = tree_distances[int(len(tree_distances) * collapse)]
         return self._collapse_tree(tree, collapse=collapse)[0]
 
-    def annotate_clustering_tree(self, t):
-        if "children" in t:
-            with ThreadPoolExecutor(max_workers=self.max_batch_size) as executor:
-                futures = [
-                    executor.submit(self.annotate_clustering_tree, child)
-                    for child in t["children"]
-                ]
-
-                total_cost = 0
-                pbar = RichLoopBar(
-                    range(len(futures)),
-                    desc=f"Processing {self.config['name']} (map) on all documents",
-                    console=self.console,
-                )
-                for i in pbar:
-                    total_cost += futures[i].result()
-                    pbar.update(i)
-
-            prompt = strict_render(self.prompt_template, {"inputs": t["children"]})
-
-            def validation_fn(response: Dict[str, Any]):
-                output = self.runner.api.parse_llm_response(
-                    response,
-                    schema=self.config["summary_schema"],
-                    manually_fix_errors=self.manually_fix_errors,
-                )[0]
-                if self.runner.api.validate_output(self.config, output, self.console):
-                    return output, True
-                return output, False
-
-            response = self.runner.api.call_llm(
-                model=self.config.get("model", self.default_model),
-                op_type="cluster",
-                messages=[{"role": "user", "content": prompt}],
-                output_schema=self.config["summary_schema"],
-                timeout_seconds=self.config.get("timeout", 120),
-                bypass_cache=self.config.get("bypass_cache", False),
-                max_retries_per_timeout=self.config.get("max_retries_per_timeout", 2),
-                validation_config=(
-                    {
-                        "num_retries": self.num_retries_on_validate_failure,
-                        "val_rule": self.config.get("validate", []),
-                        "validation_fn": validation_fn,
-                    }
-                    if self.config.get("validate", None)
-                    else None
-                ),
-                verbose=self.config.get("verbose", False),
-                litellm_completion_kwargs=self.config.get(
-                    "litellm_completion_kwargs", {}
-                ),
+    def annotate_clustering_tree(self, tree):
+        """
+        Summarizes every internal node of the tree from its children, bottom-up.
+
+        All nodes run on one pool of at most max_threads (and max_batch_size)
+        workers. A node is dispatched as soon as all of its children are
+        summarized, so every node that is ready runs concurrently, whatever its
+        depth.
+
+        Args:
+            tree (Dict): The root of the cluster tree.
+
+        Returns:
+            float: The total cost of the summaries.
+        """
+        # Find the parent of every internal node and count its internal children
+        parents = {}
+        waiting = {}
+        ready = []
+        stack = [tree] if "children" in tree else []
+        while stack:
+            node = stack.pop()
+            internal_children = [
+                child for child in node["children"] if "children" in child
+            ]
+            waiting[id(node)] = len(internal_children)
+            for child in internal_children:
+                parents[id(child)] = node
+            if not internal_children:
+                ready.append(node)
+            stack.extend(internal_children)
+
+        def annotate(node):
+            return node, self.annotate_node(node)
+
+        total_cost = 0
+        done = queue.Queue()
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_batch_size, self.max_threads)
+        ) as executor:
+            for node in ready:
+                executor.submit(annotate, node).add_done_callback(done.put)
+
+            pbar = RichLoopBar(
+                range(len(waiting)),
+                desc=f"Processing {self.config['name']} (cluster) on all nodes",
+                console=self.console,
             )
-            total_cost += response.total_cost
-            if response.validated:
-                output = self.runner.api.parse_llm_response(
-                    response.response,
-                    schema=self.config["summary_schema"],
-                    manually_fix_errors=self.manually_fix_errors,
-                )[0]
-                t.update(output)
-
-            return total_cost
-        return 0
+            for _ in pbar:
+                node, cost = done.get().result()
+                total_cost += cost
+                parent = parents.get(id(node))
+                if parent is None:
+                    continue
+                waiting[id(parent)] -= 1
+                if waiting[id(parent)] == 0:
+                    executor.submit(annotate, parent).add_done_callback(done.put)
+
+        return total_cost
+
+    def annotate_node(self, t):
+        """
+        Summarizes an internal node of the tree from its (already summarized) children.
+
+        Args:
+            t (Dict): The node to summarize; it is updated with the summary.
+
+        Returns:
+            float: The cost of the summary.
+        """
+        prompt = strict_render(self.prompt_template, {"inputs": t["children"]})
+
+        def validation_fn(response: Dict[str, Any]):
+            output = self.runner.api.parse_llm_response(
+                response,
+                schema=self.config["summary_schema"],
+                manually_fix_errors=self.manually_fix_errors,
+            )[0]
+            if self.runner.api.validate_output(self.config, output, self.console):
+                return output, True
+            return output, False
+
+        response = self.runner.api.call_llm(
+            model=self.config.get("model", self.default_model),
+            op_type="cluster",
+            messages=[self.prompt_message(self.config["summary_prompt"], prompt)],
+            output_schema=self.config["summary_schema"],
+            timeout_seconds=self.config.get("timeout", 120),
+            bypass_cache=self.config.get("bypass_cache", False),
+            max_retries_per_timeout=self.config.get("max_retries_per_timeout", 2),
+            validation_config=(
+                {
+                    "num_retries": self.num_retries_on_validate_failure,
+                    "val_rule": self.config.get("validate", []),
+                    "validation_fn": validation_fn,
+                }
+                if self.config.get("validate", None)
+                else None
+            ),
+            verbose=self.config.get("verbose", False),
+            litellm_completion_kwargs=self.config.get("litellm_completion_kwargs", {}),
+        )
+        if response.validated:
+            output = self.runner.api.parse_llm_response(
+                response.response,
+                schema=self.config["summary_schema"],
+                manually_fix_errors=self.manually_fix_errors,
+            )[0]
+            t.update(output)
+
+        return response.total_cost
 
     def annotate_leaves(self, tree, path=()):
-        if "children" in tree:
-            item = dict(tree)
-            item.pop("children")
-            for child in tree["children"]:
-                self.annotate_leaves(child, path=(item,) + path)
-        else:
-            tree[self.config.get("output_key", "clusters")] = path
+        stack = [(tree, path)]
+        while stack:
+            node, node_path = stack.pop()
+            if "children" in node:
+                item = dict(node)
+                item.pop("children")
+                stack.extend((child, (item,) + node_path) for child in node["children"])
+            else:
+                node[self.config.get("output_key", "clusters")] = node_path
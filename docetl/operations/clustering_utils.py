@@ -6,7 +6,9 @@ We use these in map and reduce operations.
 
 from typing import Dict, List, Tuple
 
-from docetl.operations.utils import APIWrapper
+import numpy as np
+
+from docetl.operations.utils import APIWrapper, UnionFind
 from docetl.utils import completion_cost
 
 
@@ -81,14 +83,158 @@ def cluster_documents(
         documents, sampling_config, api_wrapper
     )
 
+    clusters = cluster_embeddings(embeddings, sample_size)
+    return {
+        label: [documents[idx] for idx in indices]
+        for label, indices in clusters.items()
+    }, cost
+
+
+def cluster_embeddings(
+    embeddings: List[List[float]], num_clusters: int
+) -> Dict[int, List[int]]:
+    """
+    Cluster embeddings using KMeans clustering algorithm.
+
+    Args:
+        embeddings (List[List[float]]): The embeddings to cluster.
+        num_clusters (int): The number of clusters to create; capped at the number of embeddings.
+    Returns:
+        Dict[int, List[int]]: A dictionary of clusters, where each cluster is a list of positions in embeddings.
+    """
     from sklearn.cluster import KMeans
 
-    num_clusters = min(sample_size, len(documents))
+    num_clusters = min(num_clusters, len(embeddings))
     kmeans = KMeans(n_clusters=num_clusters, random_state=42)
     cluster_labels = kmeans.fit_predict(embeddings)
 
     clusters = {i: [] for i in range(num_clusters)}
     for idx, label in enumerate(cluster_labels):
-        clusters[label].append(documents[idx])
+        clusters[label].append(idx)
+
+    return clusters
+
+
+class MergeTree:
+    """
+    Collects the merges of a hierarchical clustering in the format of
+    sklearn's AgglomerativeClustering: merge i joins the nodes children[i] into
+    node n + i, where nodes below n are the clustered points.
 
-    return clusters, cost
+    Merge distances are raised to at least those of the merged nodes, so they
+    never decrease from a node to its parent.
+    """
+
+    def __init__(self, n: int):
+        self.n = n
+        self.children: List[Tuple[int, int]] = []
+        self.distances: List[float] = []
+        self.heights: List[float] = [0.0] * n
+
+    def add(self, left: int, right: int, distance: float) -> int:
+        distance = max(float(distance), self.heights[left], self.heights[right])
+        self.children.append((left, right))
+        self.distances.append(distance)
+        self.heights.append(distance)
+        return self.n + len(self.children) - 1
+
+    def agglomerate(self, nodes: List[int], vectors: np.ndarray) -> int:
+        """
+        Joins nodes by exact agglomerative clustering of their vectors, and returns the node that joins all of them.
+        """
+        if len(nodes) == 1:
+            return nodes[0]
+
+        from sklearn.cluster import AgglomerativeClustering
+
+        cl = AgglomerativeClustering(compute_full_tree=True, compute_distances=True)
+        cl.fit(vectors)
+        nodes = list(nodes)
+        for (left, right), distance in zip(cl.children_, cl.distances_):
+            nodes.append(self.add(nodes[left], nodes[right], distance))
+        return nodes[-1]
+
+
+def two_level_merges(
+    embeddings: np.ndarray, labels: np.ndarray
+) -> Tuple[List[Tuple[int, int]], List[float]]:
+    """
+    Builds a hierarchy from a flat clustering: the points of each cluster are
+    joined by agglomerative clustering, and then the clusters are joined by
+    agglomerative clustering of their centroids. Each step only compares the
+    points of one cluster, or the centroids, instead of all pairs of points.
+    """
+    merges = MergeTree(len(embeddings))
+    order = np.argsort(labels, kind="stable")
+    clusters = np.split(order, np.flatnonzero(np.diff(labels[order])) + 1)
+
+    roots = []
+    centroids = []
+    for members in clusters:
+        roots.append(merges.agglomerate(members.tolist(), embeddings[members]))
+        centroids.append(embeddings[members].mean(axis=0))
+    merges.agglomerate(roots, np.array(centroids))
+
+    return merges.children, merges.distances
+
+
+def hnsw_neighbors(
+    embeddings: np.ndarray, num_neighbors: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Finds the approximate nearest neighbors of every embedding with an HNSW index.
+    Returns the neighbor indices and their euclidean distances.
+    """
+    try:
+        import hnswlib
+    except ImportError:
+        raise ImportError(
+            "The 'hnsw' clustering method requires hnswlib. Install it with `pip install docetl[clustering]`."
+        )
+
+    n, dim = embeddings.shape
+    index = hnswlib.Index(space="l2", dim=dim)
+    index.init_index(max_elements=n, ef_construction=200, M=16)
+    index.add_items(embeddings, np.arange(n))
+    k = min(num_neighbors + 1, n)
+    index.set_ef(max(2 * k, 50))
+    neighbors, distances = index.knn_query(embeddings, k=k)
+    # hnswlib reports squared euclidean distances
+    return neighbors, np.sqrt(distances)
+
+
+def knn_graph_merges(
+    neighbors: np.ndarray, distances: np.ndarray
+) -> Tuple[List[Tuple[int, int]], List[float]]:
+    """
+    Builds a single-linkage hierarchy from a nearest neighbor graph, by merging
+    the components joined by each edge in order of increasing distance.
+    Components the graph leaves disconnected are joined at the largest distance.
+    """
+    n = len(neighbors)
+    sources = np.repeat(np.arange(n), neighbors.shape[1])
+    targets = neighbors.ravel()
+    weights = distances.ravel()
+    edges = np.flatnonzero(sources != targets)
+    edges = edges[np.argsort(weights[edges], kind="stable")]
+
+    merges = MergeTree(n)
+    union_find = UnionFind(n)
+    # The tree node of the component with each root
+    component_nodes = list(range(n))
+    for edge in edges:
+        root1 = union_find.find(sources[edge])
+        root2 = union_find.find(targets[edge])
+        if root1 == root2:
+            continue
+        node = merges.add(component_nodes[root1], component_nodes[root2], weights[edge])
+        union_find.union(root1, root2)
+        component_nodes[union_find.find(root1)] = node
+
+    roots = sorted({union_find.find(i) for i in range(n)})
+    top = max(merges.distances, default=0.0)
+    node = component_nodes[roots[0]]
+    for root in roots[1:]:
+        node = merges.add(node, component_nodes[root], top)
+
+    return merges.children, merges.distances
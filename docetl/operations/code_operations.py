@@ -1,9 +1,173 @@
+import math
 import os
-from concurrent.futures import ThreadPoolExecutor
-from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 from docetl.operations.base import BaseOperation
-from docetl.operations.utils import RichLoopBar
+from docetl.operations.utils import (
+    RichLoopBar,
+    group_items,
+    load_function,
+)
+
+EXECUTORS = ["thread", "process"]
+
+# The transform function of a worker process, set once by its initializer
+_worker_transform: Optional[Callable] = None
+
+
+def _init_worker(code: str, function_name: str) -> None:
+    global _worker_transform
+    # Load the transform once per worker, before it takes any items
+    _worker_transform = load_function(code, function_name)
+
+
+def _call_worker_transform(item: Any) -> Any:
+    return _worker_transform(item)
+
+
+class TransformPool:
+    """
+    Runs the transform function of a code operation over items, in order.
+
+    With the "thread" executor, the transform runs on a thread pool. With the
+    "process" executor, the code is sent to each worker process once, when the
+    process starts, and the items are streamed to the workers in chunks. This
+    sidesteps the GIL for CPU-bound transforms, at the cost of pickling items
+    and results between processes.
+    """
+
+    def __init__(
+        self,
+        code: str,
+        function_name: str = "transform",
+        executor: str = "thread",
+        max_workers: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+    ):
+        self.max_workers = max_workers or os.cpu_count()
+        self.chunk_size = chunk_size
+        if executor == "process":
+            self.transform_fn = None
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(code, function_name),
+            )
+        else:
+            self.transform_fn = load_function(code, function_name)
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def map(self, items: List[Any]) -> Iterator[Any]:
+        """
+        Applies the transform to each item, yielding results in the order of the items.
+        """
+        if self.transform_fn is not None:
+            return self.executor.map(self.transform_fn, items)
+        # Aim for a few chunks per worker so slow chunks can be balanced out
+        chunk_size = self.chunk_size or max(
+            1, math.ceil(len(items) / (self.max_workers * 4))
+        )
+        return self.executor.map(_call_worker_transform, items, chunksize=chunk_size)
+
+    def __enter__(self) -> "TransformPool":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.executor.shutdown()
+
+
+def transform_pool(config: Dict, function_name: str = "transform") -> TransformPool:
+    return TransformPool(
+        config["code"],
+        function_name,
+        config.get("executor", "thread"),
+        config.get("concurrent_thread_count", os.cpu_count()),
+        config.get("chunk_size"),
+    )
+
+
+def function_name(config: Dict) -> str:
+    """
+    The function a code operation calls: `batch_transform` when the operation
+    runs in batches, and `transform` otherwise.
+    """
+    return "batch_transform" if config.get("batch_size") else "transform"
+
+
+def check_code_config(config: BaseOperation.schema, name: str) -> None:
+    if getattr(config, "batch_size", None) is not None and config.batch_size < 1:
+        raise ValueError("'batch_size' must be a positive integer")
+    try:
+        load_function(config.code, name)
+    except Exception as e:
+        raise ValueError(f"Invalid code configuration: {str(e)}")
+    if config.executor not in EXECUTORS:
+        raise ValueError(
+            f"Invalid executor '{config.executor}'. Must be one of {EXECUTORS}"
+        )
+    if config.chunk_size is not None and config.chunk_size < 1:
+        raise ValueError("'chunk_size' must be a positive integer")
+
+
+def transform_outputs(
+    pool: TransformPool,
+    config: Dict,
+    input_data: List[Dict],
+    desc: str,
+    console,
+    columns: bool = False,
+) -> Iterator[Any]:
+    """
+    Yields the output of the transform for each input item, in order.
+
+    In batch mode, `batch_transform` receives lists of up to `batch_size` items
+    and returns a sequence (e.g. a list, numpy array or pandas Series) with one
+    output per item. If `columns` is set (code_map), it may instead return a
+    dictionary of equally long columns (e.g. `df.to_dict("list")`), which is
+    split into one dictionary per item; an empty dictionary adds no keys.
+    """
+    if not config.get("batch_size"):
+        yield from RichLoopBar(
+            pool.map(input_data), total=len(input_data), desc=desc, console=console
+        )
+        return
+
+    batch_size = config["batch_size"]
+    batches = [
+        input_data[i : i + batch_size] for i in range(0, len(input_data), batch_size)
+    ]
+    pbar = RichLoopBar(
+        pool.map(batches), total=len(batches), desc=desc, console=console
+    )
+    for batch, outputs in zip(batches, pbar):
+        if columns and isinstance(outputs, dict):
+            lengths = {key: len(values) for key, values in outputs.items()}
+            if len(set(lengths.values())) > 1:
+                raise ValueError(
+                    f"batch_transform returned columns of different lengths: {lengths}"
+                )
+            if not outputs:
+                # No columns means no new keys for any item
+                outputs = [{} for _ in batch]
+            else:
+                outputs = [
+                    dict(zip(outputs.keys(), values))
+                    for values in zip(*outputs.values())
+                ]
+        elif isinstance(outputs, (str, bytes, dict)) or not hasattr(outputs, "__len__"):
+            # Any sequence works, such as a list, tuple, numpy array or pandas Series
+            expected = (
+                "a sequence or a dictionary of columns" if columns else "a sequence"
+            )
+            raise ValueError(
+                f"batch_transform must return {expected}, got {type(outputs).__name__}"
+            )
+        if len(outputs) != len(batch):
+            raise ValueError(
+                f"batch_transform returned {len(outputs)} outputs for a batch of {len(batch)} items"
+            )
+        yield from list(outputs)
 
 
 class CodeMapOperation(BaseOperation):
@@ -11,44 +175,30 @@ class CodeMapOperation(BaseOperation):
         type: str = "code_map"
         code: str
         concurrent_thread_count: int = os.cpu_count()
+        executor: str = "thread"
+        chunk_size: Optional[int] = None
+        batch_size: Optional[int] = None
         drop_keys: Optional[List[str]] = None
 
     def syntax_check(self) -> None:
-        config = self.schema(**self.config)
-        try:
-            namespace = {}
-            exec(config.code, namespace)
-            if "transform" not in namespace:
-                raise ValueError("Code must define a 'transform' function")
-            if not callable(namespace["transform"]):
-                raise ValueError("'transform' must be a callable function")
-        except Exception as e:
-            raise ValueError(f"Invalid code configuration: {str(e)}")
+        check_code_config(self.schema(**self.config), function_name(self.config))
 
     def execute(self, input_data: List[Dict]) -> Tuple[List[Dict], float]:
-        namespace = {}
-        exec(self.config["code"], namespace)
-        transform_fn = namespace["transform"]
+        drop_keys = set(self.config.get("drop_keys") or [])
 
         results = []
-        with ThreadPoolExecutor(
-            max_workers=self.config.get("concurrent_thread_count", os.cpu_count())
-        ) as executor:
-            futures = [executor.submit(transform_fn, doc) for doc in input_data]
-            pbar = RichLoopBar(
-                range(len(futures)),
-                desc=f"Processing {self.config['name']} (code_map)",
-                console=self.console,
+        with transform_pool(self.config, function_name(self.config)) as pool:
+            outputs = transform_outputs(
+                pool,
+                self.config,
+                input_data,
+                f"Processing {self.config['name']} (code_map)",
+                self.console,
+                columns=True,
             )
-            for i in pbar:
-                result = futures[i].result()
-                if self.config.get("drop_keys"):
-                    result = {
-                        k: v
-                        for k, v in result.items()
-                        if k not in self.config["drop_keys"]
-                    }
-                doc = input_data[i]
+            for doc, result in zip(input_data, outputs):
+                if drop_keys:
+                    result = {k: v for k, v in result.items() if k not in drop_keys}
                 merged_result = {**doc, **result}
                 results.append(merged_result)
 
@@ -60,24 +210,13 @@ class CodeReduceOperation(BaseOperation):
         type: str = "code_reduce"
         code: str
         concurrent_thread_count: int = os.cpu_count()
+        executor: str = "thread"
+        chunk_size: Optional[int] = None
 
     def syntax_check(self) -> None:
-        config = self.schema(**self.config)
-        try:
-            namespace = {}
-            exec(config.code, namespace)
-            if "transform" not in namespace:
-                raise ValueError("Code must define a 'transform' function")
-            if not callable(namespace["transform"]):
-                raise ValueError("'transform' must be a callable function")
-        except Exception as e:
-            raise ValueError(f"Invalid code configuration: {str(e)}")
+        check_code_config(self.schema(**self.config), "transform")
 
     def execute(self, input_data: List[Dict]) -> Tuple[List[Dict], float]:
-        namespace = {}
-        exec(self.config["code"], namespace)
-        reduce_fn = namespace["transform"]
-
         reduce_keys = self.config.get("reduce_key", "_all")
         if not isinstance(reduce_keys, list):
             reduce_keys = [reduce_keys]
@@ -85,31 +224,17 @@ class CodeReduceOperation(BaseOperation):
         if reduce_keys == ["_all"] or reduce_keys == "_all":
             grouped_data = [("_all", input_data)]
         else:
-
-            def get_group_key(item):
-                return tuple(item[key] for key in reduce_keys)
-
-            grouped_data = {}
-            for item in input_data:
-                key = get_group_key(item)
-                if key not in grouped_data:
-                    grouped_data[key] = []
-                grouped_data[key].append(item)
-
-            grouped_data = list(grouped_data.items())
+            grouped_data = group_items(input_data, reduce_keys)
 
         results = []
-        with ThreadPoolExecutor(
-            max_workers=self.config.get("concurrent_thread_count", os.cpu_count())
-        ) as executor:
-            futures = [executor.submit(reduce_fn, group) for _, group in grouped_data]
+        with transform_pool(self.config) as pool:
             pbar = RichLoopBar(
-                range(len(futures)),
+                pool.map([group for _, group in grouped_data]),
+                total=len(grouped_data),
                 desc=f"Processing {self.config['name']} (code_reduce)",
                 console=self.console,
             )
-            for i, (key, group) in zip(pbar, grouped_data):
-                result = futures[i].result()
+            for (key, group), result in zip(grouped_data, pbar):
 
                 # Apply pass-through at the group level
                 if self.config.get("pass_through", False) and group:
@@ -135,36 +260,24 @@ class CodeFilterOperation(BaseOperation):
         type: str = "code_filter"
         code: str
         concurrent_thread_count: int = os.cpu_count()
+        executor: str = "thread"
+        chunk_size: Optional[int] = None
+        batch_size: Optional[int] = None
 
     def syntax_check(self) -> None:
-        config = self.schema(**self.config)
-        try:
-            namespace = {}
-            exec(config.code, namespace)
-            if "transform" not in namespace:
-                raise ValueError("Code must define a 'transform' function")
-            if not callable(namespace["transform"]):
-                raise ValueError("'transform' must be a callable function")
-        except Exception as e:
-            raise ValueError(f"Invalid code configuration: {str(e)}")
+        check_code_config(self.schema(**self.config), function_name(self.config))
 
     def execute(self, input_data: List[Dict]) -> Tuple[List[Dict], float]:
-        namespace = {}
-        exec(self.config["code"], namespace)
-        filter_fn = namespace["transform"]
-
         results = []
-        with ThreadPoolExecutor(
-            max_workers=self.config.get("concurrent_thread_count", os.cpu_count())
-        ) as executor:
-            futures = [executor.submit(filter_fn, doc) for doc in input_data]
-            pbar = RichLoopBar(
-                range(len(futures)),
-                desc=f"Processing {self.config['name']} (code_filter)",
-                console=self.console,
+        with transform_pool(self.config, function_name(self.config)) as pool:
+            outputs = transform_outputs(
+                pool,
+                self.config,
+                input_data,
+                f"Processing {self.config['name']} (code_filter)",
+                self.console,
             )
-            for i in pbar:
-                should_keep = futures[i].result()
+            for doc, should_keep in zip(input_data, outputs):
                 if should_keep:
-                    results.append(input_data[i])
+                    results.append(doc)
         return results, 0.0
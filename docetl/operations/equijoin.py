@@ -2,12 +2,13 @@
 The `EquijoinOperation` class is a subclass of `BaseOperation` that performs an equijoin operation on two datasets. It uses a combination of blocking techniques and LLM-based comparisons to efficiently join the datasets.
 """
 
+import heapq
 import json
 import random
 from collections import defaultdict
 from concurrent.futures import ThreadPoolExecutor
 from multiprocessing import Pool, cpu_count
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import numpy as np
 from litellm import model_cost
@@ -15,9 +16,15 @@ from rich.console import Console
 from rich.prompt import Confirm
 
 from docetl.operations.base import BaseOperation
-from docetl.operations.utils import strict_render
+from docetl.operations.utils import (
+    ComparisonCascade,
+    compile_template,
+    strict_render,
+    string_similarity,
+    validate_cascade_config,
+)
 from docetl.operations.utils.progress import RichLoopBar
-from docetl.utils import completion_cost
+from docetl.utils import completion_cost, extract_jinja_variables
 
 # Global variables to store shared data
 _right_data = None
@@ -42,13 +49,9 @@ def get_hashable_key(item: Dict) -> str:
     return json.dumps(item, sort_keys=True)
 
 
-def process_left_item(
-    left_item: Dict[str, Any]
-) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+def process_left_item(left_item: Dict[str, Any]) -> List[int]:
     return [
-        (left_item, right_item)
-        for right_item in _right_data
-        if is_match(left_item, right_item)
+        j for j, right_item in enumerate(_right_data) if is_match(left_item, right_item)
     ]
 
 
@@ -67,7 +70,10 @@ class EquijoinOperation(BaseOperation):
         embedding_model: Optional[str] = None
         embedding_batch_size: Optional[int] = None
         compare_batch_size: Optional[int] = None
+        compare_batch_prompt: Optional[str] = None
+        compare_batch_prompt_size: Optional[int] = None
         limit_comparisons: Optional[int] = None
+        cascade: Optional[Dict[str, Any]] = None
         blocking_keys: Optional[Dict[str, List[str]]] = None
         timeout: Optional[int] = None
         litellm_completion_kwargs: Dict[str, Any] = {}
@@ -104,7 +110,7 @@ class EquijoinOperation(BaseOperation):
         response = self.runner.api.call_llm(
             model,
             "compare",
-            [{"role": "user", "content": prompt}],
+            [self.prompt_message(comparison_prompt, prompt)],
             {"is_match": "bool"},
             timeout_seconds=timeout_seconds,
             max_retries_per_timeout=max_retries_per_timeout,
@@ -122,6 +128,78 @@ class EquijoinOperation(BaseOperation):
             return False, cost
         return output["is_match"], cost
 
+    def compare_batch(
+        self,
+        comparison_prompt: str,
+        compare_batch_prompt: str,
+        model: str,
+        pairs: List[Tuple[Dict, Dict]],
+        timeout_seconds: int = 120,
+        max_retries_per_timeout: int = 2,
+    ) -> Tuple[List[bool], float]:
+        """
+        Compares several pairs of items in a single LLM call.
+
+        The batch prompt is rendered with a `pairs` variable, a list of dicts with
+        `left` and `right` keys, and the LLM returns one boolean per pair. If the
+        response cannot be parsed into exactly one boolean per pair, each pair is
+        compared individually with `compare_pair` instead.
+
+        Args:
+            comparison_prompt (str): The prompt template for single-pair comparisons (used as a fallback).
+            compare_batch_prompt (str): The prompt template for comparing many pairs at once.
+            model (str): The LLM model to use for comparison.
+            pairs (List[Tuple[Dict, Dict]]): The (left, right) pairs to compare.
+            timeout_seconds (int): The timeout for the LLM call in seconds.
+            max_retries_per_timeout (int): The maximum number of retries per timeout.
+
+        Returns:
+            Tuple[List[bool], float]: A tuple containing whether each pair matches and the total cost of the comparisons.
+        """
+        cost = 0
+        try:
+            prompt = strict_render(
+                compare_batch_prompt,
+                {"pairs": [{"left": left, "right": right} for left, right in pairs]},
+            )
+            response = self.runner.api.call_llm(
+                model,
+                "batch compare",
+                [self.prompt_message(compare_batch_prompt, prompt)],
+                {"is_match": "list[bool]"},
+                timeout_seconds=timeout_seconds,
+                max_retries_per_timeout=max_retries_per_timeout,
+                bypass_cache=self.config.get("bypass_cache", False),
+                litellm_completion_kwargs=self.config.get(
+                    "litellm_completion_kwargs", {}
+                ),
+            )
+            cost = response.total_cost
+            matches = self.runner.api.parse_llm_response(
+                response.response, {"is_match": "list[bool]"}
+            )[0]["is_match"]
+            if len(matches) != len(pairs) or not all(
+                isinstance(match, bool) for match in matches
+            ):
+                raise ValueError(f"Expected {len(pairs)} booleans, got {matches}")
+        except Exception as e:
+            self.console.log(
+                f"[yellow]Could not parse batched comparison, comparing {len(pairs)} pairs individually: {e}[/yellow]"
+            )
+            matches = []
+            for left, right in pairs:
+                is_match, pair_cost = self.compare_pair(
+                    comparison_prompt,
+                    model,
+                    left,
+                    right,
+                    timeout_seconds,
+                    max_retries_per_timeout,
+                )
+                matches.append(is_match)
+                cost += pair_cost
+        return matches, cost
+
     def syntax_check(self) -> None:
         """
         Checks the configuration of the EquijoinOperation for required keys and valid structure.
@@ -138,6 +216,13 @@ class EquijoinOperation(BaseOperation):
                 "Missing required key 'comparison_prompt' in EquijoinOperation configuration"
             )
 
+        try:
+            compile_template(self.config["comparison_prompt"])
+        except Exception as e:
+            raise ValueError(
+                f"Invalid Jinja2 template in 'comparison_prompt': {str(e)}"
+            ) from e
+
         if "blocking_keys" in self.config:
             if (
                 "left" not in self.config["blocking_keys"]
@@ -160,6 +245,27 @@ class EquijoinOperation(BaseOperation):
             if not isinstance(self.config["limit_comparisons"], int):
                 raise ValueError("limit_comparisons must be an integer")
 
+        if "compare_batch_prompt" in self.config:
+            try:
+                variables = extract_jinja_variables(self.config["compare_batch_prompt"])
+            except Exception as e:
+                raise ValueError(
+                    f"Invalid Jinja2 template in 'compare_batch_prompt': {str(e)}"
+                )
+            if not any(var.split(".")[0] == "pairs" for var in variables):
+                raise ValueError(
+                    "'compare_batch_prompt' must contain the 'pairs' variable"
+                )
+
+        if "compare_batch_prompt_size" in self.config:
+            if (
+                not isinstance(self.config["compare_batch_prompt_size"], int)
+                or self.config["compare_batch_prompt_size"] <= 0
+            ):
+                raise ValueError("compare_batch_prompt_size must be a positive integer")
+
+        validate_cascade_config(self.config)
+
     def execute(
         self, left_data: List[Dict], right_data: List[Dict]
     ) -> Tuple[List[Dict], float]:
@@ -224,6 +330,7 @@ class EquijoinOperation(BaseOperation):
         blocking_conditions = self.config.get("blocking_conditions", [])
         limit_comparisons = self.config.get("limit_comparisons")
         total_cost = 0
+        similarities = None
 
         if len(left_data) == 0 or len(right_data) == 0:
             return [], 0
@@ -231,32 +338,45 @@ class EquijoinOperation(BaseOperation):
         if self.status:
             self.status.stop()
 
-        # Initial blocking using multiprocessing
-        num_processes = min(cpu_count(), len(left_data))
+        # Initial blocking using multiprocessing. Workers return the indices of
+        # matching right items, so blocked pairs are (left index, right index)
+        # tuples and items are never copied back from the workers.
+        right_matches = [[] for _ in left_data]
+        if blocking_conditions:
+            num_processes = min(cpu_count(), len(left_data))
 
-        self.console.log(
-            f"Starting to run code-based blocking rules for {len(left_data)} left and {len(right_data)} right rows ({len(left_data) * len(right_data)} total pairs) with {num_processes} processes..."
-        )
+            self.console.log(
+                f"Starting to run code-based blocking rules for {len(left_data)} left and {len(right_data)} right rows ({len(left_data) * len(right_data)} total pairs) with {num_processes} processes..."
+            )
+
+            with Pool(
+                processes=num_processes,
+                initializer=init_worker,
+                initargs=(right_data, blocking_conditions),
+            ) as pool:
+                right_matches = pool.map(process_left_item, left_data)
 
-        with Pool(
-            processes=num_processes,
-            initializer=init_worker,
-            initargs=(right_data, blocking_conditions),
-        ) as pool:
-            blocked_pairs_nested = pool.map(process_left_item, left_data)
+        def iter_blocked_pairs() -> Iterator[Tuple[int, int]]:
+            for i, matches in enumerate(right_matches):
+                for j in matches:
+                    yield i, j
 
-        # Flatten the nested list of blocked pairs
-        blocked_pairs = [pair for sublist in blocked_pairs_nested for pair in sublist]
+        num_blocked_pairs = sum(len(matches) for matches in right_matches)
 
         # Check if we have exceeded the pairwise comparison limit
-        if limit_comparisons is not None and len(blocked_pairs) > limit_comparisons:
-            # Sample pairs based on cardinality and length
-            sampled_pairs = stratified_length_sample(
-                blocked_pairs, limit_comparisons, sample_size=1000, console=self.console
+        if limit_comparisons is not None and num_blocked_pairs > limit_comparisons:
+            # Sample pairs based on cardinality and length, streaming over the
+            # blocked pairs instead of materializing them
+            blocked_pairs = stratified_length_sample(
+                iter_blocked_pairs,
+                limit_comparisons,
+                [get_doc_length(item) for item in left_data],
+                [get_doc_length(item) for item in right_data],
+                console=self.console,
             )
 
             # Calculate number of dropped pairs
-            dropped_pairs = len(blocked_pairs) - limit_comparisons
+            dropped_pairs = num_blocked_pairs - limit_comparisons
 
             # Prompt the user for confirmation
             if self.status:
@@ -271,8 +391,8 @@ class EquijoinOperation(BaseOperation):
 
             if self.status:
                 self.status.start()
-
-            blocked_pairs = sampled_pairs
+        else:
+            blocked_pairs = list(iter_blocked_pairs())
 
         self.console.log(
             f"Number of blocked pairs after initial blocking: {len(blocked_pairs)}"
@@ -330,22 +450,18 @@ class EquijoinOperation(BaseOperation):
             self.console.log(
                 f"There are {above_threshold.shape[0]} pairs above the threshold."
             )
-            block_pair_set = set(
-                (get_hashable_key(left_item), get_hashable_key(right_item))
-                for left_item, right_item in blocked_pairs
-            )
+            block_pair_set = set(blocked_pairs)
 
             # If limit_comparisons is set, take only the top pairs
             if limit_comparisons is not None:
-                # First, get all pairs above threshold
-                above_threshold_pairs = [(int(i), int(j)) for i, j in above_threshold]
-
-                # Sort these pairs by their similarity scores
-                sorted_pairs = sorted(
-                    above_threshold_pairs,
-                    key=lambda pair: similarities[pair[0], pair[1]],
-                    reverse=True,
+                # Sort the pairs above threshold by their similarity scores
+                order = np.argsort(
+                    -similarities[above_threshold[:, 0], above_threshold[:, 1]],
+                    kind="stable",
                 )
+                sorted_pairs = [
+                    (int(i), int(j)) for i, j in above_threshold[order].tolist()
+                ]
 
                 # Take the top 'limit_comparisons' pairs
                 top_pairs = sorted_pairs[:limit_comparisons]
@@ -358,15 +474,12 @@ class EquijoinOperation(BaseOperation):
                 final_blocked_pairs = blocked_pairs.copy()
 
                 # Then, add new pairs from top similarities until we reach the limit
-                for i, j in top_pairs:
+                for pair in top_pairs:
                     if remaining_limit <= 0:
                         break
-                    left_item, right_item = left_data[i], right_data[j]
-                    left_key = get_hashable_key(left_item)
-                    right_key = get_hashable_key(right_item)
-                    if (left_key, right_key) not in block_pair_set:
-                        new_blocked_pairs.append((left_item, right_item))
-                        block_pair_set.add((left_key, right_key))
+                    if pair not in block_pair_set:
+                        new_blocked_pairs.append(pair)
+                        block_pair_set.add(pair)
                         remaining_limit -= 1
 
                 final_blocked_pairs.extend(new_blocked_pairs)
@@ -377,20 +490,24 @@ class EquijoinOperation(BaseOperation):
                 )
             else:
                 # Add new pairs to blocked_pairs
-                for i, j in above_threshold:
-                    left_item, right_item = left_data[i], right_data[j]
-                    left_key = get_hashable_key(left_item)
-                    right_key = get_hashable_key(right_item)
-                    if (left_key, right_key) not in block_pair_set:
-                        blocked_pairs.append((left_item, right_item))
-                        block_pair_set.add((left_key, right_key))
-
-        # If there are no blocking conditions or embedding threshold, use all pairs
+                for i, j in above_threshold.tolist():
+                    if (i, j) not in block_pair_set:
+                        blocked_pairs.append((i, j))
+                        block_pair_set.add((i, j))
+
+        # If there are no blocking conditions or embedding threshold, use all
+        # pairs. Sampled positions in the cross product are mapped back to pairs,
+        # so the cross product is never materialized.
         if not blocking_conditions and blocking_threshold is None:
+            num_pairs = len(left_data) * len(right_data)
+            positions = range(num_pairs)
+            if limit_comparisons is not None and num_pairs > limit_comparisons:
+                self.console.log(
+                    f"Randomly sampling {limit_comparisons} pairs out of {num_pairs} pairs."
+                )
+                positions = random.sample(positions, limit_comparisons)
             blocked_pairs = [
-                (left_item, right_item)
-                for left_item in left_data
-                for right_item in right_data
+                divmod(position, len(right_data)) for position in positions
             ]
 
         # If there's a limit on the number of comparisons, randomly sample pairs
@@ -421,56 +538,147 @@ class EquijoinOperation(BaseOperation):
         if self.status:
             self.status.stop()
 
+        comparison_model = self.config.get("comparison_model", self.default_model)
+        timeout_seconds = self.config.get("timeout", 120)
+        max_retries_per_timeout = self.config.get("max_retries_per_timeout", 2)
+
+        def add_match(left_item: Dict[str, Any], right_item: Dict[str, Any]) -> None:
+            left_key_hash = get_hashable_key(left_item)
+            right_key_hash = get_hashable_key(right_item)
+            if (
+                left_match_counts[left_key_hash] >= left_limit
+                or right_match_counts[right_key_hash] >= right_limit
+            ):
+                return
+
+            joined_item = {}
+            for key, value in left_item.items():
+                joined_item[f"{key}_left" if key in right_item else key] = value
+            for key, value in right_item.items():
+                joined_item[f"{key}_right" if key in left_item else key] = value
+            if self.runner.api.validate_output(self.config, joined_item, self.console):
+                results.append(joined_item)
+                left_match_counts[left_key_hash] += 1
+                right_match_counts[right_key_hash] += 1
+
+            # TODO: support retry in validation failure
+
+        # Pairs are kept as (left index, right index) until they are compared
+        def pair_items(pair: Tuple[int, int]) -> Tuple[Dict, Dict]:
+            return left_data[pair[0]], right_data[pair[1]]
+
+        def compare_with_model(pair: Tuple[int, int], model: str) -> Tuple[bool, float]:
+            return self.compare_pair(
+                self.config["comparison_prompt"],
+                model,
+                *pair_items(pair),
+                timeout_seconds,
+                max_retries_per_timeout,
+            )
+
+        # Optionally decide pairs with a calibrated cascade of similarity scores
+        # and a cheap model, so only uncertain pairs reach the comparison model.
+        # The calibration sample's labels are reused as comparison results.
+        cascade = None
+        if self.config.get("cascade") and blocked_pairs:
+            cascade = ComparisonCascade(self.config["cascade"], self.console)
+
+            def pair_score(pair: Tuple[int, int]) -> float:
+                if cascade.similarity == "embedding" and similarities is not None:
+                    return float(similarities[pair[0], pair[1]])
+                left_item, right_item = pair_items(pair)
+                return string_similarity(
+                    " ".join(
+                        str(left_item[key]) for key in left_keys if key in left_item
+                    ),
+                    " ".join(
+                        str(right_item[key]) for key in right_keys if key in right_item
+                    ),
+                )
+
+            sample_labels, calibration_cost = cascade.calibrate(
+                blocked_pairs,
+                pair_score,
+                compare_with_model,
+                comparison_model,
+                self.max_threads,
+            )
+            comparison_costs += calibration_cost
+            for idx in sorted(sample_labels):
+                if sample_labels[idx]:
+                    add_match(*pair_items(blocked_pairs[idx]))
+            blocked_pairs = [
+                pair
+                for idx, pair in enumerate(blocked_pairs)
+                if idx not in sample_labels
+            ]
+
+        compare_batch_prompt = self.config.get("compare_batch_prompt")
+        pairs_per_call = (
+            self.config.get("compare_batch_prompt_size", 10)
+            if compare_batch_prompt
+            else 1
+        )
+        pair_batches = [
+            blocked_pairs[i : i + pairs_per_call]
+            for i in range(0, len(blocked_pairs), pairs_per_call)
+        ]
+
+        def compare_with_comparison_model(
+            pairs: List[Tuple[int, int]],
+        ) -> Tuple[List[bool], float]:
+            if len(pairs) == 1:
+                is_match, cost = compare_with_model(pairs[0], comparison_model)
+                return [is_match], cost
+            return self.compare_batch(
+                self.config["comparison_prompt"],
+                compare_batch_prompt,
+                comparison_model,
+                [pair_items(pair) for pair in pairs],
+                timeout_seconds,
+                max_retries_per_timeout,
+            )
+
+        def compare_pairs(pairs: List[Tuple[int, int]]) -> Tuple[List[bool], float]:
+            if cascade is None:
+                return compare_with_comparison_model(pairs)
+
+            decisions, cascade_cost = [], 0
+            for pair in pairs:
+                decision, cost = cascade.decide(
+                    pair, pair_score(pair), compare_with_model
+                )
+                decisions.append(decision)
+                cascade_cost += cost
+            undecided = [pair for pair, d in zip(pairs, decisions) if d is None]
+            matches, cost = (
+                compare_with_comparison_model(undecided) if undecided else ([], 0)
+            )
+            matches = iter(matches)
+            return [
+                next(matches) if decision is None else decision
+                for decision in decisions
+            ], cascade_cost + cost
+
         with ThreadPoolExecutor(max_workers=self.max_threads) as executor:
-            future_to_pair = {
-                executor.submit(
-                    self.compare_pair,
-                    self.config["comparison_prompt"],
-                    self.config.get("comparison_model", self.default_model),
-                    left,
-                    right,
-                    self.config.get("timeout", 120),
-                    self.config.get("max_retries_per_timeout", 2),
-                ): (left, right)
-                for left, right in blocked_pairs
-            }
+            futures = [executor.submit(compare_pairs, batch) for batch in pair_batches]
 
             pbar = RichLoopBar(
-                range(len(future_to_pair)),
+                range(len(futures)),
                 desc="Comparing pairs",
                 console=self.console,
             )
 
             for i in pbar:
-                future = list(future_to_pair.keys())[i]
-                pair = future_to_pair[future]
-                is_match, cost = future.result()
+                matches, cost = futures[i].result()
                 comparison_costs += cost
 
-                if is_match:
-                    joined_item = {}
-                    left_item, right_item = pair
-                    left_key_hash = get_hashable_key(left_item)
-                    right_key_hash = get_hashable_key(right_item)
-                    if (
-                        left_match_counts[left_key_hash] >= left_limit
-                        or right_match_counts[right_key_hash] >= right_limit
-                    ):
-                        continue
-
-                    for key, value in left_item.items():
-                        joined_item[f"{key}_left" if key in right_item else key] = value
-                    for key, value in right_item.items():
-                        joined_item[f"{key}_right" if key in left_item else key] = value
-                    if self.runner.api.validate_output(
-                        self.config, joined_item, self.console
-                    ):
-                        results.append(joined_item)
-                        left_match_counts[left_key_hash] += 1
-                        right_match_counts[right_key_hash] += 1
-
-                    # TODO: support retry in validation failure
+                for pair, is_match in zip(pair_batches[i], matches):
+                    if is_match:
+                        add_match(*pair_items(pair))
 
+        if cascade is not None:
+            cascade.log_summary()
         total_cost += comparison_costs
 
         if self.status:
@@ -490,62 +698,47 @@ class EquijoinOperation(BaseOperation):
         return results, total_cost
 
 
-def estimate_length(items: List[Dict], sample_size: int = 1000) -> float:
-    """
-    Estimates average document length in the relation.
-    Returns a normalized score (0-1) representing relative document size.
-
-    Args:
-        items: List of dictionary items to analyze
-        sample_size: Number of items to sample for estimation
-
-    Returns:
-        float: Normalized score based on average document length
-    """
-    if not items:
-        return 0.0
-
-    sample_size = min(len(items), sample_size)
-    sample = random.sample(items, sample_size)
-
-    def get_doc_length(doc: Dict) -> int:
-        """Calculate total length of all string values in document"""
-        total_len = 0
-        for value in doc.values():
-            if isinstance(value, str):
-                total_len += len(value)
-            elif isinstance(value, (list, dict)):
-                # For nested structures, use their string representation
-                total_len += len(str(value))
-        return total_len
-
-    lengths = [get_doc_length(item) for item in sample]
-    if not lengths:
-        return 0.0
-
-    avg_length = sum(lengths) / len(lengths)
-    return avg_length
+def get_doc_length(doc: Dict) -> int:
+    """Calculate total length of all string values in document"""
+    total_len = 0
+    for value in doc.values():
+        if isinstance(value, str):
+            total_len += len(value)
+        elif isinstance(value, (list, dict)):
+            # For nested structures, use their string representation
+            total_len += len(str(value))
+    return total_len
 
 
 def stratified_length_sample(
-    blocked_pairs: List[Tuple[Dict, Dict]],
+    blocked_pairs: Callable[[], Iterable[Tuple[int, int]]],
     limit_comparisons: int,
-    sample_size: int = 1000,
+    left_lengths: List[int],
+    right_lengths: List[int],
     console: Console = None,
-) -> List[Tuple[Dict, Dict]]:
+) -> List[Tuple[int, int]]:
     """
-    Samples pairs stratified by the smaller cardinality relation,
+    Samples pairs stratified by the items of the relation with longer documents,
     prioritizing longer matches within each stratum.
-    """
-    # Extract left and right items
-    left_items = [left for left, _ in blocked_pairs]
-    right_items = [right for _, right in blocked_pairs]
 
-    # Estimate length for both relations
-    left_length = estimate_length(left_items, sample_size)
-    right_length = estimate_length(right_items, sample_size)
+    The blocked pairs are streamed twice and never stored: once to find the
+    strata, and once to keep the longest matches of each stratum in a heap
+    bounded by its share of `limit_comparisons`.
 
-    # Group by the relation with estimated lower length
+    Args:
+        blocked_pairs: Returns a new iterator over (left index, right index) pairs.
+        limit_comparisons: Number of pairs to sample.
+        left_lengths: Document length of each left item.
+        right_lengths: Document length of each right item.
+        console: Console to log the chosen stratification to.
+
+    Returns:
+        List[Tuple[int, int]]: The sampled (left index, right index) pairs.
+    """
+    left_length = sum(left_lengths) / len(left_lengths) if left_lengths else 0.0
+    right_length = sum(right_lengths) / len(right_lengths) if right_lengths else 0.0
+
+    # Group by the relation with the longer documents
     use_left_as_key = left_length > right_length
     if console:
         longer_length = max(left_length, right_length)
@@ -553,32 +746,32 @@ def stratified_length_sample(
         console.log(
             f"Longer length is {longer_length:.2f} ({longer_side} side). Using {longer_side} to sample matches."
         )
-    groups = defaultdict(list)
-
-    for left, right in blocked_pairs:
-        key = get_hashable_key(left if use_left_as_key else right)
-        value = (left, right)
-        groups[key].append(value)
-
-    # Sort each group by length of the other relation's item
-    for key in groups:
-        groups[key].sort(
-            key=lambda x: len(x[1 if use_left_as_key else 0]),
-            reverse=True,  # Prioritize longer matches
-        )
+    key_side, other_lengths = (
+        (0, right_lengths) if use_left_as_key else (1, left_lengths)
+    )
 
-    # Calculate samples per group
-    n_groups = len(groups)
-    base_samples_per_group = limit_comparisons // n_groups
-    extra_samples = limit_comparisons % n_groups
-
-    # Sample from each group
-    sampled_pairs = []
-    for i, (key, pairs) in enumerate(groups.items()):
-        # Add one extra sample to early groups if we have remainder
-        group_sample_size = min(
-            len(pairs), base_samples_per_group + (1 if i < extra_samples else 0)
+    # Find the strata, in order of first appearance
+    groups = {}
+    for pair in blocked_pairs():
+        groups.setdefault(pair[key_side], len(groups))
+
+    # Calculate samples per group, adding one extra sample to early groups if
+    # we have remainder
+    base_samples_per_group, extra_samples = divmod(limit_comparisons, len(groups))
+
+    # Keep the longest matches of each group. Ties go to the earlier pair.
+    heaps = defaultdict(list)
+    for position, pair in enumerate(blocked_pairs()):
+        key = pair[key_side]
+        group_sample_size = base_samples_per_group + (
+            1 if groups[key] < extra_samples else 0
         )
-        sampled_pairs.extend(pairs[:group_sample_size])
-
-    return sampled_pairs
+        if group_sample_size == 0:
+            continue
+        entry = (other_lengths[pair[1 - key_side]], -position, pair)
+        if len(heaps[key]) < group_sample_size:
+            heapq.heappush(heaps[key], entry)
+        else:
+            heapq.heappushpop(heaps[key], entry)
+
+    return [pair for key in groups for _, _, pair in sorted(heaps[key], reverse=True)]
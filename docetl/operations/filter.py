@@ -1,13 +1,23 @@
 """The `FilterOperation` class is a subclass of `BaseOperation` that implements a filtering operation on input data using a language model."""
 
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
+
+from docetl.operations.clustering_utils import get_embeddings_for_clustering
 from docetl.operations.map import MapOperation
+from docetl.operations.utils import load_function, validate_execution_mode
 
 
 class FilterOperation(MapOperation):
     class schema(MapOperation.schema):
         type: str = "filter"
+        prefilter: Optional[Dict[str, Any]] = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Whether rejected items are kept in the results (in the build phase)
+        self.keep_rejected = False
 
     def syntax_check(self) -> None:
         """
@@ -53,6 +63,82 @@ class FilterOperation(MapOperation):
                 f"The value in the 'schema' must be of type bool, got {value}"
             )
 
+        prefilter = self.config.get("prefilter")
+        if prefilter is not None:
+            if not isinstance(prefilter, dict):
+                raise TypeError("'prefilter' must be a dictionary")
+            if ("code" in prefilter) == ("query" in prefilter):
+                raise ValueError(
+                    "'prefilter' must specify exactly one of 'code' or 'query'"
+                )
+            if "code" in prefilter:
+                try:
+                    load_function(prefilter["code"], "transform")
+                except Exception as e:
+                    raise ValueError(f"Invalid code in 'prefilter': {str(e)}")
+            elif not isinstance(prefilter.get("threshold"), (int, float)):
+                raise TypeError(
+                    "'prefilter' with a 'query' must specify a numeric 'threshold'"
+                )
+
+        validate_execution_mode(self.config)
+
+    @property
+    def filter_key(self) -> str:
+        return next(
+            k for k in self.config["output"]["schema"] if k != "_short_explanation"
+        )
+
+    def _build_output(self, item: Dict, output: Dict) -> Optional[Dict]:
+        # Drop rejected items before merging them with their output
+        if not self.keep_rejected and not output.get(self.filter_key):
+            return None
+        return super()._build_output(item, output)
+
+    def prefilter(self, input_data: List[Dict]) -> Tuple[List[Dict], float]:
+        """
+        Drops obvious negatives before any LLM call, with a code filter or an
+        embedding similarity threshold against a query.
+
+        Args:
+            input_data (List[Dict]): The items to prefilter.
+
+        Returns:
+            Tuple[List[Dict], float]: The items that passed, and the embedding cost.
+        """
+        prefilter = self.config["prefilter"]
+        if "code" in prefilter:
+            keep = load_function(prefilter["code"], "transform")
+            return [item for item in input_data if keep(item)], 0.0
+
+        if not input_data:
+            return input_data, 0.0
+        embedding_config = {
+            "embedding_model": prefilter.get(
+                "embedding_model", "text-embedding-3-small"
+            ),
+            "embedding_keys": prefilter.get("embedding_keys"),
+        }
+        embeddings, cost = get_embeddings_for_clustering(
+            input_data, embedding_config, self.runner.api
+        )
+        query_embedding, query_cost = get_embeddings_for_clustering(
+            [{"query": prefilter["query"]}],
+            {**embedding_config, "embedding_keys": ["query"]},
+            self.runner.api,
+        )
+        embeddings = np.array(embeddings)
+        query = np.array(query_embedding[0])
+        similarities = (embeddings @ query) / (
+            np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query) + 1e-12
+        )
+        passed = [
+            item
+            for item, similarity in zip(input_data, similarities)
+            if similarity >= prefilter["threshold"]
+        ]
+        return passed, cost + query_cost
+
     def execute(
         self, input_data: List[Dict], is_build: bool = False
     ) -> Tuple[List[Dict], float]:
@@ -68,10 +154,11 @@ class FilterOperation(MapOperation):
             and the total cost of the operation.
 
         This method performs the following steps:
-        1. Processes each input item using an LLM model
-        2. Validates the output
-        3. Filters the results based on the specified filter key
-        4. Calculates the total cost of the operation
+        1. Drops items rejected by the prefilter, if one is configured
+        2. Processes each remaining item using an LLM model
+        3. Validates the output
+        4. Filters the results based on the specified filter key
+        5. Calculates the total cost of the operation
 
         The method uses multi-threading to process items in parallel, improving performance
         for large datasets.
@@ -97,17 +184,22 @@ class FilterOperation(MapOperation):
         print(f"Total cost: {cost}")
         ```
         """
-        filter_key = next(
-            iter(
-                [
-                    k
-                    for k in self.config["output"]["schema"].keys()
-                    if k != "_short_explanation"
-                ]
-            )
-        )
+        filter_key = self.filter_key
+
+        total_cost = 0.0
+        if self.config.get("prefilter"):
+            num_items = len(input_data)
+            input_data, total_cost = self.prefilter(input_data)
+            if self.config.get("verbose", False):
+                self.console.log(
+                    f"Prefilter kept {len(input_data)} of {num_items} items"
+                )
 
-        results, total_cost = super().execute(input_data)
+        # Outside the build phase, rejected items are dropped as soon as their
+        # LLM call returns, without being merged with their output
+        self.keep_rejected = is_build
+        results, map_cost = super().execute(input_data)
+        total_cost += map_cost
 
         # Drop records with filter_key values that are False
         if not is_build:
@@ -104,209 +104,190 @@ class GatherOperation(BaseOperation):
             # Sort chunks by their order within the document
             chunks.sort(key=lambda x: x[order_key])
 
-            # Process each chunk with its peripheral context and headers
-            for i, chunk in enumerate(chunks):
-                rendered_chunk = self.render_chunk_with_context(
-                    chunks,
-                    i,
-                    peripheral_config,
-                    content_key,
-                    order_key,
-                    main_chunk_start,
-                    main_chunk_end,
-                    doc_header_key,
-                )
-
+            # Render every chunk with its peripheral context and headers
+            rendered_chunks = self.render_document(
+                chunks,
+                peripheral_config,
+                content_key,
+                order_key,
+                main_chunk_start,
+                main_chunk_end,
+                doc_header_key,
+            )
+            for chunk, rendered_chunk in zip(chunks, rendered_chunks):
                 result = chunk.copy()
                 result[f"{content_key}_rendered"] = rendered_chunk
                 results.append(result)
 
         return results, cost
 
-    def render_chunk_with_context(
+    def render_document(
         self,
         chunks: List[Dict],
-        current_index: int,
         peripheral_config: Dict,
         content_key: str,
         order_key: str,
         main_chunk_start: str,
         main_chunk_end: str,
-        doc_header_key: str,
-    ) -> str:
+        doc_header_key: Optional[str],
+    ) -> List[str]:
         """
-        Render a chunk with its peripheral context and headers.
+        Render every chunk of a document with its peripheral context and headers.
+
+        The document is walked once: header hierarchies are carried forward
+        from chunk to chunk, and skipped characters are counted from prefix
+        sums of the chunk lengths. Without a "middle" section, the work per
+        chunk is bounded by the head and tail counts instead of the number of
+        chunks in the document.
 
         Args:
-            chunks (List[Dict]): List of all chunks in the document.
-            current_index (int): Index of the current chunk being processed.
+            chunks (List[Dict]): List of all chunks in the document, in order.
             peripheral_config (Dict): Configuration for peripheral chunks.
             content_key (str): Key for the content in each chunk.
             order_key (str): Key for the order of each chunk.
             main_chunk_start (str): String to mark the start of the main chunk.
             main_chunk_end (str): String to mark the end of the main chunk.
-            doc_header_key (str): The key for the headers in the current chunk.
+            doc_header_key (Optional[str]): The key for the headers in each chunk.
 
         Returns:
-            str: Renderted chunk with context and headers.
+            List[str]: The rendered chunks, in the order of `chunks`.
         """
-
-        # If there are no peripheral chunks, return the main chunk
+        # If there are no peripheral chunks, return the main chunks
         if not peripheral_config:
-            return chunks[current_index][content_key]
-
-        combined_parts = ["--- Previous Context ---"]
+            return [chunk[content_key] for chunk in chunks]
 
-        combined_parts.extend(
-            self.process_peripheral_chunks(
-                chunks[:current_index],
-                peripheral_config.get("previous", {}),
-                content_key,
-                order_key,
+        # offsets[i] is the number of characters in the chunks before chunk i
+        offsets = [0]
+        for chunk in chunks:
+            offsets.append(offsets[-1] + len(chunk[content_key]))
+        headers = self.render_hierarchy_headers(chunks, doc_header_key)
+        previous_config = peripheral_config.get("previous", {})
+        next_config = peripheral_config.get("next", {})
+
+        rendered_chunks = []
+        for i, main_chunk in enumerate(chunks):
+            combined_parts = ["--- Previous Context ---"]
+            combined_parts.extend(
+                self.process_peripheral_chunks(
+                    chunks, 0, i, previous_config, content_key, order_key, offsets
+                )
             )
-        )
-        combined_parts.append("--- End Previous Context ---\n")
-
-        # Process main chunk
-        main_chunk = chunks[current_index]
-        if headers := self.render_hierarchy_headers(
-            main_chunk, chunks[: current_index + 1], doc_header_key
-        ):
-            combined_parts.append(headers)
-        combined_parts.extend(
-            (
-                f"{main_chunk_start}",
-                f"{main_chunk[content_key]}",
-                f"{main_chunk_end}",
-                "\n--- Next Context ---",
+            combined_parts.append("--- End Previous Context ---\n")
+
+            # Process main chunk
+            if headers[i]:
+                combined_parts.append(headers[i])
+            combined_parts.extend(
+                (
+                    f"{main_chunk_start}",
+                    f"{main_chunk[content_key]}",
+                    f"{main_chunk_end}",
+                    "\n--- Next Context ---",
+                )
             )
-        )
-        combined_parts.extend(
-            self.process_peripheral_chunks(
-                chunks[current_index + 1 :],
-                peripheral_config.get("next", {}),
-                content_key,
-                order_key,
+            combined_parts.extend(
+                self.process_peripheral_chunks(
+                    chunks,
+                    i + 1,
+                    len(chunks),
+                    next_config,
+                    content_key,
+                    order_key,
+                    offsets,
+                )
             )
-        )
-        combined_parts.append("--- End Next Context ---")
+            combined_parts.append("--- End Next Context ---")
+            rendered_chunks.append("\n".join(combined_parts))
 
-        return "\n".join(combined_parts)
+        return rendered_chunks
 
     def process_peripheral_chunks(
         self,
         chunks: List[Dict],
+        start: int,
+        end: int,
         config: Dict,
         content_key: str,
         order_key: str,
-        reverse: bool = False,
+        offsets: List[int],
     ) -> List[str]:
         """
-        Process peripheral chunks according to the configuration.
+        Process the peripheral chunks `chunks[start:end]` according to the configuration.
+
+        The first `head.count` chunks form the head and the last `tail.count`
+        chunks form the tail. The chunks in between are rendered as the middle
+        section if one is configured, and are otherwise replaced by the number
+        of characters skipped.
 
         Args:
-            chunks (List[Dict]): List of chunks to process.
+            chunks (List[Dict]): List of all chunks in the document.
+            start (int): Index of the first peripheral chunk.
+            end (int): Index after the last peripheral chunk.
             config (Dict): Configuration for processing peripheral chunks.
             content_key (str): Key for the content in each chunk.
             order_key (str): Key for the order of each chunk.
-            reverse (bool, optional): Whether to process chunks in reverse order. Defaults to False.
+            offsets (List[int]): Number of characters in the chunks before each chunk.
 
         Returns:
             List[str]: List of processed chunk strings.
         """
-        if reverse:
-            chunks = list(reversed(chunks))
+        head_count = int(config.get("head", {}).get("count", 0))
+        tail_count = int(config.get("tail", {}).get("count", 0))
+        head_end = min(start + head_count, end)
+        tail_start = max(end - tail_count, head_end)
+
+        def render(index: int, section: str) -> Tuple[str, str]:
+            chunk = chunks[index]
+            section_content_key = config.get(section, {}).get(
+                "content_key", content_key
+            )
+            summary_suffix = " (Summary)" if section_content_key != content_key else ""
+            return (
+                f"[Chunk {chunk[order_key]}{summary_suffix}]",
+                f"{chunk[section_content_key]}",
+            )
 
         processed_parts = []
-        included_chunks = []
-        total_chunks = len(chunks)
-
-        head_config = config.get("head", {})
-        tail_config = config.get("tail", {})
-
-        head_count = int(head_config.get("count", 0))
-        tail_count = int(tail_config.get("count", 0))
-        in_skip = False
-        skip_char_count = 0
-
-        for i, chunk in enumerate(chunks):
-            if i < head_count:
-                section = "head"
-            elif i >= total_chunks - tail_count:
-                section = "tail"
-            elif "middle" in config:
-                section = "middle"
+        for index in range(start, head_end):
+            processed_parts.extend(render(index, "head"))
+        if head_end < tail_start:
+            if "middle" in config:
+                for index in range(head_end, tail_start):
+                    processed_parts.extend(render(index, "middle"))
             else:
                 # Show number of characters skipped
-                skipped_chars = len(chunk[content_key])
-                if not in_skip:
-                    skip_char_count = skipped_chars
-                    in_skip = True
-                else:
-                    skip_char_count += skipped_chars
-
-                continue
-
-            if in_skip:
+                skip_char_count = offsets[tail_start] - offsets[head_end]
                 processed_parts.append(
                     f"[... {skip_char_count} characters skipped ...]"
                 )
-                in_skip = False
-                skip_char_count = 0
-
-            section_config = config.get(section, {})
-            section_content_key = section_config.get("content_key", content_key)
-
-            is_summary = section_content_key != content_key
-            summary_suffix = " (Summary)" if is_summary else ""
-
-            chunk_prefix = f"[Chunk {chunk[order_key]}{summary_suffix}]"
-            processed_parts.extend((chunk_prefix, f"{chunk[section_content_key]}"))
-            included_chunks.append(chunk)
-
-        if in_skip:
-            processed_parts.append(f"[... {skip_char_count} characters skipped ...]")
-
-        if reverse:
-            processed_parts = list(reversed(processed_parts))
+        for index in range(tail_start, end):
+            processed_parts.extend(render(index, "tail"))
 
         return processed_parts
 
     def render_hierarchy_headers(
         self,
-        current_chunk: Dict,
         chunks: List[Dict],
-        doc_header_key: str,
-    ) -> str:
+        doc_header_key: Optional[str],
+    ) -> List[str]:
         """
-        Render headers for the current chunk's hierarchy.
+        Render the headers of each chunk's hierarchy, in one pass over the document.
 
         Args:
-            current_chunk (Dict): The current chunk being processed.
-            chunks (List[Dict]): List of chunks up to and including the current chunk.
-            doc_header_key (str): The key for the headers in the current chunk.
+            chunks (List[Dict]): List of all chunks in the document, in order.
+            doc_header_key (Optional[str]): The key for the headers in each chunk.
+
         Returns:
-            str: Renderted headers in the current chunk's hierarchy.
+            List[str]: Rendered headers in the hierarchy of each chunk.
         """
-        current_hierarchy = {}
-
         if doc_header_key is None:
-            return ""
-
-        # Find the largest/highest level in the current chunk
-        current_chunk_headers = current_chunk.get(doc_header_key, [])
-        highest_level = float("inf")  # Initialize with positive infinity
-        for header_info in current_chunk_headers:
-            level = header_info.get("level")
-            if level is not None and level < highest_level:
-                highest_level = level
-
-        # If no headers found in the current chunk, set highest_level to None
-        if highest_level == float("inf"):
-            highest_level = None
+            return [""] * len(chunks)
 
+        current_hierarchy = {}
+        rendered = []
         for chunk in chunks:
-            for header_info in chunk.get(doc_header_key, []):
+            chunk_headers = chunk.get(doc_header_key, [])
+            for header_info in chunk_headers:
                 header = header_info["header"]
                 level = header_info["level"]
                 if header and level:
@@ -316,10 +297,22 @@ class GatherOperation(BaseOperation):
                         if lower_level in current_hierarchy:
                             current_hierarchy[lower_level] = None
 
-        rendered_headers = [
-            f"{'#' * level} {header}"
-            for level, header in sorted(current_hierarchy.items())
-            if header is not None and (highest_level is None or level < highest_level)
-        ]
-        rendered_headers = " > ".join(rendered_headers)
-        return f"_Current Section:_ {rendered_headers}" if rendered_headers else ""
+            # Find the largest/highest level in the current chunk
+            levels = [
+                header_info.get("level")
+                for header_info in chunk_headers
+                if header_info.get("level") is not None
+            ]
+            highest_level = min(levels) if levels else None
+
+            rendered_headers = " > ".join(
+                f"{'#' * level} {header}"
+                for level, header in sorted(current_hierarchy.items())
+                if header is not None
+                and (highest_level is None or level < highest_level)
+            )
+            rendered.append(
+                f"_Current Section:_ {rendered_headers}" if rendered_headers else ""
+            )
+
+        return rendered
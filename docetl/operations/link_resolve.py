@@ -1,19 +1,39 @@
-from concurrent.futures import ThreadPoolExecutor
-from typing import Any, Dict, List, Tuple
+import heapq
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Tuple
 
-from jinja2 import Template
+import numpy as np
 from rich.prompt import Confirm
 from sklearn.metrics.pairwise import cosine_similarity
 
 from docetl.operations.base import BaseOperation
-from docetl.operations.utils import RichLoopBar, strict_render
+from docetl.operations.utils import (
+    ComparisonCascade,
+    RichLoopBar,
+    compile_template,
+    strict_render,
+    string_similarity,
+    validate_cascade_config,
+)
 
 from .clustering_utils import get_embeddings_for_clustering
 
 
 class LinkResolveOperation(BaseOperation):
     def syntax_check(self) -> None:
-        pass
+        if "comparison_prompt" not in self.config:
+            raise ValueError(
+                "Missing required key 'comparison_prompt' in LinkResolveOperation configuration"
+            )
+
+        try:
+            compile_template(self.config["comparison_prompt"])
+        except Exception as e:
+            raise ValueError(
+                f"Invalid Jinja2 template in 'comparison_prompt': {str(e)}"
+            ) from e
+
+        validate_cascade_config(self.config)
 
     def execute(self, input_data: List[Dict]) -> Tuple[List[Dict], float]:
         """
@@ -29,7 +49,7 @@ class LinkResolveOperation(BaseOperation):
         if len(input_data) == 0:
             return [], 0
 
-        self.prompt_template = Template(self.config["comparison_prompt"])
+        self.prompt_template = compile_template(self.config["comparison_prompt"])
 
         id_key = self.config.get("id_key", "title")
         link_key = self.config.get("link_key", "related_to")
@@ -83,42 +103,147 @@ class LinkResolveOperation(BaseOperation):
             f"({(comparisons_saved / total_possible_comparisons) * 100:.2f}%)[/green]"
         )
 
+        # Candidates are the cells above the blocking threshold, grouped by link
+        # value and ordered from most to least similar within each link
+        link_idxs, id_idxs = np.nonzero(acceptable)
+        scores = similarity_matrix[link_idxs, id_idxs]
+        order = np.lexsort((-scores, link_idxs))
+        link_idxs, id_idxs, scores = link_idxs[order], id_idxs[order], scores[order]
+        link_starts = np.searchsorted(link_idxs, np.arange(len(to_resolve) + 1))
+
         self.replacements = {}
+        resolved = set()
+        total_cost = 0
+
+        def candidate_score(position: int) -> float:
+            if self.cascade.similarity == "embedding":
+                return float(scores[position])
+            return string_similarity(
+                to_resolve[link_idxs[position]], id_values[id_idxs[position]]
+            )
+
+        # Optionally decide candidates with a calibrated cascade of similarity
+        # scores and a cheap model, so only uncertain candidates reach the
+        # comparison model. The calibration sample's labels are reused.
+        self.cascade = None
+        calibrated = set()
+        if self.config.get("cascade") and len(link_idxs):
+            self.cascade = ComparisonCascade(self.config["cascade"], self.console)
+
+            def compare_candidate(position: int, model: str) -> Tuple[bool, float]:
+                id_value = id_values[id_idxs[position]]
+                return self.is_same(
+                    to_resolve[link_idxs[position]],
+                    id_value,
+                    item_by_id[id_value],
+                    model,
+                )
+
+            sample_labels, calibration_cost = self.cascade.calibrate(
+                range(len(link_idxs)),
+                candidate_score,
+                compare_candidate,
+                self.config.get("comparison_model", self.default_model),
+                self.max_threads,
+            )
+            total_cost += calibration_cost
+            calibrated.update(sample_labels)
+            for position in sorted(
+                sample_labels, key=lambda position: -scores[position]
+            ):
+                link_idx = int(link_idxs[position])
+                if sample_labels[position] and link_idx not in resolved:
+                    resolved.add(link_idx)
+                    self.replacements[to_resolve[link_idx]] = id_values[
+                        id_idxs[position]
+                    ]
+
+        # Each link value has at most one comparison in flight, starting with its
+        # most similar candidate. Its next candidate is only compared if the
+        # previous one wasn't a match, so links stop at their first match.
+        cursor = link_starts[:-1].copy()
+        ready = []
+
+        def remaining_candidates(link_idx: int) -> int:
+            return sum(
+                1
+                for position in range(cursor[link_idx], link_starts[link_idx + 1])
+                if position not in calibrated
+            )
+
+        def push_link(link_idx: int) -> None:
+            end = link_starts[link_idx + 1]
+            while cursor[link_idx] < end and int(cursor[link_idx]) in calibrated:
+                cursor[link_idx] += 1
+            if link_idx not in resolved and cursor[link_idx] < end:
+                heapq.heappush(ready, (-scores[cursor[link_idx]], link_idx))
+
+        # Links resolved during calibration never compare their remaining
+        # candidates, so they are left out of the progress total
+        skipped_comparisons = 0
+        total_comparisons = 0
+        for link_idx in np.unique(link_idxs):
+            link_idx = int(link_idx)
+            push_link(link_idx)
+            if link_idx in resolved:
+                skipped_comparisons += remaining_candidates(link_idx)
+            else:
+                total_comparisons += remaining_candidates(link_idx)
 
         batch_size = self.config.get("compare_batch_size", 100)
-        with ThreadPoolExecutor(max_workers=batch_size) as executor:
-
-            futures = []
-            for link_idx in range(acceptable.shape[0]):
-                for id_idx in range(acceptable.shape[1]):
-                    if not acceptable[link_idx, id_idx]:
-                        continue
-
-                    id_value = id_values[id_idx]
-                    link_value = to_resolve[link_idx]
-                    item = item_by_id[id_value]
-
-                    futures.append(
-                        executor.submit(
-                            self.compare,
-                            link_idx=link_idx,
-                            id_idx=id_idx,
-                            link_value=link_value,
-                            id_value=id_value,
-                            item=item,
-                        )
+        with ThreadPoolExecutor(max_workers=batch_size) as executor, RichLoopBar(
+            total=total_comparisons,
+            desc=f"Processing {self.config['name']} (link_resolve) comparisons",
+            console=self.console,
+        ) as pbar:
+            future_to_position = {}
+
+            def fill_window() -> None:
+                while ready and len(future_to_position) < batch_size:
+                    _, link_idx = heapq.heappop(ready)
+                    position = int(cursor[link_idx])
+                    cursor[link_idx] += 1
+                    id_value = id_values[id_idxs[position]]
+                    future = executor.submit(
+                        self.compare,
+                        link_value=to_resolve[link_idx],
+                        id_value=id_value,
+                        item=item_by_id[id_value],
+                        score=(
+                            candidate_score(position)
+                            if self.cascade is not None
+                            else None
+                        ),
                     )
-
-            total_cost = 0
-            pbar = RichLoopBar(
-                range(len(futures)),
-                desc=f"Processing {self.config['name']} (map) on all documents",
-                console=self.console,
-            )
-            for i in pbar:
-                total_cost += futures[i].result()
-                pbar.update(i)
+                    future_to_position[future] = position
+
+            fill_window()
+            while future_to_position:
+                done, _ = wait(future_to_position, return_when=FIRST_COMPLETED)
+                for future in done:
+                    position = future_to_position.pop(future)
+                    link_idx = int(link_idxs[position])
+                    is_same, cost = future.result()
+                    total_cost += cost
+                    pbar.update()
+                    if is_same:
+                        resolved.add(link_idx)
+                        self.replacements[to_resolve[link_idx]] = id_values[
+                            id_idxs[position]
+                        ]
+                        remaining = remaining_candidates(link_idx)
+                        skipped_comparisons += remaining
+                        pbar.update(remaining)
+                    else:
+                        push_link(link_idx)
+                fill_window()
+
+        if self.cascade is not None:
+            self.cascade.log_summary()
 
+        self.console.log(
+            f"[green]Skipped {skipped_comparisons} comparisons for link values that were already resolved[/green]"
+        )
         self.console.log(
             f"[green]Number of replacements found: {len(self.replacements)} "
             f"({(len(self.replacements) / total_possible_comparisons) * 100:.2f}% of all comparisons)[/green]"
@@ -131,7 +256,22 @@ class LinkResolveOperation(BaseOperation):
 
         return input_data, total_cost
 
-    def compare(self, link_idx, id_idx, link_value, id_value, item):
+    def compare(
+        self, link_value, id_value, item, score: Optional[float] = None
+    ) -> Tuple[bool, float]:
+        model = self.config.get("comparison_model", self.default_model)
+        if self.cascade is not None:
+            return self.cascade.compare(
+                (link_value, id_value, item),
+                score,
+                lambda candidate, model: self.is_same(*candidate, model),
+                model,
+            )
+        return self.is_same(link_value, id_value, item, model)
+
+    def is_same(
+        self, link_value, id_value, item, model: Optional[str] = None
+    ) -> Tuple[bool, float]:
         prompt = strict_render(
             self.prompt_template,
             {"link_value": link_value, "id_value": id_value, "item": item},
@@ -150,9 +290,9 @@ class LinkResolveOperation(BaseOperation):
             return output, False
 
         response = self.runner.api.call_llm(
-            model=self.config.get("comparison_model", self.default_model),
+            model=model or self.config.get("comparison_model", self.default_model),
             op_type="link_resolve",
-            messages=[{"role": "user", "content": prompt}],
+            messages=[self.prompt_message(self.config["comparison_prompt"], prompt)],
             output_schema=schema,
             timeout_seconds=self.config.get("timeout", 120),
             bypass_cache=self.config.get("bypass_cache", False),
@@ -170,13 +310,13 @@ class LinkResolveOperation(BaseOperation):
             litellm_completion_kwargs=self.config.get("litellm_completion_kwargs", {}),
         )
 
+        is_same = False
         if response.validated:
             output = self.runner.api.parse_llm_response(
                 response.response,
                 schema=schema,
                 manually_fix_errors=self.manually_fix_errors,
             )[0]
-            if output["is_same"]:
-                self.replacements[link_value] = id_value
+            is_same = output["is_same"]
 
-        return response.total_cost
+        return is_same, response.total_cost
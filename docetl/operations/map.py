@@ -2,17 +2,28 @@
 The `MapOperation` and `ParallelMapOperation` classes are subclasses of `BaseOperation` that perform mapping operations on input data. They use LLM-based processing to transform input items into output items based on specified prompts and schemas, and can also perform key dropping operations.
 """
 
+import json
 from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Optional, Tuple, Union
 
 from jinja2 import Template
+from litellm import model_cost
 from litellm.utils import ModelResponse
 from pydantic import Field, field_validator
 from tqdm import tqdm
 
 from docetl.base_schemas import Tool, ToolFunction
 from docetl.operations.base import BaseOperation
-from docetl.operations.utils import RichLoopBar, strict_render
+from docetl.operations.utils import (
+    ProviderBatch,
+    RichLoopBar,
+    bounded_submit,
+    compile_template,
+    convert_dict_schema_to_list_schema,
+    strict_render,
+    validate_execution_mode,
+)
+from docetl.utils import count_tokens
 
 
 class MapOperation(BaseOperation):
@@ -36,6 +47,12 @@ class MapOperation(BaseOperation):
         batch_size: Optional[int] = None
         clustering_method: Optional[str] = None
         batch_prompt: Optional[str] = None
+        dynamic_batching: bool = False
+        batch_token_budget: Optional[int] = None
+        max_in_flight_batches: Optional[int] = None
+        preserve_order: bool = True
+        execution_mode: str = "sync"
+        batch_job: Optional[Dict[str, Any]] = None
         litellm_completion_kwargs: Dict[str, Any] = {}
 
         @field_validator("drop_keys")
@@ -78,6 +95,7 @@ class MapOperation(BaseOperation):
                 template = Template(config.batch_prompt)
                 # Test render with a minimal inputs list to validate template
                 template.render(inputs=[{}])
+                compile_template(config.batch_prompt)
             except Exception as e:
                 raise ValueError(
                     f"Invalid Jinja2 template in 'batch_prompt' or missing required 'inputs' variable: {str(e)}"
@@ -95,7 +113,7 @@ class MapOperation(BaseOperation):
 
             if config.prompt:
                 try:
-                    Template(config.prompt)
+                    compile_template(config.prompt)
                 except Exception as e:
                     raise ValueError(
                         f"Invalid Jinja2 template in 'prompt': {str(e)}"
@@ -127,6 +145,17 @@ class MapOperation(BaseOperation):
 
             self.gleaning_check()
 
+        if (
+            config.max_in_flight_batches is not None
+            and config.max_in_flight_batches <= 0
+        ):
+            raise ValueError("'max_in_flight_batches' must be a positive integer")
+
+        if config.batch_token_budget is not None and config.batch_token_budget <= 0:
+            raise ValueError("'batch_token_budget' must be a positive integer")
+
+        validate_execution_mode(self.config)
+
     def execute(self, input_data: List[Dict]) -> Tuple[List[Dict], float]:
         """
         Executes the map operation on the provided input data.
@@ -194,7 +223,7 @@ class MapOperation(BaseOperation):
             llm_result = self.runner.api.call_llm(
                 self.config.get("model", self.default_model),
                 "map",
-                [{"role": "user", "content": prompt}],
+                [self.prompt_message(self.config["prompt"], prompt)],
                 self.config["output"]["schema"],
                 tools=self.config.get("tools", None),
                 scratchpad=None,
@@ -231,7 +260,9 @@ class MapOperation(BaseOperation):
                     output = llm_result.response
 
                 # Augment the output with the original item
-                output = {**item, **output}
+                output = self._build_output(item, output)
+                if output is None:
+                    return None, llm_result.total_cost
                 if self.config.get("enable_observability", False):
                     output[f"_observability_{self.config['name']}"] = {"prompt": prompt}
                 return output, llm_result.total_cost
@@ -250,7 +281,7 @@ class MapOperation(BaseOperation):
                 llm_result = self.runner.api.call_llm_batch(
                     self.config.get("model", self.default_model),
                     "batch map",
-                    [{"role": "user", "content": batch_prompt}],
+                    [self.prompt_message(self.config["batch_prompt"], batch_prompt)],
                     self.config["output"]["schema"],
                     verbose=self.config.get("verbose", False),
                     timeout_seconds=self.config.get("timeout", 120),
@@ -320,21 +351,43 @@ class MapOperation(BaseOperation):
             # Return items and cost
             return all_results, total_cost
 
-        with ThreadPoolExecutor(max_workers=self.max_batch_size) as executor:
+        if self.config.get("batch_prompt") and self.config.get(
+            "dynamic_batching", False
+        ):
+            batch_bounds = self._token_budget_batch_bounds(input_data)
+        else:
             batch_size = self.max_batch_size if self.max_batch_size is not None else 1
-            futures = []
-            for i in range(0, len(input_data), batch_size):
-                batch = input_data[i : i + batch_size]
-                futures.append(executor.submit(_process_map_batch, batch))
-            results = []
-            total_cost = 0
-            pbar = RichLoopBar(
-                range(len(futures)),
-                desc=f"Processing {self.config['name']} (map) on all documents",
-                console=self.console,
-            )
-            for i in pbar:
-                result_list, item_cost = futures[i].result()
+            batch_bounds = [
+                (i, min(i + batch_size, len(input_data)))
+                for i in range(0, len(input_data), batch_size)
+            ]
+        batches = (input_data[start:end] for start, end in batch_bounds)
+        # Keep a bounded number of batches in flight, so pending work and
+        # finished-but-unconsumed results don't grow with the input size
+        max_in_flight = self.config.get("max_in_flight_batches", self.max_threads * 4)
+        preserve_order = self.config.get("preserve_order", True)
+        results = []
+        total_cost = 0
+        # In batch execution mode, every call is sent to the provider's batch
+        # API up front; the calls below then consume the fetched responses
+        provider_batch = ProviderBatch(self.runner, self.config, self.console)
+        if provider_batch.enabled:
+            self._add_batch_requests(provider_batch, input_data, batch_bounds)
+            total_cost += provider_batch.run()
+        with provider_batch, ThreadPoolExecutor(
+            max_workers=self.max_batch_size
+        ) as executor, RichLoopBar(
+            total=len(batch_bounds),
+            desc=f"Processing {self.config['name']} (map) on all documents",
+            console=self.console,
+        ) as pbar:
+            for _, (result_list, item_cost) in bounded_submit(
+                executor,
+                _process_map_batch,
+                batches,
+                max_in_flight,
+                ordered=preserve_order,
+            ):
                 if result_list:
                     if "drop_keys" in self.config:
                         result_list = [
@@ -347,12 +400,105 @@ class MapOperation(BaseOperation):
                         ]
                     results.extend(result_list)
                 total_cost += item_cost
+                pbar.update()
 
         if self.status:
             self.status.start()
 
         return results, total_cost
 
+    def _build_output(self, item: Dict, output: Dict) -> Optional[Dict]:
+        """
+        Merges the LLM output for an item into the item. Subclasses can return
+        None to drop the item without building its output.
+        """
+        return {**item, **output}
+
+    def _add_batch_requests(
+        self,
+        provider_batch: ProviderBatch,
+        input_data: List[Dict],
+        batch_bounds: List[Tuple[int, int]],
+    ) -> None:
+        """
+        Queues the LLM call each batch of documents starts with: one call per
+        batch when there's a batch prompt, otherwise one call per document.
+        """
+        model = self.config.get("model", self.default_model)
+        output_schema = self.config["output"]["schema"]
+        litellm_completion_kwargs = self.config.get("litellm_completion_kwargs", {})
+        for start, end in batch_bounds:
+            if end - start > 1 and self.config.get("batch_prompt"):
+                batch_prompt = strict_render(
+                    self.config["batch_prompt"], {"inputs": input_data[start:end]}
+                )
+                provider_batch.add(
+                    model,
+                    "batch map",
+                    [self.prompt_message(self.config["batch_prompt"], batch_prompt)],
+                    convert_dict_schema_to_list_schema(output_schema),
+                    litellm_completion_kwargs=litellm_completion_kwargs,
+                )
+                continue
+            for item in input_data[start:end]:
+                prompt = strict_render(self.config["prompt"], {"input": item})
+                provider_batch.add(
+                    model,
+                    "map",
+                    [self.prompt_message(self.config["prompt"], prompt)],
+                    output_schema,
+                    tools=self.config.get("tools", None),
+                    litellm_completion_kwargs=litellm_completion_kwargs,
+                )
+
+    def _token_budget_batch_bounds(
+        self, input_data: List[Dict]
+    ) -> List[Tuple[int, int]]:
+        """
+        Packs consecutive documents into batches that stay within a token budget
+        per call, so batches of long documents don't overflow the context window
+        and batches of short documents carry as many documents as fit.
+
+        The budget is `batch_token_budget` if set, and otherwise 80% of the
+        model's `max_input_tokens` minus the batch prompt template itself. A
+        document larger than the budget gets a batch of its own. If
+        `max_batch_size` is set, it still caps the number of documents per batch.
+
+        Args:
+            input_data (List[Dict]): The documents to batch.
+
+        Returns:
+            List[Tuple[int, int]]: The (start, end) slice of each batch.
+        """
+        model = self.config.get("model", self.default_model)
+        budget = self.config.get("batch_token_budget")
+        if budget is None:
+            max_input_tokens = model_cost.get(model, {}).get("max_input_tokens", 8192)
+            budget = int(max_input_tokens * 0.8) - count_tokens(
+                self.config["batch_prompt"], model
+            )
+
+        bounds = []
+        start = 0
+        used_tokens = 0
+        for i, item in enumerate(input_data):
+            item_tokens = count_tokens(json.dumps(item, default=str), model)
+            if i > start and (
+                used_tokens + item_tokens > budget
+                or (self.max_batch_size and i - start >= self.max_batch_size)
+            ):
+                bounds.append((start, i))
+                start = i
+                used_tokens = 0
+            used_tokens += item_tokens
+        if start < len(input_data):
+            bounds.append((start, len(input_data)))
+
+        self.console.log(
+            f"Packed {len(input_data)} documents into {len(bounds)} batches of at most {budget} tokens"
+        )
+        return bounds
+
 
 class ParallelMapOperation(BaseOperation):
     class schema(BaseOperation.schema):
@@ -360,6 +506,8 @@ class ParallelMapOperation(BaseOperation):
         prompts: List[Dict[str, Any]]
         output: Dict[str, Any]
         enable_observability: bool = False
+        execution_mode: str = "sync"
+        batch_job: Optional[Dict[str, Any]] = None
 
     def __init__(
         self,
@@ -425,7 +573,7 @@ class ParallelMapOperation(BaseOperation):
 
                 # Check if the prompt is a valid Jinja2 template
                 try:
-                    Template(prompt_config["prompt"])
+                    compile_template(prompt_config["prompt"])
                 except Exception as e:
                     raise ValueError(
                         f"Invalid Jinja2 template in prompt configuration {i}: {str(e)}"
@@ -451,6 +599,8 @@ class ParallelMapOperation(BaseOperation):
                     f"The following output schema keys are not covered by any prompt: {missing_keys}"
                 )
 
+        validate_execution_mode(self.config)
+
     def execute(self, input_data: List[Dict]) -> Tuple[List[Dict], float]:
         """
         Executes the parallel map operation on the provided input data.
@@ -500,7 +650,7 @@ class ParallelMapOperation(BaseOperation):
             response = self.runner.api.call_llm(
                 model,
                 "parallel_map",
-                [{"role": "user", "content": prompt}],
+                [self.prompt_message(prompt_config["prompt"], prompt)],
                 local_output_schema,
                 tools=prompt_config.get("tools", None),
                 timeout_seconds=self.config.get("timeout", 120),
@@ -518,7 +668,29 @@ class ParallelMapOperation(BaseOperation):
             )[0]
             return output, prompt, response.total_cost
 
-        with ThreadPoolExecutor(max_workers=self.max_threads) as executor:
+        provider_batch = ProviderBatch(self.runner, self.config, self.console)
+        if provider_batch.enabled:
+            for item in input_data:
+                for prompt_config in self.config["prompts"]:
+                    prompt = strict_render(prompt_config["prompt"], {"input": item})
+                    provider_batch.add(
+                        prompt_config.get("model") or self.default_model,
+                        "parallel_map",
+                        [self.prompt_message(prompt_config["prompt"], prompt)],
+                        {
+                            key: output_schema[key]
+                            for key in prompt_config["output_keys"]
+                        },
+                        tools=prompt_config.get("tools", None),
+                        litellm_completion_kwargs=self.config.get(
+                            "litellm_completion_kwargs", {}
+                        ),
+                    )
+            total_cost += provider_batch.run()
+
+        with provider_batch, ThreadPoolExecutor(
+            max_workers=self.max_threads
+        ) as executor:
             if "prompts" in self.config:
                 # Create all futures at once
                 all_futures = [
@@ -16,16 +16,20 @@ from typing import Any, Dict, List, Optional, Tuple, Union
 
 import jinja2
 import numpy as np
-from jinja2 import Template
 from pydantic import Field
 
 from docetl.operations.base import BaseOperation
 from docetl.operations.clustering_utils import (
-    cluster_documents,
+    cluster_embeddings,
     get_embeddings_for_clustering,
 )
-from docetl.operations.utils import rich_as_completed, strict_render
-from docetl.utils import completion_cost
+from docetl.operations.utils import (
+    LatencyProfile,
+    compile_template,
+    group_items,
+    rich_as_completed,
+    strict_render,
+)
 
 
 class ReduceOperation(BaseOperation):
@@ -47,6 +51,7 @@ class ReduceOperation(BaseOperation):
         input: Optional[Dict[str, Any]] = None
         pass_through: Optional[bool] = None
         associative: Optional[bool] = None
+        ordered_merge: Optional[bool] = None
         fold_prompt: Optional[str] = None
         fold_batch_size: Optional[int] = None
         value_sampling: Optional[Dict[str, Any]] = None
@@ -68,6 +73,7 @@ class ReduceOperation(BaseOperation):
         self.max_samples = 1000
         self.fold_times = deque(maxlen=self.max_samples)
         self.merge_times = deque(maxlen=self.max_samples)
+        self.latency_profile = LatencyProfile()
         self.lock = Lock()
         self.config["reduce_key"] = (
             [self.config["reduce_key"]]
@@ -125,7 +131,7 @@ class ReduceOperation(BaseOperation):
 
         # Check if the prompt is a valid Jinja2 template
         try:
-            template = Template(self.config["prompt"])
+            template = compile_template(self.config["prompt"])
             template_vars = template.environment.parse(self.config["prompt"]).find_all(
                 jinja2.nodes.Name
             )
@@ -140,12 +146,23 @@ class ReduceOperation(BaseOperation):
             )
 
         # Check if fold_prompt is a valid Jinja2 template (now required if merge exists)
-        if "merge_prompt" in self.config:
+        if "merge_prompt" in self.config and not self.config.get("ordered_merge"):
             if "fold_prompt" not in self.config:
                 raise ValueError(
                     f"'fold_prompt' is required when 'merge_prompt' is specified in {self.config['name']}"
                 )
 
+        if self.config.get("ordered_merge"):
+            for key in ["merge_prompt", "fold_batch_size"]:
+                if key not in self.config:
+                    raise ValueError(
+                        f"'{key}' is required when 'ordered_merge' is enabled in {self.config['name']}"
+                    )
+            if self.config.get("merge_batch_size", 2) < 2:
+                raise ValueError(
+                    f"'merge_batch_size' in {self.config['name']} must be at least 2 for 'ordered_merge'"
+                )
+
         if "fold_prompt" in self.config:
             if "fold_batch_size" not in self.config:
                 raise ValueError(
@@ -153,7 +170,7 @@ class ReduceOperation(BaseOperation):
                 )
 
             try:
-                fold_template = Template(self.config["fold_prompt"])
+                fold_template = compile_template(self.config["fold_prompt"])
                 fold_template_vars = fold_template.environment.parse(
                     self.config["fold_prompt"]
                 ).find_all(jinja2.nodes.Name)
@@ -176,7 +193,7 @@ class ReduceOperation(BaseOperation):
                 )
 
             try:
-                merge_template = Template(self.config["merge_prompt"])
+                merge_template = compile_template(self.config["merge_prompt"])
                 merge_template_vars = merge_template.environment.parse(
                     self.config["merge_prompt"]
                 ).find_all(jinja2.nodes.Name)
@@ -325,71 +342,76 @@ class ReduceOperation(BaseOperation):
             grouped_data = [("_all", input_data)]
         else:
             # Group the input data by the reduce key(s) while maintaining original order
-            def get_group_key(item):
-                key_values = []
-                for key in reduce_keys:
-                    value = item[key]
-                    # Special handling for list-type values
-                    if isinstance(value, list):
-                        key_values.append(
-                            tuple(sorted(value))
-                        )  # Convert list to sorted tuple
-                    else:
-                        key_values.append(value)
-                return tuple(key_values)
-
-            grouped_data = {}
-            for item in input_data:
-                key = get_group_key(item)
-                if key not in grouped_data:
-                    grouped_data[key] = []
-                grouped_data[key].append(item)
-
-            # Convert the grouped data to a list of tuples
-            grouped_data = list(grouped_data.items())
+            grouped_data = group_items(input_data, reduce_keys)
 
-        def process_group(
-            key: Tuple, group_elems: List[Dict]
-        ) -> Tuple[Optional[Dict], float]:
+        # Start the largest groups first, so that the groups that take longest
+        # to reduce are not left running alone at the end
+        grouped_data.sort(key=lambda group: len(group[1]), reverse=True)
+
+        def select_input(group_elems: List[Dict]) -> List[Dict]:
             if input_schema:
-                group_list = [
+                return [
                     {k: item[k] for k in input_schema.keys() if k in item}
                     for item in group_elems
                 ]
-            else:
-                group_list = group_elems
+            return group_elems
+
+        # Embed the items of all groups to sample up front, in one pass
+        value_sampling = self.config.get("value_sampling", {})
+        sampling_embeddings = [None] * len(grouped_data)
+        embedding_cost = 0.0
+        if value_sampling.get("enabled", False) and value_sampling["method"] in [
+            "cluster",
+            "sem_sim",
+        ]:
+            sampling_embeddings, embedding_cost = self._embed_for_sampling(
+                [(key, select_input(group)) for key, group in grouped_data],
+                value_sampling,
+            )
 
+        def process_group(
+            key: Tuple,
+            group_elems: List[Dict],
+            embeddings: Optional[Tuple[List[List[float]], Optional[List[float]]]],
+        ) -> Tuple[Optional[Dict], float]:
+            group_list = select_input(group_elems)
             total_cost = 0.0
 
             # Apply value sampling if enabled
-            value_sampling = self.config.get("value_sampling", {})
-            if value_sampling.get("enabled", False):
-                sample_size = min(value_sampling["sample_size"], len(group_list))
+            if (
+                value_sampling.get("enabled", False)
+                and len(group_list) > value_sampling["sample_size"]
+            ):
+                sample_size = value_sampling["sample_size"]
                 method = value_sampling["method"]
 
                 if method == "random":
-                    group_sample = random.sample(group_list, sample_size)
-                    group_sample.sort(key=lambda x: group_list.index(x))
+                    sample_indices = random.sample(range(len(group_list)), sample_size)
                 elif method == "first_n":
-                    group_sample = group_list[:sample_size]
+                    sample_indices = range(sample_size)
                 elif method == "cluster":
-                    group_sample, embedding_cost = self._cluster_based_sampling(
-                        group_list, value_sampling, sample_size
+                    sample_indices = self._cluster_based_sampling(
+                        embeddings[0], sample_size
                     )
-                    group_sample.sort(key=lambda x: group_list.index(x))
-                    total_cost += embedding_cost
                 elif method == "sem_sim":
-                    group_sample, embedding_cost = self._semantic_similarity_sampling(
-                        key, group_list, value_sampling, sample_size
+                    sample_indices = self._semantic_similarity_sampling(
+                        embeddings[0], embeddings[1], sample_size
                     )
-                    group_sample.sort(key=lambda x: group_list.index(x))
-                    total_cost += embedding_cost
 
-                group_list = group_sample
+                # Keep the sampled items in their original order
+                group_list = [group_list[i] for i in sorted(sample_indices)]
 
+            # Order-sensitive reduces can still merge, as long as only adjacent
+            # results are merged, in order
+            if "merge_prompt" in self.config and self.config.get("ordered_merge"):
+                result, prompts, cost = self._ordered_fold_and_merge(
+                    key, group_list, task_pool
+                )
             # Only execute merge-based plans if associative = True
-            if "merge_prompt" in self.config and self.config.get("associative", True):
-                result, prompts, cost = self._parallel_fold_and_merge(key, group_list)
+            elif "merge_prompt" in self.config and self.config.get("associative", True):
+                result, prompts, cost = self._parallel_fold_and_merge(
+                    key, group_list, task_pool
+                )
             elif self.config.get("fold_batch_size", None) and self.config.get(
                 "fold_batch_size"
             ) >= len(group_list):
@@ -435,13 +457,16 @@ class ReduceOperation(BaseOperation):
 
             return result, total_cost
 
-        with ThreadPoolExecutor(max_workers=self.max_threads) as executor:
+        # Fold and merge calls from every group share one bounded task pool, instead
+        # of each large group opening a nested pool of its own
+        task_pool = ThreadPoolExecutor(max_workers=self.max_threads)
+        with task_pool, ThreadPoolExecutor(max_workers=self.max_threads) as executor:
             futures = [
-                executor.submit(process_group, key, group)
-                for key, group in grouped_data
+                executor.submit(process_group, key, group, embeddings)
+                for (key, group), embeddings in zip(grouped_data, sampling_embeddings)
             ]
             results = []
-            total_cost = 0
+            total_cost = embedding_cost
             for future in rich_as_completed(
                 futures,
                 total=len(futures),
@@ -462,75 +487,101 @@ class ReduceOperation(BaseOperation):
                         self.intermediates[key]
                     )
 
+        self.latency_profile.save()
+        if self.config.get("verbose", False):
+            for step in ["fold", "merge"]:
+                stats = self.latency_profile.stats(*self.latency_profile_key(step))
+                if stats:
+                    self.console.log(
+                        f"{step.capitalize()} latency over the last {stats['count']} calls: "
+                        f"p50 {stats['p50']:.2f}s, p95 {stats['p95']:.2f}s"
+                    )
+
         if self.status:
             self.status.start()
 
         return results, total_cost
 
-    def _cluster_based_sampling(
-        self, group_list: List[Dict], value_sampling: Dict, sample_size: int
-    ) -> Tuple[List[Dict], float]:
-        if sample_size >= len(group_list):
-            return group_list, 0
-
-        clusters, cost = cluster_documents(
-            group_list, value_sampling, sample_size, self.runner.api
-        )
+    def _embed_for_sampling(
+        self, groups: List[Tuple[Tuple, List[Dict]]], value_sampling: Dict
+    ) -> Tuple[List[Optional[Tuple[List[List[float]], Optional[List[float]]]]], float]:
+        """
+        Embed the items of all groups that value sampling will subsample, in one pass.
 
-        sampled_items = []
-        idx_added_already = set()
-        num_clusters = len(clusters)
-        for i in range(sample_size):
-            # Add a random item from the cluster
-            idx = i % num_clusters
+        Groups that are no larger than the sample size are kept whole and not
+        embedded. For semantic similarity sampling, the query text of every group
+        is embedded in one extra pass, batched the same way.
 
-            # Skip if there are no items in the cluster
-            if len(clusters[idx]) == 0:
-                continue
+        Args:
+            groups (List[Tuple[Tuple, List[Dict]]]): The reduce key and items of each group.
+            value_sampling (Dict): The value sampling configuration.
 
-            if len(clusters[idx]) == 1:
-                # If there's only one item in the cluster, add it directly if we haven't already
-                if idx not in idx_added_already:
-                    sampled_items.append(clusters[idx][0])
-                continue
+        Returns:
+            Tuple[List[Optional[Tuple[List[List[float]], Optional[List[float]]]]], float]: For each group, the
+            item embeddings and query embedding (or None if the group is not sampled), and the total embedding cost.
+        """
+        sample_size = value_sampling["sample_size"]
+        sampled = [i for i, (_, items) in enumerate(groups) if len(items) > sample_size]
+        group_embeddings = [None] * len(groups)
+        if not sampled:
+            return group_embeddings, 0
 
-            random_choice_idx = random.randint(0, len(clusters[idx]) - 1)
-            max_attempts = 10
-            while random_choice_idx in idx_added_already and max_attempts > 0:
-                random_choice_idx = random.randint(0, len(clusters[idx]) - 1)
-                max_attempts -= 1
-            idx_added_already.add(random_choice_idx)
-            sampled_items.append(clusters[idx][random_choice_idx])
+        embeddings, cost = get_embeddings_for_clustering(
+            [item for i in sampled for item in groups[i][1]],
+            value_sampling,
+            self.runner.api,
+        )
 
-        return sampled_items, cost
+        query_embeddings = [None] * len(sampled)
+        if value_sampling["method"] == "sem_sim":
+            query_texts = [
+                {
+                    "query": strict_render(
+                        value_sampling["query_text"],
+                        {
+                            "reduce_key": dict(
+                                zip(self.config["reduce_key"], groups[i][0])
+                            )
+                        },
+                    )
+                }
+                for i in sampled
+            ]
+            query_embeddings, query_cost = get_embeddings_for_clustering(
+                query_texts,
+                {**value_sampling, "embedding_keys": ["query"]},
+                self.runner.api,
+            )
+            cost += query_cost
 
-    def _semantic_similarity_sampling(
-        self, key: Tuple, group_list: List[Dict], value_sampling: Dict, sample_size: int
-    ) -> Tuple[List[Dict], float]:
-        embedding_model = value_sampling["embedding_model"]
-        query_text = strict_render(
-            value_sampling["query_text"],
-            {"reduce_key": dict(zip(self.config["reduce_key"], key))},
-        )
+        start = 0
+        for i, query_embedding in zip(sampled, query_embeddings):
+            end = start + len(groups[i][1])
+            group_embeddings[i] = (embeddings[start:end], query_embedding)
+            start = end
 
-        embeddings, cost = get_embeddings_for_clustering(
-            group_list, value_sampling, self.runner.api
-        )
+        return group_embeddings, cost
 
-        query_response = self.runner.api.gen_embedding(embedding_model, [query_text])
-        query_embedding = query_response["data"][0]["embedding"]
-        cost += completion_cost(query_response)
+    def _cluster_based_sampling(
+        self, embeddings: List[List[float]], sample_size: int
+    ) -> List[int]:
+        # Take one random item from each of sample_size clusters
+        clusters = cluster_embeddings(embeddings, sample_size)
+        return [random.choice(indices) for indices in clusters.values() if indices]
 
+    def _semantic_similarity_sampling(
+        self,
+        embeddings: List[List[float]],
+        query_embedding: List[float],
+        sample_size: int,
+    ) -> List[int]:
         from sklearn.metrics.pairwise import cosine_similarity
 
         similarities = cosine_similarity([query_embedding], embeddings)[0]
-
-        top_k_indices = np.argsort(similarities)[-sample_size:]
-
-        return [group_list[i] for i in top_k_indices], cost
+        return np.argsort(similarities)[-sample_size:].tolist()
 
     def _parallel_fold_and_merge(
-        self, key: Tuple, group_list: List[Dict]
+        self, key: Tuple, group_list: List[Dict], executor: ThreadPoolExecutor
     ) -> Tuple[Optional[Dict], float]:
         """
         Perform parallel folding and merging on a group of items.
@@ -548,6 +599,7 @@ class ReduceOperation(BaseOperation):
         Args:
             key (Tuple): The reduce key tuple for the group.
             group_list (List[Dict]): The list of items in the group to be processed.
+            executor (ThreadPoolExecutor): The pool shared by all groups that runs the fold and merge calls.
 
         Returns:
             Tuple[Optional[Dict], float]: A tuple containing the final merged result (or None if processing failed)
@@ -582,86 +634,43 @@ class ReduceOperation(BaseOperation):
             iter_count = 0
 
         # Parallel folding and merging
-        with ThreadPoolExecutor(max_workers=self.max_threads) as executor:
-            while remaining_items:
-                # Folding phase
-                fold_futures = []
-                for i in range(min(num_parallel_folds, len(remaining_items))):
-                    batch = remaining_items[:fold_batch_size]
-                    remaining_items = remaining_items[fold_batch_size:]
-                    current_output = fold_results[i] if i < len(fold_results) else None
-                    fold_futures.append(
-                        executor.submit(
-                            self._increment_fold, key, batch, current_output
-                        )
-                    )
-
-                new_fold_results = []
-                for future in as_completed(fold_futures):
-                    result, prompt, cost = future.result()
-                    total_cost += cost
-                    prompts.append(prompt)
-                    if result is not None:
-                        new_fold_results.append(result)
-                        if self.config.get("persist_intermediates", False):
-                            self.intermediates[key].append(
-                                {
-                                    "iter": iter_count,
-                                    "intermediate": result,
-                                    "scratchpad": result["updated_scratchpad"],
-                                }
-                            )
-                            iter_count += 1
-
-                # Update fold_results with new results
-                fold_results = new_fold_results + fold_results[len(new_fold_results) :]
+        while remaining_items:
+            # Folding phase
+            fold_futures = []
+            num_batches = math.ceil(len(remaining_items) / fold_batch_size)
+            for i in range(min(num_parallel_folds, num_batches)):
+                batch = remaining_items[:fold_batch_size]
+                remaining_items = remaining_items[fold_batch_size:]
+                current_output = fold_results[i] if i < len(fold_results) else None
+                fold_futures.append(
+                    executor.submit(self._increment_fold, key, batch, current_output)
+                )
 
-                # Single pass merging phase
-                if (
-                    len(self.merge_times) < self.min_samples
-                    and len(fold_results) >= merge_batch_size
-                ):
-                    merge_futures = []
-                    for i in range(0, len(fold_results), merge_batch_size):
-                        batch = fold_results[i : i + merge_batch_size]
-                        merge_futures.append(
-                            executor.submit(self._merge_results, key, batch)
+            new_fold_results = []
+            for future in as_completed(fold_futures):
+                result, prompt, cost = future.result()
+                total_cost += cost
+                prompts.append(prompt)
+                if result is not None:
+                    new_fold_results.append(result)
+                    if self.config.get("persist_intermediates", False):
+                        self.intermediates[key].append(
+                            {
+                                "iter": iter_count,
+                                "intermediate": result,
+                                "scratchpad": result["updated_scratchpad"],
+                            }
                         )
+                        iter_count += 1
 
-                    new_results = []
-                    for future in as_completed(merge_futures):
-                        result, prompt, cost = future.result()
-                        total_cost += cost
-                        prompts.append(prompt)
-                        if result is not None:
-                            new_results.append(result)
-                            if self.config.get("persist_intermediates", False):
-                                self.intermediates[key].append(
-                                    {
-                                        "iter": iter_count,
-                                        "intermediate": result,
-                                        "scratchpad": None,
-                                    }
-                                )
-                                iter_count += 1
-
-                    fold_results = new_results
-
-                # Recalculate num_parallel_folds if we used default times
-                if used_default_times:
-                    new_num_parallel_folds, used_default_times = (
-                        calculate_num_parallel_folds()
-                    )
-                    if not used_default_times:
-                        self.console.log(
-                            f"Recalculated num_parallel_folds from {num_parallel_folds} to {new_num_parallel_folds}"
-                        )
-                        num_parallel_folds = new_num_parallel_folds
+            # Update fold_results with new results
+            fold_results = new_fold_results + fold_results[len(new_fold_results) :]
 
-        # Final merging if needed
-        while len(fold_results) > 1:
-            self.console.log(f"Finished folding! Merging {len(fold_results)} items.")
-            with ThreadPoolExecutor(max_workers=self.max_threads) as executor:
+            # Single pass merging phase
+            if (
+                len(self.merge_times) < self.min_samples
+                and len(fold_results) >= merge_batch_size
+            ):
                 merge_futures = []
                 for i in range(0, len(fold_results), merge_batch_size):
                     batch = fold_results[i : i + merge_batch_size]
@@ -688,12 +697,127 @@ class ReduceOperation(BaseOperation):
 
                 fold_results = new_results
 
+            # Recalculate num_parallel_folds if we used default times
+            if used_default_times:
+                new_num_parallel_folds, used_default_times = (
+                    calculate_num_parallel_folds()
+                )
+                if not used_default_times:
+                    self.console.log(
+                        f"Recalculated num_parallel_folds from {num_parallel_folds} to {new_num_parallel_folds}"
+                    )
+                    num_parallel_folds = new_num_parallel_folds
+
+        # Final merging if needed
+        while len(fold_results) > 1:
+            self.console.log(f"Finished folding! Merging {len(fold_results)} items.")
+            merge_futures = []
+            for i in range(0, len(fold_results), merge_batch_size):
+                batch = fold_results[i : i + merge_batch_size]
+                merge_futures.append(executor.submit(self._merge_results, key, batch))
+
+            new_results = []
+            for future in as_completed(merge_futures):
+                result, prompt, cost = future.result()
+                total_cost += cost
+                prompts.append(prompt)
+                if result is not None:
+                    new_results.append(result)
+                    if self.config.get("persist_intermediates", False):
+                        self.intermediates[key].append(
+                            {
+                                "iter": iter_count,
+                                "intermediate": result,
+                                "scratchpad": None,
+                            }
+                        )
+                        iter_count += 1
+
+            fold_results = new_results
+
         return (
             (fold_results[0], prompts, total_cost)
             if fold_results
             else (None, prompts, total_cost)
         )
 
+    def _ordered_fold_and_merge(
+        self, key: Tuple, group_list: List[Dict], executor: ThreadPoolExecutor
+    ) -> Tuple[Optional[Dict], List[str], float]:
+        """
+        Reduce a group as an ordered merge tree.
+
+        The group is split into contiguous batches of `fold_batch_size` items, which
+        are all reduced in parallel. Then each run of `merge_batch_size` adjacent
+        results is merged, in order, level by level until one result remains. Every
+        merge only sees neighbouring results in their original order, so the
+        sequence semantics of an incremental fold are kept, but the number of
+        sequential LLM calls grows logarithmically with the group size instead of
+        linearly.
+
+        Args:
+            key (Tuple): The reduce key tuple for the group.
+            group_list (List[Dict]): The list of items in the group to be processed.
+            executor (ThreadPoolExecutor): The pool shared by all groups that runs the reduce and merge calls.
+
+        Returns:
+            Tuple[Optional[Dict], List[str], float]: A tuple containing the final merged result (or None if processing failed),
+            the list of prompts used, and the total cost of the operation.
+        """
+        fold_batch_size = self.config["fold_batch_size"]
+        merge_batch_size = self.config.get("merge_batch_size", 2)
+        persist_intermediates = self.config.get("persist_intermediates", False)
+        total_cost = 0
+        prompts = []
+        if persist_intermediates:
+            self.intermediates[key] = []
+
+        def collect(results: List[Tuple[Optional[Dict], str, float]]) -> List[Dict]:
+            nonlocal total_cost
+            outputs = []
+            for output, prompt, cost in results:
+                total_cost += cost
+                if prompt:
+                    prompts.append(prompt)
+                if output is None:
+                    continue
+                if persist_intermediates:
+                    self.intermediates[key].append(
+                        {
+                            "iter": len(self.intermediates[key]),
+                            "intermediate": output,
+                            "scratchpad": None,
+                        }
+                    )
+                outputs.append(output)
+            return outputs
+
+        def merge_run(outputs: List[Dict]) -> Tuple[Optional[Dict], str, float]:
+            # A trailing result without neighbours is carried to the next level
+            if len(outputs) == 1:
+                return outputs[0], "", 0
+            return self._merge_results(key, outputs)
+
+        batches = [
+            group_list[i : i + fold_batch_size]
+            for i in range(0, len(group_list), fold_batch_size)
+        ]
+        level = collect(
+            executor.map(lambda batch: self._batch_reduce(key, batch), batches)
+        )
+        while len(level) > 1:
+            if self.config.get("verbose", False):
+                self.console.log(
+                    f"Merging {len(level)} ordered results for group with key {key}"
+                )
+            runs = [
+                level[i : i + merge_batch_size]
+                for i in range(0, len(level), merge_batch_size)
+            ]
+            level = collect(executor.map(merge_run, runs))
+
+        return (level[0] if level else None), prompts, total_cost
+
     def _incremental_reduce(
         self, key: Tuple, group_list: List[Dict]
     ) -> Tuple[Optional[Dict], List[str], float]:
@@ -810,7 +934,7 @@ class ReduceOperation(BaseOperation):
         response = self.runner.api.call_llm(
             self.config.get("model", self.default_model),
             "reduce",
-            [{"role": "user", "content": fold_prompt}],
+            [self.prompt_message(self.config["fold_prompt"], fold_prompt)],
             self.config["output"]["schema"],
             scratchpad=scratchpad,
             timeout_seconds=self.config.get("timeout", 120),
@@ -873,7 +997,7 @@ class ReduceOperation(BaseOperation):
         response = self.runner.api.call_llm(
             self.config.get("model", self.default_model),
             "merge",
-            [{"role": "user", "content": merge_prompt}],
+            [self.prompt_message(self.config["merge_prompt"], merge_prompt)],
             self.config["output"]["schema"],
             timeout_seconds=self.config.get("timeout", 120),
             max_retries_per_timeout=self.config.get("max_retries_per_timeout", 2),
@@ -919,6 +1043,10 @@ class ReduceOperation(BaseOperation):
         with self.lock:
             if len(self.fold_times) >= self.min_samples:
                 return sum(self.fold_times) / len(self.fold_times), False
+        # Fall back to the latencies persisted by earlier runs
+        stats = self.latency_profile.stats(*self.latency_profile_key("fold"))
+        if stats and stats["count"] >= self.min_samples:
+            return stats["p50"], False
         return 1.0, True  # Default to 1 second if no data is available
 
     def get_merge_time(self) -> Tuple[float, bool]:
@@ -934,8 +1062,28 @@ class ReduceOperation(BaseOperation):
         with self.lock:
             if len(self.merge_times) >= self.min_samples:
                 return sum(self.merge_times) / len(self.merge_times), False
+        # Fall back to the latencies persisted by earlier runs
+        stats = self.latency_profile.stats(*self.latency_profile_key("merge"))
+        if stats and stats["count"] >= self.min_samples:
+            return stats["p50"], False
         return 1.0, True  # Default to 1 second if no data is available
 
+    def latency_profile_key(self, step: str) -> Tuple[str, str, Optional[int]]:
+        """
+        Get the model, prompt and batch size that identify the latency profile of a step.
+
+        Args:
+            step (str): Either "fold" or "merge".
+
+        Returns:
+            Tuple[str, str, Optional[int]]: The arguments for the latency profile of the step.
+        """
+        return (
+            self.config.get("model", self.default_model),
+            self.config.get(f"{step}_prompt", ""),
+            self.config.get(f"{step}_batch_size"),
+        )
+
     def _update_fold_time(self, time: float) -> None:
         """
         Update the fold time statistics.
@@ -945,6 +1093,7 @@ class ReduceOperation(BaseOperation):
         """
         with self.lock:
             self.fold_times.append(time)
+        self.latency_profile.record(*self.latency_profile_key("fold"), time)
 
     def _update_merge_time(self, time: float) -> None:
         """
@@ -955,6 +1104,7 @@ class ReduceOperation(BaseOperation):
         """
         with self.lock:
             self.merge_times.append(time)
+        self.latency_profile.record(*self.latency_profile_key("merge"), time)
 
     def _batch_reduce(
         self, key: Tuple, group_list: List[Dict], scratchpad: Optional[str] = None
@@ -984,7 +1134,7 @@ class ReduceOperation(BaseOperation):
         response = self.runner.api.call_llm(
             self.config.get("model", self.default_model),
             "reduce",
-            [{"role": "user", "content": prompt}],
+            [self.prompt_message(self.config["prompt"], prompt)],
             self.config["output"]["schema"],
             scratchpad=scratchpad,
             timeout_seconds=self.config.get("timeout", 120),
@@ -3,26 +3,30 @@ The `ResolveOperation` class is a subclass of `BaseOperation` that performs a re
 """
 
 import random
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 import jinja2
-from jinja2 import Template
+import numpy as np
 from pydantic import Field
 from rich.prompt import Confirm
 
 from docetl.operations.base import BaseOperation
-from docetl.operations.utils import RichLoopBar, rich_as_completed, strict_render
+from docetl.operations.utils import (
+    ComparisonCascade,
+    ProviderBatch,
+    RichLoopBar,
+    UnionFind,
+    compile_template,
+    rich_as_completed,
+    strict_render,
+    string_similarity,
+    validate_cascade_config,
+    validate_execution_mode,
+)
 from docetl.utils import completion_cost, extract_jinja_variables
 
 
-def find_cluster(item, cluster_map):
-    while item != cluster_map[item]:
-        cluster_map[item] = cluster_map[cluster_map[item]]
-        item = cluster_map[item]
-    return item
-
-
 class ResolveOperation(BaseOperation):
     class schema(BaseOperation.schema):
         type: str = "resolve"
@@ -38,7 +42,12 @@ class ResolveOperation(BaseOperation):
         input: Optional[Dict[str, Any]] = None
         embedding_batch_size: Optional[int] = None
         compare_batch_size: Optional[int] = None
+        compare_batch_prompt: Optional[str] = None
+        compare_batch_prompt_size: Optional[int] = None
         limit_comparisons: Optional[int] = None
+        cascade: Optional[Dict[str, Any]] = None
+        execution_mode: str = "sync"
+        batch_job: Optional[Dict[str, Any]] = None
         optimize: Optional[bool] = None
         timeout: Optional[int] = None
         litellm_completion_kwargs: Dict[str, Any] = Field(default_factory=dict)
@@ -66,20 +75,14 @@ class ResolveOperation(BaseOperation):
         Returns:
             Tuple[bool, float, str]: A tuple containing a boolean indicating whether the items match, the cost of the comparison, and the prompt.
         """
-        if blocking_keys:
-            if all(
-                key in item1
-                and key in item2
-                and str(item1[key]).lower() == str(item2[key]).lower()
-                for key in blocking_keys
-            ):
-                return True, 0, ""
+        if self._blocking_keys_match(item1, item2, blocking_keys):
+            return True, 0, ""
 
         prompt = strict_render(comparison_prompt, {"input1": item1, "input2": item2})
         response = self.runner.api.call_llm(
             model,
             "compare",
-            [{"role": "user", "content": prompt}],
+            [self.prompt_message(comparison_prompt, prompt)],
             {"is_match": "bool"},
             timeout_seconds=timeout_seconds,
             max_retries_per_timeout=max_retries_per_timeout,
@@ -93,6 +96,107 @@ class ResolveOperation(BaseOperation):
 
         return output["is_match"], response.total_cost, prompt
 
+    def compare_batch(
+        self,
+        comparison_prompt: str,
+        compare_batch_prompt: str,
+        model: str,
+        pairs: List[Tuple[Dict, Dict]],
+        blocking_keys: List[str] = [],
+        timeout_seconds: int = 120,
+        max_retries_per_timeout: int = 2,
+    ) -> Tuple[List[bool], float, List[str]]:
+        """
+        Compares several pairs of items in a single LLM call.
+
+        The batch prompt is rendered with a `pairs` variable, a list of dicts with
+        `input1` and `input2` keys, and the LLM returns one boolean per pair. If the
+        response cannot be parsed into exactly one boolean per pair, each pair is
+        compared individually with `compare_pair` instead.
+
+        Args:
+            comparison_prompt (str): The prompt template for single-pair comparisons (used as a fallback).
+            compare_batch_prompt (str): The prompt template for comparing many pairs at once.
+            model (str): The LLM model to use for comparison.
+            pairs (List[Tuple[Dict, Dict]]): The pairs of items to compare.
+
+        Returns:
+            Tuple[List[bool], float, List[str]]: A tuple containing whether each pair matches, the total cost of the comparisons, and the prompt used for each pair.
+        """
+        matches = [True] * len(pairs)
+        prompts = [""] * len(pairs)
+        to_compare = [
+            idx
+            for idx, (item1, item2) in enumerate(pairs)
+            if not self._blocking_keys_match(item1, item2, blocking_keys)
+        ]
+        if not to_compare:
+            return matches, 0, prompts
+
+        prompt = strict_render(
+            compare_batch_prompt,
+            {
+                "pairs": [
+                    {"input1": pairs[idx][0], "input2": pairs[idx][1]}
+                    for idx in to_compare
+                ]
+            },
+        )
+        response = self.runner.api.call_llm(
+            model,
+            "batch compare",
+            [self.prompt_message(compare_batch_prompt, prompt)],
+            {"is_match": "list[bool]"},
+            timeout_seconds=timeout_seconds,
+            max_retries_per_timeout=max_retries_per_timeout,
+            bypass_cache=self.config.get("bypass_cache", False),
+            litellm_completion_kwargs=self.config.get("litellm_completion_kwargs", {}),
+        )
+        total_cost = response.total_cost
+        try:
+            batch_matches = self.runner.api.parse_llm_response(
+                response.response,
+                {"is_match": "list[bool]"},
+            )[0]["is_match"]
+            if len(batch_matches) != len(to_compare) or not all(
+                isinstance(match, bool) for match in batch_matches
+            ):
+                raise ValueError(
+                    f"Expected {len(to_compare)} booleans, got {batch_matches}"
+                )
+        except Exception as e:
+            self.console.log(
+                f"[yellow]Could not parse batched comparison, comparing {len(to_compare)} pairs individually: {e}[/yellow]"
+            )
+            for idx in to_compare:
+                matches[idx], cost, prompts[idx] = self.compare_pair(
+                    comparison_prompt,
+                    model,
+                    pairs[idx][0],
+                    pairs[idx][1],
+                    blocking_keys,
+                    timeout_seconds=timeout_seconds,
+                    max_retries_per_timeout=max_retries_per_timeout,
+                )
+                total_cost += cost
+            return matches, total_cost, prompts
+
+        for idx, match in zip(to_compare, batch_matches):
+            matches[idx] = match
+            prompts[idx] = prompt
+        return matches, total_cost, prompts
+
+    @staticmethod
+    def _blocking_keys_match(
+        item1: Dict, item2: Dict, blocking_keys: List[str]
+    ) -> bool:
+        return bool(blocking_keys) and all(
+            key in item1
+            and key in item2
+            and str(item1[key]).lower() == str(item2[key]).lower()
+            for key in blocking_keys
+        )
+
     def syntax_check(self) -> None:
         """
         Checks the configuration of the ResolveOperation for required keys and valid structure.
@@ -130,7 +234,7 @@ class ResolveOperation(BaseOperation):
 
         # Check if the comparison_prompt is a valid Jinja2 template
         try:
-            comparison_template = Template(self.config["comparison_prompt"])
+            comparison_template = compile_template(self.config["comparison_prompt"])
             comparison_vars = comparison_template.environment.parse(
                 self.config["comparison_prompt"]
             ).find_all(jinja2.nodes.Name)
@@ -144,7 +248,7 @@ class ResolveOperation(BaseOperation):
                 )
 
             if "resolution_prompt" in self.config:
-                reduction_template = Template(self.config["resolution_prompt"])
+                reduction_template = compile_template(self.config["resolution_prompt"])
                 reduction_vars = reduction_template.environment.parse(
                     self.config["resolution_prompt"]
                 ).find_all(jinja2.nodes.Name)
@@ -192,6 +296,28 @@ class ResolveOperation(BaseOperation):
                     "'schema' in 'input' configuration must be a dictionary"
                 )
 
+        # Check compare_batch_prompt (optional)
+        if "compare_batch_prompt" in self.config:
+            try:
+                batch_template = compile_template(self.config["compare_batch_prompt"])
+                batch_vars = batch_template.environment.parse(
+                    self.config["compare_batch_prompt"]
+                ).find_all(jinja2.nodes.Name)
+                if "pairs" not in {var.name for var in batch_vars}:
+                    raise ValueError(
+                        "'compare_batch_prompt' must contain the 'pairs' variable"
+                    )
+            except Exception as e:
+                raise ValueError(f"Invalid Jinja2 template: {str(e)}")
+
+        if "compare_batch_prompt_size" in self.config:
+            if not isinstance(self.config["compare_batch_prompt_size"], int):
+                raise TypeError("'compare_batch_prompt_size' must be an integer")
+            if self.config["compare_batch_prompt_size"] <= 0:
+                raise ValueError(
+                    "'compare_batch_prompt_size' must be a positive integer"
+                )
+
         # Check limit_comparisons (optional)
         if "limit_comparisons" in self.config:
             if not isinstance(self.config["limit_comparisons"], int):
@@ -199,6 +325,9 @@ class ResolveOperation(BaseOperation):
             if self.config["limit_comparisons"] <= 0:
                 raise ValueError("'limit_comparisons' must be a positive integer")
 
+        validate_cascade_config(self.config)
+        validate_execution_mode(self.config)
+
     def validation_fn(self, response: Dict[str, Any]):
         output = self.runner.api.parse_llm_response(
             response,
@@ -359,9 +488,12 @@ class ResolveOperation(BaseOperation):
             )
             blocked_pairs = random.sample(blocked_pairs, limit_comparisons)
 
-        # Initialize clusters with all indices
-        clusters = [{i} for i in range(len(input_data))]
-        cluster_map = {i: i for i in range(len(input_data))}
+        # Track clusters with a union-find over record indices
+        union_find = UnionFind(len(input_data))
+        item_keys = [
+            tuple(str(item.get(k, "")) for k in blocking_keys) for item in input_data
+        ]
+        merged_keys: Set[Tuple[str, ...]] = set()
 
         # If there are remaining comparisons, fill with highest cosine similarities
         remaining_comparisons = (
@@ -375,11 +507,10 @@ class ResolveOperation(BaseOperation):
 
             similarity_matrix = cosine_similarity(embeddings)
 
+            blocked_pair_set = set(blocked_pairs)
             cosine_pairs = []
             for i, j in comparison_pairs:
-                if (i, j) not in blocked_pairs and find_cluster(
-                    i, cluster_map
-                ) != find_cluster(j, cluster_map):
+                if (i, j) not in blocked_pair_set and not union_find.connected(i, j):
                     similarity = similarity_matrix[i, j]
                     if similarity >= blocking_threshold:
                         cosine_pairs.append((i, j, similarity))
@@ -393,39 +524,19 @@ class ResolveOperation(BaseOperation):
             else:
                 blocked_pairs.extend((i, j) for i, j, _ in cosine_pairs)
 
-        # Modified merge_clusters to handle all indices with the same value
-
         def merge_clusters(item1: int, item2: int) -> None:
-            root1, root2 = find_cluster(item1, cluster_map), find_cluster(
-                item2, cluster_map
-            )
-            if root1 != root2:
-                if len(clusters[root1]) < len(clusters[root2]):
-                    root1, root2 = root2, root1
-                clusters[root1] |= clusters[root2]
-                cluster_map[root2] = root1
-                clusters[root2] = set()
-
-                # Also merge all other indices that share the same values
-                key1 = tuple(str(input_data[item1].get(k, "")) for k in blocking_keys)
-                key2 = tuple(str(input_data[item2].get(k, "")) for k in blocking_keys)
-
-                # Merge all indices with the same values
-                for idx in value_to_indices.get(key1, []):
-                    if idx != item1:
-                        root_idx = find_cluster(idx, cluster_map)
-                        if root_idx != root1:
-                            clusters[root1] |= clusters[root_idx]
-                            cluster_map[root_idx] = root1
-                            clusters[root_idx] = set()
-
-                for idx in value_to_indices.get(key2, []):
-                    if idx != item2:
-                        root_idx = find_cluster(idx, cluster_map)
-                        if root_idx != root1:
-                            clusters[root1] |= clusters[root_idx]
-                            cluster_map[root_idx] = root1
-                            clusters[root_idx] = set()
+            if not union_find.union(item1, item2):
+                return
+
+            # Also merge all other indices that share the same values. Each value
+            # group only needs to be folded in once.
+            for item in (item1, item2):
+                key = item_keys[item]
+                if key in merged_keys:
+                    continue
+                merged_keys.add(key)
+                for idx in value_to_indices.get(key, []):
+                    union_find.union(item, idx)
 
         # Calculate and print statistics
         total_possible_comparisons = len(input_data) * (len(input_data) - 1) // 2
@@ -462,85 +573,251 @@ class ResolveOperation(BaseOperation):
             k = max(k1, k2)
             return M if k < 0 else min(int(k), M)
 
-        # Compare pairs and update clusters in real-time
-        batch_size = self.config.get("compare_batch_size", auto_batch())
-        self.console.log(f"Using compare batch size: {batch_size}")
-        pair_costs = 0
+        # Compare the most similar pairs first: matches found early make later
+        # pairs redundant through transitivity, so they never reach the LLM.
+        normalized = None
+        if embeddings is not None and blocked_pairs:
+            normalized = np.asarray(embeddings, dtype=float)
+            normalized /= np.maximum(
+                np.linalg.norm(normalized, axis=1, keepdims=True), 1e-12
+            )
+            pair_array = np.asarray(blocked_pairs)
+            pair_similarities = np.einsum(
+                "ij,ij->i", normalized[pair_array[:, 0]], normalized[pair_array[:, 1]]
+            )
+            blocked_pairs = [
+                blocked_pairs[idx]
+                for idx in np.argsort(-pair_similarities, kind="stable")
+            ]
 
-        pbar = RichLoopBar(
-            range(0, len(blocked_pairs), batch_size),
-            desc=f"Processing batches of {batch_size} LLM comparisons",
-            console=self.console,
-        )
-        last_processed = 0
-        for i in pbar:
-            batch_end = last_processed + batch_size
-            batch = blocked_pairs[last_processed:batch_end]
-            # Filter pairs for the initial batch
-            better_batch = [
+        comparison_model = self.config.get("comparison_model", self.default_model)
+        timeout_seconds = self.config.get("timeout", 120)
+        max_retries_per_timeout = self.config.get("max_retries_per_timeout", 2)
+
+        def compare_with_model(pair: Tuple[int, int], model: str) -> Tuple[bool, float]:
+            is_match_result, cost, _ = self.compare_pair(
+                self.config["comparison_prompt"],
+                model,
+                input_data[pair[0]],
+                input_data[pair[1]],
+                blocking_keys,
+                timeout_seconds=timeout_seconds,
+                max_retries_per_timeout=max_retries_per_timeout,
+            )
+            return is_match_result, cost
+
+        # Optionally decide pairs with a calibrated cascade of similarity scores
+        # and a cheap model, so only uncertain pairs reach the comparison model.
+        # The calibration sample's labels are reused as comparison results.
+        cascade = None
+        if self.config.get("cascade") and blocked_pairs:
+            cascade = ComparisonCascade(self.config["cascade"], self.console)
+            key_texts = [" ".join(key) for key in item_keys]
+
+            def pair_score(pair: Tuple[int, int]) -> float:
+                if cascade.similarity == "embedding" and normalized is not None:
+                    return float(np.dot(normalized[pair[0]], normalized[pair[1]]))
+                return string_similarity(key_texts[pair[0]], key_texts[pair[1]])
+
+            sample_labels, calibration_cost = cascade.calibrate(
+                blocked_pairs,
+                pair_score,
+                compare_with_model,
+                comparison_model,
+                self.max_threads,
+            )
+            total_cost += calibration_cost
+            for idx, is_match_result in sample_labels.items():
+                if is_match_result:
+                    merge_clusters(*blocked_pairs[idx])
+            blocked_pairs = [
                 pair
-                for pair in batch
-                if find_cluster(pair[0], cluster_map) == pair[0]
-                and find_cluster(pair[1], cluster_map) == pair[1]
+                for idx, pair in enumerate(blocked_pairs)
+                if idx not in sample_labels
             ]
 
-            # Expand better_batch if it doesn’t reach batch_size
-            while len(better_batch) < batch_size and batch_end < len(blocked_pairs):
-                # Move batch_end forward by batch_size to get more pairs
-                next_end = batch_end + batch_size
-                next_batch = blocked_pairs[batch_end:next_end]
-
-                better_batch.extend(
-                    pair
-                    for pair in next_batch
-                    if find_cluster(pair[0], cluster_map) == pair[0]
-                    and find_cluster(pair[1], cluster_map) == pair[1]
-                )
-
-                # Update batch_end to prevent overlapping in the next loop
-                batch_end = next_end
-            better_batch = better_batch[:batch_size]
-            last_processed = batch_end
+        # Compare pairs and update clusters in real-time. At most batch_size
+        # comparisons are in flight; each pair is checked against the current
+        # clusters right before it is submitted.
+        # In batch execution mode, the cascade first settles every pair it can
+        # (similarity thresholds, then the cheap model), and only pairs that
+        # need the comparison model and aren't already implied by earlier
+        # matches are sent to the provider's batch API. Pairs settled by
+        # transitivity later in the loop are only known after the fact, so
+        # some queued comparisons may go unused. Pairs are compared one at a
+        # time, since the batch job already amortizes calls.
+        provider_batch = ProviderBatch(self.runner, self.config, self.console)
+        cascade_prepass = provider_batch.enabled and cascade is not None
+        if cascade_prepass:
             with ThreadPoolExecutor(max_workers=self.max_threads) as executor:
-                future_to_pair = {
-                    executor.submit(
-                        self.compare_pair,
-                        self.config["comparison_prompt"],
-                        self.config.get("comparison_model", self.default_model),
-                        input_data[pair[0]],
-                        input_data[pair[1]],
-                        blocking_keys,
-                        timeout_seconds=self.config.get("timeout", 120),
-                        max_retries_per_timeout=self.config.get(
-                            "max_retries_per_timeout", 2
+                decisions = list(
+                    executor.map(
+                        lambda pair: cascade.decide(
+                            pair, pair_score(pair), compare_with_model
                         ),
-                    ): pair
-                    for pair in better_batch
-                }
+                        blocked_pairs,
+                    )
+                )
+            undecided_pairs = []
+            for pair, (decision, cost) in zip(blocked_pairs, decisions):
+                total_cost += cost
+                if decision is None:
+                    undecided_pairs.append(pair)
+                elif decision:
+                    merge_clusters(*pair)
+            blocked_pairs = undecided_pairs
+        if provider_batch.enabled:
+            for i, j in blocked_pairs:
+                if union_find.connected(i, j) or self._blocking_keys_match(
+                    input_data[i], input_data[j], blocking_keys
+                ):
+                    continue
+                prompt = strict_render(
+                    self.config["comparison_prompt"],
+                    {"input1": input_data[i], "input2": input_data[j]},
+                )
+                provider_batch.add(
+                    comparison_model,
+                    "compare",
+                    [self.prompt_message(self.config["comparison_prompt"], prompt)],
+                    {"is_match": "bool"},
+                    litellm_completion_kwargs=self.config.get(
+                        "litellm_completion_kwargs", {}
+                    ),
+                )
+            total_cost += provider_batch.run()
 
-                for future in as_completed(future_to_pair):
-                    pair = future_to_pair[future]
-                    is_match_result, cost, prompt = future.result()
-                    pair_costs += cost
-                    if is_match_result:
-                        merge_clusters(pair[0], pair[1])
+        batch_size = self.config.get("compare_batch_size", auto_batch())
+        self.console.log(f"Using compare batch size: {batch_size}")
+        compare_batch_prompt = (
+            None if provider_batch.enabled else self.config.get("compare_batch_prompt")
+        )
+        pairs_per_call = (
+            self.config.get("compare_batch_prompt_size", 10)
+            if compare_batch_prompt
+            else 1
+        )
+        pair_costs = 0
+        skipped_pairs = 0
+        pairs_in_flight = 0
+        pending_pairs = iter(blocked_pairs)
+
+        def compare_with_comparison_model(
+            pairs: List[Tuple[int, int]]
+        ) -> Tuple[List[bool], float, List[str]]:
+            if len(pairs) == 1:
+                is_match_result, cost, prompt = self.compare_pair(
+                    self.config["comparison_prompt"],
+                    comparison_model,
+                    input_data[pairs[0][0]],
+                    input_data[pairs[0][1]],
+                    blocking_keys,
+                    timeout_seconds=timeout_seconds,
+                    max_retries_per_timeout=max_retries_per_timeout,
+                )
+                return [is_match_result], cost, [prompt]
+            return self.compare_batch(
+                self.config["comparison_prompt"],
+                compare_batch_prompt,
+                comparison_model,
+                [(input_data[i], input_data[j]) for i, j in pairs],
+                blocking_keys,
+                timeout_seconds=timeout_seconds,
+                max_retries_per_timeout=max_retries_per_timeout,
+            )
 
-                    if self.config.get("enable_observability", False):
-                        observability_key = f"_observability_{self.config['name']}"
-                        for idx in (pair[0], pair[1]):
-                            if observability_key not in input_data[idx]:
-                                input_data[idx][observability_key] = {
-                                    "comparison_prompts": [],
-                                    "resolution_prompt": None,
-                                }
-                            input_data[idx][observability_key][
-                                "comparison_prompts"
-                            ].append(prompt)
+        def compare_pairs(
+            pairs: List[Tuple[int, int]]
+        ) -> Tuple[List[bool], float, List[str]]:
+            if cascade is None or cascade_prepass:
+                return compare_with_comparison_model(pairs)
+
+            decisions, cascade_cost = [], 0
+            for pair in pairs:
+                decision, cost = cascade.decide(
+                    pair, pair_score(pair), compare_with_model
+                )
+                decisions.append(decision)
+                cascade_cost += cost
+            undecided = [pair for pair, d in zip(pairs, decisions) if d is None]
+            match_results, cost, prompts = (
+                compare_with_comparison_model(undecided) if undecided else ([], 0, [])
+            )
+            results = iter(zip(match_results, prompts))
+            merged = [
+                next(results) if decision is None else (decision, "")
+                for decision in decisions
+            ]
+            return (
+                [is_match_result for is_match_result, _ in merged],
+                cascade_cost + cost,
+                [prompt for _, prompt in merged],
+            )
 
+        with provider_batch, ThreadPoolExecutor(
+            max_workers=self.max_threads
+        ) as executor, RichLoopBar(
+            total=len(blocked_pairs),
+            desc=f"Processing LLM comparisons ({batch_size} in flight)",
+            console=self.console,
+        ) as pbar:
+            future_to_pairs = {}
+
+            def fill_window() -> None:
+                nonlocal skipped_pairs, pairs_in_flight
+                while pairs_in_flight < batch_size:
+                    pairs = []
+                    while len(pairs) < pairs_per_call:
+                        pair = next(pending_pairs, None)
+                        if pair is None:
+                            break
+                        if union_find.connected(pair[0], pair[1]):
+                            skipped_pairs += 1
+                            pbar.update()
+                            continue
+                        pairs.append(pair)
+                    if not pairs:
+                        return
+                    future_to_pairs[executor.submit(compare_pairs, pairs)] = pairs
+                    pairs_in_flight += len(pairs)
+
+            fill_window()
+            while future_to_pairs:
+                done, _ = wait(future_to_pairs, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pairs = future_to_pairs.pop(future)
+                    pairs_in_flight -= len(pairs)
+                    match_results, cost, prompts = future.result()
+                    pair_costs += cost
+                    for pair, is_match_result, prompt in zip(
+                        pairs, match_results, prompts
+                    ):
+                        if is_match_result:
+                            merge_clusters(pair[0], pair[1])
+
+                        if self.config.get("enable_observability", False):
+                            observability_key = f"_observability_{self.config['name']}"
+                            for idx in (pair[0], pair[1]):
+                                if observability_key not in input_data[idx]:
+                                    input_data[idx][observability_key] = {
+                                        "comparison_prompts": [],
+                                        "resolution_prompt": None,
+                                    }
+                                input_data[idx][observability_key][
+                                    "comparison_prompts"
+                                ].append(prompt)
+                    pbar.update(len(pairs))
+                fill_window()
+
+        self.console.log(
+            f"[green]Skipped {skipped_pairs} comparisons already implied by earlier matches[/green]"
+        )
+        if cascade is not None:
+            cascade.log_summary()
         total_cost += pair_costs
 
         # Collect final clusters
-        final_clusters = [cluster for cluster in clusters if cluster]
+        final_clusters = union_find.groups()
 
         # Process each cluster
         results = []
@@ -560,7 +837,11 @@ class ResolveOperation(BaseOperation):
                 reduction_response = self.runner.api.call_llm(
                     self.config.get("resolution_model", self.default_model),
                     "reduce",
-                    [{"role": "user", "content": resolution_prompt}],
+                    [
+                        self.prompt_message(
+                            self.config["resolution_prompt"], resolution_prompt
+                        )
+                    ],
                     self.config["output"]["schema"],
                     timeout_seconds=self.config.get("timeout", 120),
                     max_retries_per_timeout=self.config.get(
@@ -1,9 +1,32 @@
+import re
 import uuid
 from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
 import tiktoken
 
 from docetl.operations.base import BaseOperation
+from docetl.operations.clustering_utils import get_embeddings_for_clustering
+from docetl.utils import get_encoder
+
+SPLIT_METHODS = ["token_count", "delimiter", "sentence", "semantic"]
+
+# A sentence ends with terminal punctuation, optionally followed by closing
+# quotes or brackets, and then whitespace
+SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s+")
+
+
+def split_sentences(content: str) -> List[str]:
+    """
+    Split text into sentences, keeping the whitespace after each sentence so
+    that joining consecutive sentences reproduces the original text.
+    """
+    starts = [0] + [m.end() for m in SENTENCE_END.finditer(content)]
+    if starts[-1] == len(content):
+        starts.pop()
+    return [
+        content[start:end] for start, end in zip(starts, starts[1:] + [len(content)])
+    ]
 
 
 class SplitOperation(BaseOperation):
@@ -25,6 +48,7 @@ class SplitOperation(BaseOperation):
         method: str
         method_kwargs: Dict[str, Any]
         model: Optional[str] = None
+        drop_split_key: bool = False
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -41,84 +65,229 @@ class SplitOperation(BaseOperation):
         if not isinstance(self.config["split_key"], str):
             raise TypeError("'split_key' must be a string")
 
-        if self.config["method"] not in ["token_count", "delimiter"]:
-            raise ValueError(f"Invalid method '{self.config['method']}'")
+        method = self.config["method"]
+        method_kwargs = self.config["method_kwargs"]
+        if method not in SPLIT_METHODS:
+            raise ValueError(f"Invalid method '{method}'")
 
-        if self.config["method"] == "token_count":
+        if method in ["token_count", "sentence"] or "num_tokens" in method_kwargs:
             if (
-                not isinstance(self.config["method_kwargs"]["num_tokens"], int)
-                or self.config["method_kwargs"]["num_tokens"] <= 0
+                not isinstance(method_kwargs.get("num_tokens"), int)
+                or method_kwargs["num_tokens"] <= 0
             ):
                 raise ValueError("'num_tokens' must be a positive integer")
-        elif self.config["method"] == "delimiter":
-            if not isinstance(self.config["method_kwargs"]["delimiter"], str):
+
+        if method == "token_count":
+            overlap = method_kwargs.get("overlap", 0)
+            if (
+                not isinstance(overlap, int)
+                or not 0 <= overlap < method_kwargs["num_tokens"]
+            ):
+                raise ValueError(
+                    "'overlap' must be a non-negative integer smaller than 'num_tokens'"
+                )
+        elif method == "delimiter":
+            if not isinstance(method_kwargs["delimiter"], str):
                 raise ValueError("'delimiter' must be a string")
+        elif method == "semantic":
+            percentile = method_kwargs.get("breakpoint_percentile", 95)
+            if not isinstance(percentile, (int, float)) or not 0 < percentile <= 100:
+                raise ValueError(
+                    "'breakpoint_percentile' must be a number between 0 and 100"
+                )
+
+    @property
+    def encoder(self) -> tiktoken.Encoding:
+        return get_encoder(
+            self.config["method_kwargs"].get("model", self.default_model)
+        )
 
     def execute(self, input_data: List[Dict]) -> Tuple[List[Dict], float]:
         split_key = self.config["split_key"]
         method = self.config["method"]
-        method_kwargs = self.config["method_kwargs"]
-        try:
-            encoder = tiktoken.encoding_for_model(
-                self.config["method_kwargs"]
-                .get("model", self.default_model)
-                .split("/")[-1]
-            )
-        except Exception:
-            encoder = tiktoken.encoding_for_model("gpt-4o")
-
-        results = []
-        cost = 0.0
+        drop_split_key = self.config.get("drop_split_key", False)
 
         for item in input_data:
             if split_key not in item:
                 raise KeyError(f"Split key '{split_key}' not found in item")
+        contents = [item[split_key] for item in input_data]
 
-            content = item[split_key]
-            doc_id = str(uuid.uuid4())
+        cost = 0.0
+        if method == "token_count":
+            doc_chunks = self.token_count_chunks(contents)
+        elif method == "delimiter":
+            doc_chunks = [self.delimiter_chunks(content) for content in contents]
+        elif method == "sentence":
+            doc_chunks = self.sentence_chunks(contents)
+        else:
+            doc_chunks, cost = self.semantic_chunks(contents)
 
-            if method == "token_count":
-                token_count = method_kwargs["num_tokens"]
-                tokens = encoder.encode(content)
-
-                for chunk_num, i in enumerate(
-                    range(0, len(tokens), token_count), start=1
-                ):
-                    chunk_tokens = tokens[i : i + token_count]
-                    chunk = encoder.decode(chunk_tokens)
-
-                    result = item.copy()
-                    result.update(
-                        {
-                            f"{split_key}_chunk": chunk,
-                            f"{self.name}_id": doc_id,
-                            f"{self.name}_chunk_num": chunk_num,
-                        }
-                    )
-                    results.append(result)
-
-            elif method == "delimiter":
-                delimiter = method_kwargs["delimiter"]
-                num_splits_to_group = method_kwargs.get("num_splits_to_group", 1)
-                chunks = content.split(delimiter)
-
-                # Get rid of empty chunks
-                chunks = [chunk for chunk in chunks if chunk.strip()]
-
-                for chunk_num, i in enumerate(
-                    range(0, len(chunks), num_splits_to_group), start=1
-                ):
-                    grouped_chunks = chunks[i : i + num_splits_to_group]
-                    joined_chunk = delimiter.join(grouped_chunks).strip()
-
-                    result = item.copy()
-                    result.update(
-                        {
-                            f"{split_key}_chunk": joined_chunk,
-                            f"{self.name}_id": doc_id,
-                            f"{self.name}_chunk_num": chunk_num,
-                        }
-                    )
-                    results.append(result)
+        results = []
+        for item, chunks in zip(input_data, doc_chunks):
+            doc_id = str(uuid.uuid4())
+            for chunk_num, chunk in enumerate(chunks, start=1):
+                result = item.copy()
+                if drop_split_key:
+                    del result[split_key]
+                result.update(
+                    {
+                        f"{split_key}_chunk": chunk,
+                        f"{self.name}_id": doc_id,
+                        f"{self.name}_chunk_num": chunk_num,
+                    }
+                )
+                results.append(result)
 
         return results, cost
+
+    def token_count_chunks(self, contents: List[str]) -> List[List[str]]:
+        """
+        Split each document into windows of `num_tokens` tokens, where
+        consecutive windows share `overlap` tokens. All documents are encoded
+        in one batch and all of their windows decoded in another, on threads
+        (tiktoken releases the GIL).
+        """
+        method_kwargs = self.config["method_kwargs"]
+        token_count = method_kwargs["num_tokens"]
+        overlap = method_kwargs.get("overlap", 0)
+        step = token_count - overlap
+        encoder = self.encoder
+
+        windows = []
+        window_counts = []
+        for tokens in encoder.encode_batch(contents, num_threads=self.max_threads):
+            # Stop once a window reaches the end, so the last window isn't
+            # made up only of overlap with the previous one
+            stop = max(len(tokens) - overlap, 1) if tokens else 0
+            doc_windows = [tokens[i : i + token_count] for i in range(0, stop, step)]
+            windows.extend(doc_windows)
+            window_counts.append(len(doc_windows))
+
+        chunks = encoder.decode_batch(windows, num_threads=self.max_threads)
+        doc_chunks = []
+        offset = 0
+        for count in window_counts:
+            doc_chunks.append(chunks[offset : offset + count])
+            offset += count
+        return doc_chunks
+
+    def delimiter_chunks(self, content: str) -> List[str]:
+        method_kwargs = self.config["method_kwargs"]
+        delimiter = method_kwargs["delimiter"]
+        num_splits_to_group = method_kwargs.get("num_splits_to_group", 1)
+
+        # Get rid of empty chunks
+        chunks = [chunk for chunk in content.split(delimiter) if chunk.strip()]
+        return [
+            delimiter.join(chunks[i : i + num_splits_to_group]).strip()
+            for i in range(0, len(chunks), num_splits_to_group)
+        ]
+
+    def sentence_chunks(self, contents: List[str]) -> List[List[str]]:
+        """
+        Pack whole sentences into chunks of at most `num_tokens` tokens. A
+        sentence longer than `num_tokens` becomes a chunk of its own.
+        """
+        doc_sentences = [split_sentences(content) for content in contents]
+        doc_token_counts = self._sentence_token_counts(doc_sentences)
+        return [
+            self._pack_sentences(sentences, token_counts)
+            for sentences, token_counts in zip(doc_sentences, doc_token_counts)
+        ]
+
+    def semantic_chunks(self, contents: List[str]) -> Tuple[List[List[str]], float]:
+        """
+        Split each document where the meaning shifts: between consecutive
+        sentences whose embedding distance is above the document's
+        `breakpoint_percentile` percentile. If `num_tokens` is set, chunks are
+        also kept within that many tokens. All sentences of all documents are
+        embedded in one pass.
+
+        Returns:
+            Tuple[List[List[str]], float]: The chunks of each document, and the embedding cost.
+        """
+        method_kwargs = self.config["method_kwargs"]
+        percentile = method_kwargs.get("breakpoint_percentile", 95)
+        doc_sentences = [split_sentences(content) for content in contents]
+
+        sentences = [
+            {"text": sentence} for sentences in doc_sentences for sentence in sentences
+        ]
+        if not sentences:
+            return [[] for _ in contents], 0.0
+        embeddings, cost = get_embeddings_for_clustering(
+            sentences,
+            {
+                "embedding_model": method_kwargs.get(
+                    "embedding_model", "text-embedding-3-small"
+                ),
+                "embedding_keys": ["text"],
+            },
+            self.runner.api,
+        )
+        embeddings = np.array(embeddings, dtype=float)
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-12
+
+        if "num_tokens" in method_kwargs:
+            doc_token_counts = self._sentence_token_counts(doc_sentences)
+        else:
+            doc_token_counts = [None] * len(doc_sentences)
+
+        doc_chunks = []
+        offset = 0
+        for sentences, token_counts in zip(doc_sentences, doc_token_counts):
+            doc_embeddings = embeddings[offset : offset + len(sentences)]
+            offset += len(sentences)
+            # distances[k] is the distance between sentences k and k + 1
+            distances = 1 - np.sum(doc_embeddings[:-1] * doc_embeddings[1:], axis=1)
+            breaks = set()
+            if len(distances):
+                threshold = np.percentile(distances, percentile)
+                breaks = {k + 1 for k in np.flatnonzero(distances > threshold)}
+            doc_chunks.append(self._pack_sentences(sentences, token_counts, breaks))
+        return doc_chunks, cost
+
+    def _sentence_token_counts(self, doc_sentences: List[List[str]]) -> List[List[int]]:
+        sentences = [sentence for sentences in doc_sentences for sentence in sentences]
+        counts = [
+            len(tokens)
+            for tokens in self.encoder.encode_batch(
+                sentences, num_threads=self.max_threads
+            )
+        ]
+        doc_token_counts = []
+        offset = 0
+        for sentences in doc_sentences:
+            doc_token_counts.append(counts[offset : offset + len(sentences)])
+            offset += len(sentences)
+        return doc_token_counts
+
+    def _pack_sentences(
+        self,
+        sentences: List[str],
+        token_counts: Optional[List[int]],
+        breaks: Optional[set] = None,
+    ) -> List[str]:
+        """
+        Group consecutive sentences into chunks in one pass. A new chunk
+        starts at each index in `breaks`, and whenever adding a sentence
+        would take the chunk over `num_tokens` tokens.
+        """
+        max_tokens = self.config["method_kwargs"].get("num_tokens")
+        breaks = breaks or set()
+
+        chunks = []
+        current, current_tokens = [], 0
+        for k, sentence in enumerate(sentences):
+            sentence_tokens = token_counts[k] if token_counts else 0
+            if current and (
+                k in breaks
+                or (max_tokens and current_tokens + sentence_tokens > max_tokens)
+            ):
+                chunks.append("".join(current).strip())
+                current, current_tokens = [], 0
+            current.append(sentence)
+            current_tokens += sentence_tokens
+        if current:
+            chunks.append("".join(current).strip())
+        return [chunk for chunk in chunks if chunk]
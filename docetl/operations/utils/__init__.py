@@ -1,4 +1,5 @@
 from .api import APIWrapper
+from .batch import ProviderBatch, validate_execution_mode, EXECUTION_MODES
 from .cache import (
     cache,
     cache_key,
@@ -9,12 +10,29 @@ from .cache import (
     LLM_CACHE_DIR,
     DOCETL_HOME_DIR,
 )
-from .llm import LLMResult, InvalidOutputError, truncate_messages
-from .progress import RichLoopBar, rich_as_completed
-from .validation import safe_eval, convert_val, convert_dict_schema_to_list_schema, get_user_input_for_schema, strict_render
+from .cascade import (
+    ComparisonCascade,
+    precision_recall_at_thresholds,
+    string_similarity,
+    validate_cascade_config,
+)
+from .code import load_function
+from .groupby import group_items, group_key
+from .latency import LatencyProfile, LATENCY_PROFILE_PATH
+from .llm import LLMResult, InvalidOutputError, truncate_messages, split_prompt_message, message_text
+from .progress import RichLoopBar, bounded_submit, rich_as_completed
+from .union_find import UnionFind
+from .validation import safe_eval, compile_rule, convert_val, convert_dict_schema_to_list_schema, get_user_input_for_schema, strict_render, compile_template
 
 __all__ = [
     'APIWrapper',
+    'ProviderBatch',
+    'validate_execution_mode',
+    'EXECUTION_MODES',
+    'ComparisonCascade',
+    'precision_recall_at_thresholds',
+    'string_similarity',
+    'validate_cascade_config',
     'cache',
     'cache_key',
     'clear_cache',
@@ -23,14 +41,25 @@ __all__ = [
     'CACHE_DIR',
     'LLM_CACHE_DIR',
     'DOCETL_HOME_DIR',
+    'load_function',
+    'group_items',
+    'group_key',
+    'LatencyProfile',
+    'LATENCY_PROFILE_PATH',
     'LLMResult',
     'InvalidOutputError',
     'RichLoopBar',
     'rich_as_completed',
+    'bounded_submit',
+    'UnionFind',
     'safe_eval',
+    'compile_rule',
     'convert_val',
     'convert_dict_schema_to_list_schema',
     'get_user_input_for_schema',
     'truncate_messages',
-    "strict_render"
+    'split_prompt_message',
+    'message_text',
+    "strict_render",
+    "compile_template",
 ] 
\ No newline at end of file
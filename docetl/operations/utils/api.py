@@ -1,7 +1,9 @@
 import ast
 import hashlib
 import json
+import threading
 import time
+from collections import Counter
 from typing import Any, Dict, List, Optional
 
 from litellm import ModelResponse, RateLimitError, completion, embedding
@@ -11,7 +13,14 @@ from rich.console import Console
 from docetl.utils import completion_cost
 
 from .cache import cache, cache_key, freezeargs
-from .llm import InvalidOutputError, LLMResult, timeout, truncate_messages
+from .code import load_function
+from .llm import (
+    InvalidOutputError,
+    LLMResult,
+    prompt_cache_hints,
+    timeout,
+    truncate_messages,
+)
 from .validation import (
     convert_dict_schema_to_list_schema,
     convert_val,
@@ -26,6 +35,27 @@ BASIC_MODELS = ["gpt-4o-mini", "gpt-4o"]
 class APIWrapper(object):
     def __init__(self, runner):
         self.runner = runner
+        # Responses fetched ahead of time through a provider batch job, keyed
+        # by cache key. call_llm consumes them in place of a live completion.
+        self.batch_results: Dict[str, Any] = {}
+        # Input tokens sent, and how many of them the provider read from its
+        # prompt cache, across all completions
+        self.prompt_token_usage = Counter()
+        self._usage_lock = threading.Lock()
+
+    def record_usage(self, response: Any) -> None:
+        """
+        Adds a completion's input tokens to `prompt_token_usage`.
+        """
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return
+        details = getattr(usage, "prompt_tokens_details", None)
+        with self._usage_lock:
+            self.prompt_token_usage["input"] += usage.prompt_tokens or 0
+            self.prompt_token_usage["cached"] += (
+                getattr(details, "cached_tokens", None) or 0
+            )
 
     @freezeargs
     def gen_embedding(self, model: str, input: List[str]) -> List[float]:
@@ -324,6 +354,26 @@ class APIWrapper(object):
 
         return LLMResult(response=response, total_cost=total_cost, validated=validated)
 
+    def llm_cache_key(
+        self,
+        model: str,
+        op_type: str,
+        messages: List[Dict[str, str]],
+        output_schema: Dict[str, str],
+        scratchpad: Optional[str] = None,
+    ) -> str:
+        """
+        Returns the key call_llm caches a completion under.
+        """
+        return cache_key(
+            model,
+            op_type,
+            messages,
+            output_schema,
+            scratchpad,
+            self.runner.config.get("system_prompt", {}),
+        )
+
     def call_llm(
         self,
         model: str,
@@ -364,14 +414,9 @@ class APIWrapper(object):
         Raises:
             TimeoutError: If the call times out after retrying.
         """
-        key = cache_key(
-            model,
-            op_type,
-            messages,
-            output_schema,
-            scratchpad,
-            self.runner.config.get("system_prompt", {}),
-        )
+        key = self.llm_cache_key(model, op_type, messages, output_schema, scratchpad)
+        if initial_result is None and key in self.batch_results:
+            initial_result = self.batch_results.pop(key)
 
         max_retries = max_retries_per_timeout
         attempt = 0
@@ -439,6 +484,55 @@ class APIWrapper(object):
         Returns:
             str: The response from the LLM.
         """
+        request = self.completion_request(
+            model,
+            op_type,
+            messages,
+            output_schema,
+            tools,
+            scratchpad,
+            litellm_completion_kwargs,
+        )
+
+        self.runner.rate_limiter.try_acquire("llm_call", weight=1)
+        try:
+            response = completion(**request)
+        except Exception as e:
+            # Check that there's a prefix for the model name if it's not a basic model
+            if model not in BASIC_MODELS:
+                if "/" not in model:
+                    raise ValueError(
+                        f"Note: You may also need to prefix your model name with the provider, e.g. 'openai/gpt-4o-mini' or 'gemini/gemini-1.5-flash' to conform to LiteLLM API standards. Original error: {e}"
+                    )
+            raise e
+
+        self.record_usage(response)
+        return response
+
+    def completion_request(
+        self,
+        model: str,
+        op_type: str,
+        messages: List[Dict[str, str]],
+        output_schema: Dict[str, str],
+        tools: Optional[str] = None,
+        scratchpad: Optional[str] = None,
+        litellm_completion_kwargs: Dict[str, Any] = {},
+    ) -> Dict[str, Any]:
+        """
+        Builds the keyword arguments for a litellm completion call, including the
+        system prompt, the `send_output` tool and truncated messages.
+
+        Args:
+            model (str): The model name.
+            op_type (str): The operation type.
+            messages (List[Dict[str, str]]): The messages to send to the LLM.
+            output_schema (Dict[str, str]): The output schema dictionary.
+            tools (Optional[str]): The tools to pass to the LLM.
+            scratchpad (Optional[str]): The scratchpad to use for the operation.
+        Returns:
+            Dict[str, Any]: The keyword arguments for `completion`.
+        """
         props = {key: convert_val(value) for key, value in output_schema.items()}
         use_tools = True
 
@@ -501,6 +595,12 @@ class APIWrapper(object):
         parethetical_op_instructions = (
             "many inputs:one output" if op_type == "reduce" else "one input:one output"
         )
+        # With prompt caching, per-call state is kept out of the system prompt so
+        # that it is identical across calls and can be cached as a prefix
+        prompt_caching = self.runner.config.get("prompt_caching", False)
+        scratchpad_state = (
+            "sent after the data, in the last message" if prompt_caching else scratchpad
+        )
 
         system_prompt = f"You are a {persona}, helping the user make sense of their data. The dataset description is: {dataset_description}. You will be performing a {op_type} operation ({parethetical_op_instructions}). You will perform the specified task on the provided data, as precisely and exhaustively (i.e., high recall) as possible. The result should be a structured output that you will send back to the user, with the `send_output` function. Do not influence your answers too much based on the `send_output` function parameter names; just use them to send the result back to the user."
         if scratchpad:
@@ -509,7 +609,7 @@ class APIWrapper(object):
 You are incrementally processing data across multiple batches. You will see:
 1. The current batch of data to process
 2. The intermediate output so far (what you returned last time)
-3. A scratchpad for tracking additional state: {scratchpad}
+3. A scratchpad for tracking additional state: {scratchpad_state}
 
 IMPORTANT: Only use the scratchpad if your task specifically requires tracking items that appear multiple times across batches. If you only need to track distinct/unique items, leave the scratchpad empty and set updated_scratchpad to null.
 
@@ -538,53 +638,21 @@ Your main result must be sent via send_output. The updated_scratchpad is only fo
         # Truncate messages if they exceed the model's context length
         messages = truncate_messages(messages, model)
 
-        self.runner.rate_limiter.try_acquire("llm_call", weight=1)
-        if tools is not None:
-            try:
-                response = completion(
-                    model=model,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": system_prompt,
-                        },
-                    ]
-                    + messages,
-                    tools=tools,
-                    tool_choice=tool_choice,
-                    **litellm_completion_kwargs,
-                )
-            except Exception as e:
-                # Check that there's a prefix for the model name if it's not a basic model
-                if model not in BASIC_MODELS:
-                    if "/" not in model:
-                        raise ValueError(
-                            f"Note: You may also need to prefix your model name with the provider, e.g. 'openai/gpt-4o-mini' or 'gemini/gemini-1.5-flash' to conform to LiteLLM API standards. Original error: {e}"
-                        )
-                raise e
-        else:
-            try:
-                response = completion(
-                    model=model,
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": system_prompt,
-                        },
-                    ]
-                    + messages,
-                    **litellm_completion_kwargs,
-                )
-            except Exception as e:
-                # Check that there's a prefix for the model name if it's not a basic model
-                if model not in BASIC_MODELS:
-                    if "/" not in model:
-                        raise ValueError(
-                            f"Note: You may also need to prefix your model name with the provider, e.g. 'openai/gpt-4o-mini' or 'gemini/gemini-1.5-flash' to conform to LiteLLM API standards. Original error: {e}"
-                        )
-                raise e
+        if prompt_caching and scratchpad:
+            messages = messages + [
+                {"role": "user", "content": f"Current scratchpad: {scratchpad}"}
+            ]
 
-        return response
+        request = {
+            "model": model,
+            "messages": [{"role": "system", "content": system_prompt}] + messages,
+        }
+        if tools is not None:
+            request["tools"] = tools
+            request["tool_choice"] = tool_choice
+        if prompt_caching:
+            request.update(prompt_cache_hints(model, request["messages"]))
+        return {**request, **litellm_completion_kwargs}
 
     def parse_llm_response(
         self,
@@ -666,11 +734,10 @@ Your main result must be sent via send_output. The updated_scratchpad is only fo
                         except json.JSONDecodeError:
                             return [{}]
                         # Execute the function defined in the tool's code
-                        local_scope = {}
-                        exec(tool["code"].strip(), globals(), local_scope)
-                        function_result = local_scope[tool["function"]["name"]](
-                            **function_args
+                        function = load_function(
+                            tool["code"].strip(), tool["function"]["name"], globals()
                         )
+                        function_result = function(**function_args)
                         function_args.update(function_result)
                         results.append(function_args)
             return results
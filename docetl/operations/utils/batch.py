@@ -0,0 +1,303 @@
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from litellm import (
+    ModelResponse,
+    create_batch,
+    create_file,
+    file_content,
+    get_llm_provider,
+    retrieve_batch,
+)
+from rich.console import Console
+
+from docetl.console import DOCETL_CONSOLE
+from docetl.utils import completion_cost
+
+from .cache import DOCETL_HOME_DIR, cache
+
+EXECUTION_MODES = ["sync", "batch"]
+BATCH_STATE_DIR = os.path.join(DOCETL_HOME_DIR, "batches")
+BATCH_ENDPOINT = "/v1/chat/completions"
+# Providers whose batch API takes OpenAI chat completions requests. Anthropic's
+# Message Batches API uses a different request format and isn't supported.
+BATCH_PROVIDERS = {"openai", "azure"}
+# Providers bill batch jobs at half the synchronous price
+BATCH_PRICE_DISCOUNT = 0.5
+TERMINAL_BATCH_STATUSES = {"completed", "failed", "expired", "cancelled", "ended"}
+
+
+def validate_execution_mode(config: Dict[str, Any]) -> None:
+    """
+    Checks an operation's `execution_mode` and `batch_job` settings.
+
+    Raises:
+        ValueError: If the execution mode or a batch setting is invalid.
+        TypeError: If the batch settings are not a dictionary.
+    """
+    mode = config.get("execution_mode", "sync")
+    if mode not in EXECUTION_MODES:
+        raise ValueError(
+            f"'execution_mode' must be one of {EXECUTION_MODES}, got '{mode}'"
+        )
+    batch_config = config.get("batch_job") or {}
+    if not isinstance(batch_config, dict):
+        raise TypeError("'batch_job' must be a dictionary")
+    poll_interval = batch_config.get("poll_interval", 30)
+    if not isinstance(poll_interval, (int, float)) or poll_interval <= 0:
+        raise ValueError("'poll_interval' in 'batch_job' must be a positive number")
+    if mode == "batch" and config.get("model"):
+        check_batch_provider(config["model"])
+
+
+def check_batch_provider(model: str) -> None:
+    """
+    Checks that a model's provider accepts OpenAI-format batch jobs.
+
+    Raises:
+        ValueError: If the model's provider has no supported batch API.
+    """
+    try:
+        provider = get_llm_provider(model)[1]
+    except Exception:
+        provider = None
+    if provider not in BATCH_PROVIDERS:
+        raise ValueError(
+            f"'execution_mode: batch' only supports OpenAI-compatible providers "
+            f"({', '.join(sorted(BATCH_PROVIDERS))}), but model '{model}' uses "
+            f"'{provider}'. Use 'execution_mode: sync' for this model."
+        )
+
+
+class ProviderBatch:
+    """
+    Runs an operation's LLM calls through a provider batch API ahead of time.
+
+    Requests are added with the same arguments an operation would pass to
+    `call_llm`. `run` submits the ones that aren't cached yet as one batch job
+    per model, waits for the provider to finish, and hands the responses to the
+    API wrapper, so the operation's regular `call_llm` calls pick them up and
+    parse, validate and cache them as usual. Requests the job did not answer
+    fall back to synchronous calls.
+
+    The batch id is saved under `DOCETL_HOME_DIR`, so rerunning an interrupted
+    pipeline resumes the submitted job instead of paying for a new one.
+    """
+
+    def __init__(
+        self,
+        runner,
+        config: Dict[str, Any],
+        console: Console = DOCETL_CONSOLE,
+    ):
+        batch_config = config.get("batch_job") or {}
+        self.api = runner.api
+        self.console = console
+        self.enabled = config.get("execution_mode", "sync") == "batch"
+        self.bypass_cache = config.get("bypass_cache", False)
+        self.poll_interval = batch_config.get("poll_interval", 30)
+        self.completion_window = batch_config.get("completion_window", "24h")
+        self.provider_kwargs = {
+            key: batch_config[key]
+            for key in ("api_base", "api_key")
+            if key in batch_config
+        }
+        self.requests: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        self.checked_models = set()
+        self.fetched: List[str] = []
+        self.state_paths: List[str] = []
+
+    def __enter__(self) -> "ProviderBatch":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close(keep_state=exc_type is not None)
+
+    def add(
+        self,
+        model: str,
+        op_type: str,
+        messages: List[Dict[str, str]],
+        output_schema: Dict[str, str],
+        tools: Optional[List[Dict[str, str]]] = None,
+        scratchpad: Optional[str] = None,
+        litellm_completion_kwargs: Dict[str, Any] = {},
+    ) -> None:
+        """
+        Queues a request for the batch job. Does nothing unless the operation
+        runs with `execution_mode: batch`.
+        """
+        if not self.enabled:
+            return
+        if model not in self.checked_models:
+            check_batch_provider(model)
+            self.checked_models.add(model)
+        key = self.api.llm_cache_key(
+            model, op_type, messages, output_schema, scratchpad
+        )
+        if key in self.requests:
+            return
+        self.requests[key] = (
+            model,
+            self.api.completion_request(
+                model,
+                op_type,
+                messages,
+                output_schema,
+                json.dumps(tools) if tools else None,
+                scratchpad,
+                litellm_completion_kwargs,
+            ),
+        )
+
+    def run(self) -> float:
+        """
+        Submits the queued requests that aren't cached, waits for the results
+        and makes them available to `call_llm`.
+
+        Returns:
+            float: The cost of the batch jobs.
+        """
+        if not self.requests:
+            return 0.0
+
+        keys_by_model = defaultdict(list)
+        for key, (model, _) in self.requests.items():
+            keys_by_model[model].append(key)
+
+        with cache as c:
+            uncached = {
+                key for key in self.requests if self.bypass_cache or c.get(key) is None
+            }
+
+        total_cost = 0.0
+        for model, keys in keys_by_model.items():
+            # The job is identified by every request, cached or not, so a rerun
+            # after some of its results were cached still finds it
+            job_id = hashlib.md5(json.dumps([model, sorted(keys)]).encode()).hexdigest()
+            state_path = os.path.join(BATCH_STATE_DIR, f"{job_id}.json")
+            self.state_paths.append(state_path)
+            pending = {key: self.requests[key][1] for key in keys if key in uncached}
+            if pending:
+                total_cost += self._run_job(model, pending, job_id, state_path)
+        return total_cost
+
+    def close(self, keep_state: bool = False) -> None:
+        """
+        Drops batch results the operation didn't use and, unless `keep_state`,
+        forgets the finished jobs.
+        """
+        for key in self.fetched:
+            self.api.batch_results.pop(key, None)
+        self.fetched = []
+        if not keep_state:
+            for state_path in self.state_paths:
+                if os.path.exists(state_path):
+                    os.remove(state_path)
+            self.state_paths = []
+
+    def _run_job(
+        self,
+        model: str,
+        requests: Dict[str, Dict[str, Any]],
+        job_id: str,
+        state_path: str,
+    ) -> float:
+        provider_model, provider, _, _ = get_llm_provider(model)
+
+        if os.path.exists(state_path):
+            with open(state_path) as f:
+                state = json.load(f)
+            self.console.log(
+                f"Resuming batch job [cyan]{state['batch_id']}[/cyan] for {model}"
+            )
+        else:
+            os.makedirs(BATCH_STATE_DIR, exist_ok=True)
+            input_path = os.path.join(BATCH_STATE_DIR, f"{job_id}.jsonl")
+            with open(input_path, "w") as f:
+                for key, body in requests.items():
+                    record = {
+                        "custom_id": key,
+                        "method": "POST",
+                        "url": BATCH_ENDPOINT,
+                        "body": {**body, "model": provider_model},
+                    }
+                    f.write(json.dumps(record) + "\n")
+            with open(input_path, "rb") as f:
+                input_file = create_file(
+                    file=f,
+                    purpose="batch",
+                    custom_llm_provider=provider,
+                    **self.provider_kwargs,
+                )
+            os.remove(input_path)
+            batch = create_batch(
+                completion_window=self.completion_window,
+                endpoint=BATCH_ENDPOINT,
+                input_file_id=input_file.id,
+                custom_llm_provider=provider,
+                **self.provider_kwargs,
+            )
+            state = {"batch_id": batch.id, "input_file_id": input_file.id}
+            with open(state_path, "w") as f:
+                json.dump(state, f)
+            self.console.log(
+                f"Submitted batch job [cyan]{batch.id}[/cyan] with {len(requests)} {model} requests"
+            )
+
+        batch = self._wait(state["batch_id"], provider)
+        if batch.status != "completed" or not batch.output_file_id:
+            self.console.log(
+                f"[yellow]Batch job {batch.id} ended with status '{batch.status}', "
+                f"falling back to synchronous calls[/yellow]"
+            )
+            os.remove(state_path)
+            return 0.0
+
+        output = file_content(
+            file_id=batch.output_file_id,
+            custom_llm_provider=provider,
+            **self.provider_kwargs,
+        )
+        total_cost = 0.0
+        answered = 0
+        for line in output.content.decode().splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            key = record.get("custom_id")
+            response = record.get("response") or {}
+            if key not in requests:
+                continue
+            if record.get("error") or response.get("status_code") != 200:
+                continue
+            result = ModelResponse(**response["body"])
+            self.api.batch_results[key] = result
+            self.api.record_usage(result)
+            self.fetched.append(key)
+            answered += 1
+            total_cost += completion_cost(result) * BATCH_PRICE_DISCOUNT
+
+        if answered < len(requests):
+            self.console.log(
+                f"[yellow]{len(requests) - answered} batch requests did not return a result and will be made synchronously[/yellow]"
+            )
+        return total_cost
+
+    def _wait(self, batch_id: str, provider: str) -> Any:
+        while True:
+            batch = retrieve_batch(
+                batch_id=batch_id,
+                custom_llm_provider=provider,
+                **self.provider_kwargs,
+            )
+            if batch.status in TERMINAL_BATCH_STATUSES:
+                return batch
+            counts = batch.request_counts
+            progress = f" ({counts.completed}/{counts.total} done)" if counts else ""
+            self.console.log(f"Batch job {batch_id} is {batch.status}{progress}")
+            time.sleep(self.poll_interval)
@@ -0,0 +1,313 @@
+"""
+Cascaded pairwise comparisons for resolve, equijoin and link_resolve.
+
+Each candidate pair goes through up to three stages:
+1. A local similarity score (string similarity or embedding cosine similarity).
+   Pairs scoring below a calibrated low threshold are declared non-matches, and
+   pairs scoring at or above a calibrated high threshold are declared matches.
+2. An optional cheap model. Its answer is accepted when the calibration sample
+   showed that answers in that direction agree with the configured model.
+3. The configured comparison model, for everything still uncertain.
+
+Thresholds are calibrated on a random sample of pairs that is labeled by the
+configured comparison model; those labels are reused as the pairs' results.
+"""
+
+import random
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from rapidfuzz import fuzz
+from rich.console import Console
+
+from docetl.console import DOCETL_CONSOLE
+
+CASCADE_SIMILARITY_METHODS = ["string", "embedding"]
+
+
+def precision_recall_at_thresholds(
+    scores: Sequence[float], labels: Sequence[bool], thresholds: Sequence[float]
+) -> Tuple[List[float], List[float]]:
+    """
+    Compute the precision and recall of predicting a match when `score >= threshold`,
+    for every threshold.
+
+    Args:
+        scores (Sequence[float]): The similarity score of each labeled pair.
+        labels (Sequence[bool]): Whether each labeled pair is a match.
+        thresholds (Sequence[float]): The thresholds to evaluate.
+
+    Returns:
+        Tuple[List[float], List[float]]: The precision and recall at each threshold.
+    """
+    scores = np.asarray(scores, dtype=float)
+    labels = np.asarray(labels, dtype=bool)
+    precisions, recalls = [], []
+
+    for threshold in thresholds:
+        predictions = scores >= threshold
+        tp = np.sum(predictions & labels)
+        fp = np.sum(predictions & ~labels)
+        fn = np.sum(~predictions & labels)
+
+        precisions.append(tp / (tp + fp) if (tp + fp) > 0 else 0)
+        recalls.append(tp / (tp + fn) if (tp + fn) > 0 else 0)
+
+    return precisions, recalls
+
+
+def string_similarity(text1: str, text2: str) -> float:
+    """Token-set similarity between two strings, between 0 and 1."""
+    return fuzz.token_set_ratio(text1, text2) / 100
+
+
+def validate_cascade_config(config: Dict[str, Any]) -> None:
+    """
+    Check the `cascade` section of a comparison operation's configuration.
+
+    Raises:
+        TypeError: If the cascade configuration has incorrect types.
+        ValueError: If the cascade configuration has invalid values.
+    """
+    if "cascade" not in config:
+        return
+    cascade = config["cascade"]
+    if not isinstance(cascade, dict):
+        raise TypeError("'cascade' must be a dictionary")
+    if cascade.get("similarity", "string") not in CASCADE_SIMILARITY_METHODS:
+        raise ValueError(
+            f"'similarity' in 'cascade' must be one of {CASCADE_SIMILARITY_METHODS}"
+        )
+    if "cheap_model" in cascade and not isinstance(cascade["cheap_model"], str):
+        raise TypeError("'cheap_model' in 'cascade' must be a string")
+    if "sample_size" in cascade:
+        if not isinstance(cascade["sample_size"], int) or cascade["sample_size"] <= 0:
+            raise ValueError("'sample_size' in 'cascade' must be a positive integer")
+    for key in ["target_recall", "target_precision"]:
+        if key in cascade:
+            if not isinstance(cascade[key], (int, float)):
+                raise TypeError(f"'{key}' in 'cascade' must be a number")
+            if not 0 < cascade[key] <= 1:
+                raise ValueError(f"'{key}' in 'cascade' must be between 0 and 1")
+
+
+class ComparisonCascade:
+    """
+    Decides pairwise comparisons with the cheapest stage that is trustworthy,
+    falling back to the configured comparison model for uncertain pairs.
+
+    Operations supply a `compare(pair, model) -> (is_match, cost)` callable and a
+    similarity score per pair; the cascade decides which stage answers.
+    """
+
+    def __init__(
+        self, cascade_config: Dict[str, Any], console: Console = DOCETL_CONSOLE
+    ):
+        self.similarity = cascade_config.get("similarity", "string")
+        self.cheap_model = cascade_config.get("cheap_model")
+        self.sample_size = cascade_config.get("sample_size", 100)
+        self.target_recall = cascade_config.get("target_recall", 0.95)
+        self.target_precision = cascade_config.get("target_precision", 0.95)
+        self.console = console
+
+        # Until calibrated, every pair is uncertain
+        self.low_threshold = float("-inf")
+        self.high_threshold = float("inf")
+        self.trust_cheap_match = False
+        self.trust_cheap_non_match = False
+        self.stage_counts = Counter()
+        self._stage_counts_lock = threading.Lock()
+
+    def calibrate(
+        self,
+        pairs: Sequence[Any],
+        score: Callable[[Any], float],
+        compare: Callable[[Any, str], Tuple[bool, float]],
+        model: str,
+        max_threads: int,
+    ) -> Tuple[Dict[int, bool], float]:
+        """
+        Label a random sample of pairs with the configured model and calibrate the
+        similarity thresholds and the cheap model against those labels.
+
+        Args:
+            pairs (Sequence[Any]): All candidate pairs.
+            score (Callable[[Any], float]): Returns the similarity score of a pair.
+            compare (Callable[[Any, str], Tuple[bool, float]]): Compares a pair with the given model.
+            model (str): The configured comparison model.
+            max_threads (int): Maximum number of concurrent LLM calls.
+
+        Returns:
+            Tuple[Dict[int, bool], float]: The configured model's answer for each sampled
+            pair (keyed by position in `pairs`), and the cost of calibration.
+        """
+        if not pairs:
+            return {}, 0.0
+
+        sample = random.sample(range(len(pairs)), min(self.sample_size, len(pairs)))
+        sample_scores = [score(pairs[idx]) for idx in sample]
+        with ThreadPoolExecutor(max_workers=max_threads) as executor:
+            full_results = list(
+                executor.map(lambda idx: compare(pairs[idx], model), sample)
+            )
+        labels = [is_match for is_match, _ in full_results]
+        cost = sum(pair_cost for _, pair_cost in full_results)
+
+        self._calibrate_thresholds(sample_scores, labels)
+
+        if self.cheap_model:
+            uncertain = [
+                k
+                for k, sample_score in enumerate(sample_scores)
+                if self.decide_by_score(sample_score) is None
+            ]
+            with ThreadPoolExecutor(max_workers=max_threads) as executor:
+                cheap_results = list(
+                    executor.map(
+                        lambda k: compare(pairs[sample[k]], self.cheap_model),
+                        uncertain,
+                    )
+                )
+            cost += sum(pair_cost for _, pair_cost in cheap_results)
+            self._calibrate_cheap_model(
+                [is_match for is_match, _ in cheap_results],
+                [labels[k] for k in uncertain],
+            )
+
+        self.console.log(
+            f"[bold]Cascade calibrated on {len(sample)} pairs (${cost:.4f}): "
+            f"non-match below {self.low_threshold:.4f}, match at or above {self.high_threshold:.4f} {self.similarity} similarity"
+            + (
+                f"; trusting {self.cheap_model} on "
+                f"matches: {self.trust_cheap_match}, non-matches: {self.trust_cheap_non_match}"
+                if self.cheap_model
+                else ""
+            )
+            + "[/bold]"
+        )
+        return dict(zip(sample, labels)), cost
+
+    def _calibrate_thresholds(self, scores: List[float], labels: List[bool]) -> None:
+        if not any(labels):
+            # Without any matches in the sample, recall can't be estimated
+            return
+
+        thresholds = np.linspace(0, 1, 101)
+        precisions, recalls = precision_recall_at_thresholds(scores, labels, thresholds)
+
+        # Highest threshold that still keeps the target recall
+        valid = [i for i, r in enumerate(recalls) if r >= self.target_recall]
+        if valid:
+            self.low_threshold = float(thresholds[max(valid)])
+
+        # Lowest threshold at and above which every threshold that predicts any
+        # matches meets the target precision. A threshold whose predictions are
+        # all false positives has precision 0 and fails.
+        scores = np.asarray(scores, dtype=float)
+        has_predictions = [bool(np.any(scores >= t)) for t in thresholds]
+        for i in range(len(thresholds)):
+            if (
+                thresholds[i] > self.low_threshold
+                and recalls[i] > 0
+                and all(
+                    precisions[k] >= self.target_precision
+                    for k in range(i, len(thresholds))
+                    if has_predictions[k]
+                )
+            ):
+                self.high_threshold = float(thresholds[i])
+                break
+
+    def _calibrate_cheap_model(
+        self, cheap_labels: List[bool], labels: List[bool]
+    ) -> None:
+        if not any(labels):
+            return
+        precisions, recalls = precision_recall_at_thresholds(
+            [float(label) for label in cheap_labels], labels, [0.5]
+        )
+        self.trust_cheap_match = precisions[0] >= self.target_precision
+        self.trust_cheap_non_match = recalls[0] >= self.target_recall
+
+    def decide_by_score(self, score: float) -> Optional[bool]:
+        """Returns the decision implied by the similarity score, or None if uncertain."""
+        if score < self.low_threshold:
+            return False
+        if score >= self.high_threshold:
+            return True
+        return None
+
+    def decide_by_cheap_model(
+        self, pair: Any, compare: Callable[[Any, str], Tuple[bool, float]]
+    ) -> Tuple[Optional[bool], float]:
+        """Returns the cheap model's answer if it is trusted, or None if uncertain."""
+        if not (
+            self.cheap_model and (self.trust_cheap_match or self.trust_cheap_non_match)
+        ):
+            return None, 0.0
+        is_match, cost = compare(pair, self.cheap_model)
+        if (is_match and self.trust_cheap_match) or (
+            not is_match and self.trust_cheap_non_match
+        ):
+            return is_match, cost
+        return None, cost
+
+    def _record_stage(self, stage: str) -> None:
+        # Pairs are decided from many comparison threads at once
+        with self._stage_counts_lock:
+            self.stage_counts[stage] += 1
+
+    def decide(
+        self,
+        pair: Any,
+        score: float,
+        compare: Callable[[Any, str], Tuple[bool, float]],
+    ) -> Tuple[Optional[bool], float]:
+        """
+        Decide a pair with the similarity score or the cheap model, if either is trusted.
+
+        Returns:
+            Tuple[Optional[bool], float]: Whether the pair matches (None if the comparison
+            model has to decide), and the cost spent on the cheap model.
+        """
+        decision = self.decide_by_score(score)
+        if decision is not None:
+            self._record_stage("similarity")
+            return decision, 0.0
+
+        decision, cost = self.decide_by_cheap_model(pair, compare)
+        if decision is not None:
+            self._record_stage("cheap_model")
+            return decision, cost
+
+        self._record_stage("comparison_model")
+        return None, cost
+
+    def compare(
+        self,
+        pair: Any,
+        score: float,
+        compare: Callable[[Any, str], Tuple[bool, float]],
+        model: str,
+    ) -> Tuple[bool, float]:
+        """
+        Compare a pair with the cheapest trustworthy stage.
+
+        Returns:
+            Tuple[bool, float]: Whether the pair matches, and the cost of the comparison.
+        """
+        decision, cost = self.decide(pair, score, compare)
+        if decision is not None:
+            return decision, cost
+        is_match, full_cost = compare(pair, model)
+        return is_match, cost + full_cost
+
+    def log_summary(self) -> None:
+        self.console.log(
+            f"[green]Cascade decisions: {self.stage_counts['similarity']} by similarity, "
+            f"{self.stage_counts['cheap_model']} by cheap model, "
+            f"{self.stage_counts['comparison_model']} by comparison model[/green]"
+        )
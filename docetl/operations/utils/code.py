@@ -0,0 +1,47 @@
+import functools
+from types import CodeType
+from typing import Any, Callable, Dict, Optional
+
+# The number of compiled code objects kept per process
+COMPILED_CODE_CACHE_SIZE = 256
+
+
+@functools.lru_cache(maxsize=COMPILED_CODE_CACHE_SIZE)
+def compile_code(code: str, name: str) -> CodeType:
+    """
+    Compiles user code, caching the code object so the same code is only
+    parsed and compiled once per process.
+    """
+    return compile(code, f"<{name}>", "exec")
+
+
+def load_function(
+    code: str, name: str, base_globals: Optional[Dict[str, Any]] = None
+) -> Callable:
+    """
+    Runs user code and returns the function it defines under `name`.
+
+    Only the compiled code object is cached. The code runs in a fresh
+    namespace on every call, starting as a copy of `base_globals`, so
+    module-level state in the code (counters, caches) does not carry over
+    between calls. Callers load the function once per operation run.
+
+    Args:
+        code (str): The source code defining the function.
+        name (str): The name of the function to return.
+        base_globals (Optional[Dict[str, Any]]): Globals to make available to the code, such as a module's globals().
+
+    Returns:
+        Callable: The function defined by the code.
+
+    Raises:
+        ValueError: If the code does not define a callable named `name`.
+        Exception: Whatever running the code raises, such as a SyntaxError.
+    """
+    namespace = dict(base_globals or {})
+    exec(compile_code(code, name), namespace)
+    if name not in namespace:
+        raise ValueError(f"Code must define a '{name}' function")
+    if not callable(namespace[name]):
+        raise ValueError(f"'{name}' must be a callable function")
+    return namespace[name]
@@ -0,0 +1,22 @@
+from typing import Dict, List, Tuple
+
+
+def group_key(item: Dict, keys: List[str]) -> Tuple:
+    """
+    Builds the hashable group key of an item. List values are compared as sorted tuples.
+    """
+    return tuple(
+        tuple(sorted(item[key])) if isinstance(item[key], list) else item[key]
+        for key in keys
+    )
+
+
+def group_items(items: List[Dict], keys: List[str]) -> List[Tuple[Tuple, List[Dict]]]:
+    """
+    Groups items by key in memory, keeping groups and their items in order of first appearance.
+    """
+    groups = {}
+    for item in items:
+        groups.setdefault(group_key(item, keys), []).append(item)
+    return list(groups.items())
+
@@ -0,0 +1,106 @@
+import hashlib
+import json
+import os
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .cache import DOCETL_HOME_DIR
+
+LATENCY_PROFILE_PATH = os.path.join(DOCETL_HOME_DIR, "latency_profiles.json")
+# Only the most recent samples of each profile are kept
+MAX_PROFILE_SAMPLES = 200
+
+
+def profile_key(model: str, prompt: str, batch_size: Optional[int]) -> str:
+    """
+    Builds the key of a latency profile from the model, the prompt template and the batch size.
+    """
+    prompt_hash = hashlib.md5(prompt.encode()).hexdigest()
+    return f"{model}:{prompt_hash}:{batch_size}"
+
+
+class LatencyProfile:
+    """
+    Latency samples of LLM calls, persisted per (model, prompt hash, batch size).
+
+    Samples recorded during a run are kept in memory and appended to the
+    profiles on disk by `save`, which keeps the most recent
+    `MAX_PROFILE_SAMPLES` samples of each profile along with their p50 and p95.
+    Later runs read those statistics to start from calibrated latencies
+    instead of a default guess.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or LATENCY_PROFILE_PATH
+        self.lock = threading.Lock()
+        self.profiles: Optional[Dict[str, Dict]] = None
+        self.pending: Dict[str, List[float]] = defaultdict(list)
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def stats(
+        self, model: str, prompt: str, batch_size: Optional[int]
+    ) -> Optional[Dict[str, float]]:
+        """
+        Get the persisted statistics of a profile.
+
+        Args:
+            model (str): The model the calls were made with.
+            prompt (str): The prompt template of the calls.
+            batch_size (Optional[int]): The number of items per call.
+
+        Returns:
+            Optional[Dict[str, float]]: The sample count, p50 and p95 in seconds, or None if the profile has no samples yet.
+        """
+        with self.lock:
+            if self.profiles is None:
+                self.profiles = self._load()
+            profile = self.profiles.get(profile_key(model, prompt, batch_size))
+        if not profile:
+            return None
+        return {k: profile[k] for k in ["count", "p50", "p95"]}
+
+    def record(
+        self, model: str, prompt: str, batch_size: Optional[int], seconds: float
+    ) -> None:
+        """
+        Record the latency of one call; it is persisted by the next `save`.
+        """
+        with self.lock:
+            self.pending[profile_key(model, prompt, batch_size)].append(seconds)
+
+    def save(self) -> None:
+        """
+        Merge the recorded samples into the profiles on disk.
+        """
+        with self.lock:
+            if not self.pending:
+                return
+            # Re-read the file so profiles written by other runs are kept
+            profiles = self._load()
+            for key, samples in self.pending.items():
+                samples = (profiles.get(key, {}).get("samples", []) + samples)[
+                    -MAX_PROFILE_SAMPLES:
+                ]
+                profiles[key] = {
+                    "samples": samples,
+                    "count": len(samples),
+                    "p50": float(np.percentile(samples, 50)),
+                    "p95": float(np.percentile(samples, 95)),
+                }
+            self.pending.clear()
+            self.profiles = profiles
+
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(profiles, f)
+            os.replace(tmp_path, self.path)
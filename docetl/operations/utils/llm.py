@@ -1,13 +1,20 @@
+import functools
+import hashlib
 import json
+import os
+import re
 import threading
 from typing import Any, Dict, List, Optional
 
-import tiktoken
-from litellm import model_cost
+from litellm import get_supported_openai_params, model_cost
 from pydantic import BaseModel
 from rich import print as rprint
 
-from docetl.utils import count_tokens
+from docetl.utils import count_tokens, get_encoder, max_token_count
+
+# Marks the end of a prompt prefix that providers like Anthropic should cache
+CACHE_BREAKPOINT = {"type": "ephemeral"}
+JINJA_TAG = re.compile(r"{{|{%|{#")
 
 
 class LLMResult(BaseModel):
@@ -67,6 +74,85 @@ def timeout(seconds):
     return decorator
 
 
+def split_prompt_message(template: str, prompt: str) -> Dict[str, Any]:
+    """
+    Builds a user message for a prompt rendered from `template`, with the
+    template's static prefix (the literal text before its first Jinja tag) as
+    a separate content block marked as a cache breakpoint. Every document
+    rendered from the template shares that block, so providers can cache it.
+    """
+    match = JINJA_TAG.search(template)
+    static_text = template[: match.start()] if match else template
+    prefix = os.path.commonprefix([static_text, prompt])
+    if not prefix.strip():
+        return {"role": "user", "content": prompt}
+
+    content = [
+        {"type": "text", "text": prefix, "cache_control": dict(CACHE_BREAKPOINT)}
+    ]
+    if prompt[len(prefix) :]:
+        content.append({"type": "text", "text": prompt[len(prefix) :]})
+    return {"role": "user", "content": content}
+
+
+def message_text(message: Dict[str, Any]) -> str:
+    """Returns a message's text, joining its content blocks if it has several."""
+    content = message["content"]
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content)
+    return content
+
+
+@functools.lru_cache(maxsize=None)
+def supports_prompt_cache_key(model: str) -> bool:
+    try:
+        return "prompt_cache_key" in (get_supported_openai_params(model) or [])
+    except Exception:
+        return False
+
+
+def prompt_cache_hints(model: str, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Returns completion arguments that let the provider cache the prompt prefix
+    shared across calls: the system prompt plus any cache breakpoint blocks that
+    follow it.
+
+    Claude models get an extra breakpoint on the system prompt. Other providers
+    cache prefixes automatically, so their messages are flattened back to plain
+    text, and a `prompt_cache_key` naming the shared prefix is added where
+    supported so that calls sharing it reach the same cache.
+    """
+    if "claude" in model:
+        system, *rest = messages
+        system = {
+            **system,
+            "content": [
+                {
+                    "type": "text",
+                    "text": system["content"],
+                    "cache_control": dict(CACHE_BREAKPOINT),
+                }
+            ],
+        }
+        return {"messages": [system] + rest}
+
+    prefix = [messages[0]["content"]]
+    for part in messages[1]["content"] if len(messages) > 1 else []:
+        if not isinstance(part, dict) or "cache_control" not in part:
+            break
+        prefix.append(part["text"])
+    hints = {
+        "messages": [
+            {**message, "content": message_text(message)} for message in messages
+        ]
+    }
+    if supports_prompt_cache_key(model):
+        hints["prompt_cache_key"] = hashlib.md5(
+            json.dumps([model] + prefix).encode()
+        ).hexdigest()
+    return hints
+
+
 def truncate_messages(
     messages: List[Dict[str, str]], model: str, from_agent: bool = False
 ) -> List[Dict[str, str]]:
@@ -74,21 +160,33 @@ def truncate_messages(
     model_input_context_length = model_cost.get(model.split("/")[-1], {}).get(
         "max_input_tokens", 8192
     )
-    total_tokens = sum(count_tokens(json.dumps(msg), model) for msg in messages)
+    serialized_messages = [json.dumps(msg) for msg in messages]
+    # Messages with no more bytes than the limit can't have more tokens than it
+    # either, so they fit without being tokenized
+    if (
+        sum(max_token_count(text) for text in serialized_messages)
+        <= model_input_context_length - 100
+    ):
+        return messages
+    total_tokens = sum(count_tokens(text, model) for text in serialized_messages)
 
     if total_tokens <= model_input_context_length - 100:
         return messages
 
     truncated_messages = messages.copy()
-    longest_message = max(truncated_messages, key=lambda x: len(x["content"]))
-    content = longest_message["content"]
+    longest_message = max(truncated_messages, key=lambda x: len(message_text(x)))
+    longest_part = None
+    if isinstance(longest_message["content"], list):
+        # Only cut the longest text block, so cached prefixes stay intact
+        longest_part = max(
+            longest_message["content"], key=lambda part: len(part.get("text", ""))
+        )
+        content = longest_part["text"]
+    else:
+        content = longest_message["content"]
     excess_tokens = total_tokens - model_input_context_length + 200
 
-    try:
-        encoder = tiktoken.encoding_for_model(model.split("/")[-1])
-    except Exception:
-        encoder = tiktoken.encoding_for_model("gpt-4o")
-
+    encoder = get_encoder(model)
     encoded_content = encoder.encode(content)
     tokens_to_remove = min(len(encoded_content), excess_tokens)
     mid_point = len(encoded_content) // 2
@@ -105,5 +203,8 @@ def truncate_messages(
         f"[yellow]{warning_type} Warning:[/yellow] Cutting {tokens_to_remove} tokens from a prompt with {total_tokens} tokens..."
     )
 
-    longest_message["content"] = truncated_content
+    if longest_part is not None:
+        longest_part["text"] = truncated_content
+    else:
+        longest_message["content"] = truncated_content
     return truncated_messages
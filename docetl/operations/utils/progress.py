@@ -1,5 +1,5 @@
-from concurrent.futures import as_completed
-from typing import Iterable, Optional, Union
+from concurrent.futures import FIRST_COMPLETED, Executor, as_completed, wait
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple, Union
 
 from tqdm import tqdm
 
@@ -70,3 +70,51 @@ def rich_as_completed(futures, total=None, desc=None, leave=True, console=None):
         for future in as_completed(futures):
             yield future
             pbar.update()
+
+
+def bounded_submit(
+    executor: Executor,
+    fn: Callable[[Any], Any],
+    items: Iterable[Any],
+    max_in_flight: int,
+    ordered: bool = True,
+) -> Iterator[Tuple[int, Any]]:
+    """
+    Submit `fn(item)` for each item, keeping at most `max_in_flight` items
+    submitted but not yet yielded, and yield `(index, result)` pairs.
+
+    Items are pulled from `items` lazily, so it can be a generator. With
+    `ordered=True`, results are yielded in input order; results that finish
+    ahead of a slower earlier item wait in a buffer that counts towards
+    `max_in_flight`, so memory stays bounded either way. With `ordered=False`,
+    results are yielded as they complete.
+    """
+    items = enumerate(items)
+    pending = {}
+    buffered = {}
+    next_index = 0
+    exhausted = False
+
+    while True:
+        while not exhausted and len(pending) + len(buffered) < max_in_flight:
+            next_item = next(items, None)
+            if next_item is None:
+                exhausted = True
+                break
+            index, item = next_item
+            pending[executor.submit(fn, item)] = index
+
+        if not pending:
+            return
+
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            index = pending.pop(future)
+            if ordered:
+                buffered[index] = future.result()
+            else:
+                yield index, future.result()
+
+        while next_index in buffered:
+            yield next_index, buffered.pop(next_index)
+            next_index += 1
@@ -0,0 +1,43 @@
+from typing import Dict, List, Set
+
+
+class UnionFind:
+    """
+    Disjoint-set forest over the integers ``0..n-1`` with path compression and
+    union by rank, used to track which records have been resolved together.
+    """
+
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+        self.rank = [0] * n
+
+    def find(self, item: int) -> int:
+        root = item
+        while root != self.parent[root]:
+            root = self.parent[root]
+        # Point every node on the path directly at the root
+        while item != root:
+            self.parent[item], item = root, self.parent[item]
+        return root
+
+    def union(self, item1: int, item2: int) -> bool:
+        """Merges the sets containing both items. Returns False if they were already merged."""
+        root1, root2 = self.find(item1), self.find(item2)
+        if root1 == root2:
+            return False
+        if self.rank[root1] < self.rank[root2]:
+            root1, root2 = root2, root1
+        self.parent[root2] = root1
+        if self.rank[root1] == self.rank[root2]:
+            self.rank[root1] += 1
+        return True
+
+    def connected(self, item1: int, item2: int) -> bool:
+        return self.find(item1) == self.find(item2)
+
+    def groups(self) -> List[Set[int]]:
+        """Returns all sets, ordered by their smallest member."""
+        groups: Dict[int, Set[int]] = {}
+        for item in range(len(self.parent)):
+            groups.setdefault(self.find(item), set()).add(item)
+        return list(groups.values())
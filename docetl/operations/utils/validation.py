@@ -1,4 +1,7 @@
+import ast
 import json
+import threading
+from functools import lru_cache
 from typing import Any, Dict, Union
 
 from asteval import Interpreter
@@ -7,7 +10,38 @@ from jinja2.exceptions import UndefinedError
 from rich import print as rprint
 from rich.prompt import Prompt
 
-aeval = Interpreter()
+# Number of compiled prompt templates and validation rules kept in memory
+TEMPLATE_CACHE_SIZE = 1024
+RULE_CACHE_SIZE = 1024
+
+# asteval interpreters keep the state of the evaluation they are running, so
+# every thread evaluates validation rules with its own interpreter
+_interpreters = threading.local()
+
+# Shared by all compiled templates; Jinja environments are safe to share
+# across threads once configured
+_strict_env = Environment(undefined=StrictUndefined)
+
+
+@lru_cache(maxsize=TEMPLATE_CACHE_SIZE)
+def compile_template(source: str) -> Template:
+    """
+    Compiles a Jinja template string with strict undefined checking, caching
+    the result by template source.
+
+    Operations call this on their prompts at construction time, so rendering
+    a prompt per document doesn't compile it again.
+
+    Args:
+        source: The template string
+
+    Returns:
+        The compiled template
+
+    Raises:
+        TemplateSyntaxError: When the template is invalid
+    """
+    return _strict_env.from_string(source)
 
 
 def strict_render(template: Union[Template, str], context: Dict[str, Any]) -> str:
@@ -25,9 +59,6 @@ def strict_render(template: Union[Template, str], context: Dict[str, Any]) -> st
         UndefinedError: When any undefined variable, attribute or index is accessed
         ValueError: When template is invalid
     """
-    # Create strict environment
-    env = Environment(undefined=StrictUndefined)
-
     # Convert string to Template if needed
     if isinstance(template, str):
 
@@ -36,7 +67,7 @@ def strict_render(template: Union[Template, str], context: Dict[str, Any]) -> st
         #     raise UndefinedError("The inputs variable is a list, so you cannot access attributes of inputs. Use inputs[index].key instead.")
 
         try:
-            template = env.from_string(template)
+            template = compile_template(template)
         except Exception as e:
             raise ValueError(f"Invalid template: {str(e)}")
 
@@ -66,16 +97,55 @@ def strict_render(template: Union[Template, str], context: Dict[str, Any]) -> st
         )
 
 
+def _interpreter() -> Interpreter:
+    """Returns the asteval interpreter of the current thread."""
+    interpreter = getattr(_interpreters, "interpreter", None)
+    if interpreter is None:
+        interpreter = _interpreters.interpreter = Interpreter()
+    return interpreter
+
+
+@lru_cache(maxsize=RULE_CACHE_SIZE)
+def compile_rule(expression: str) -> ast.AST:
+    """
+    Parses a validation rule, caching the result by expression.
+
+    The parsed rule holds no evaluation state, so it can be evaluated by
+    any number of threads at once.
+
+    Args:
+        expression: The validation rule, a Python expression over `output`
+
+    Returns:
+        The parsed rule
+
+    Raises:
+        SyntaxError: When the rule is not a valid expression
+    """
+    return _interpreter().parse(expression)
+
+
 def safe_eval(expression: str, output: Dict) -> bool:
-    """Safely evaluate an expression with a given output dictionary."""
+    """
+    Safely evaluate an expression with a given output dictionary.
+
+    The expression is parsed once, and evaluated with the interpreter of the
+    calling thread. An output for which the expression fails to evaluate does
+    not pass.
+    """
     try:
-        aeval.symtable["output"] = output
-        return bool(aeval(expression))
+        rule = compile_rule(expression)
     except Exception:
-        try:
-            return bool(eval(expression, locals={"output": output}))
-        except Exception:
-            return False
+        return False
+
+    interpreter = _interpreter()
+    interpreter.symtable["output"] = output
+    try:
+        return bool(interpreter.eval(rule, show_errors=False, raise_errors=True))
+    except Exception:
+        return False
+    finally:
+        interpreter.symtable.pop("output", None)
 
 
 def convert_val(value: Any, model: str = "gpt-4o-mini") -> Dict[str, Any]:
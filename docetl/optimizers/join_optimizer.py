@@ -9,6 +9,7 @@ from rich.prompt import Confirm
 
 from docetl.operations.equijoin import EquijoinOperation
 from docetl.operations.resolve import ResolveOperation
+from docetl.operations.utils import precision_recall_at_thresholds
 from docetl.utils import completion_cost, extract_jinja_variables
 
 
@@ -1172,19 +1173,7 @@ class JoinOptimizer:
         sim_scores = np.array([sim_dict[(i, j)] for i, j, _ in comparisons])
 
         thresholds = np.linspace(0, 1, 100)
-        precisions, recalls = [], []
-
-        for threshold in thresholds:
-            predictions = sim_scores >= threshold
-            tp = np.sum(predictions & true_labels)
-            fp = np.sum(predictions & ~true_labels)
-            fn = np.sum(~predictions & true_labels)
-
-            precision = tp / (tp + fp) if (tp + fp) > 0 else 0
-            recall = tp / (tp + fn) if (tp + fn) > 0 else 0
-
-            precisions.append(precision)
-            recalls.append(recall)
+        _, recalls = precision_recall_at_thresholds(sim_scores, true_labels, thresholds)
 
         valid_indices = [i for i, r in enumerate(recalls) if r >= self.target_recall]
         if not valid_indices:
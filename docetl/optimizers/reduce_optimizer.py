@@ -1756,6 +1756,18 @@ Remember, you must fold the new data into the existing output, do not start fres
             fold_times = operation_instance.fold_times
             merge_avg_time = mean(merge_times) if merge_times else None
             fold_avg_time = mean(fold_times) if fold_times else None
+            # Fall back to the median latencies persisted by earlier runs
+            latency_profile = operation_instance.latency_profile
+            if merge_avg_time is None:
+                stats = latency_profile.stats(
+                    *operation_instance.latency_profile_key("merge")
+                )
+                merge_avg_time = stats["p50"] if stats else None
+            if fold_avg_time is None:
+                stats = latency_profile.stats(
+                    *operation_instance.latency_profile_key("fold")
+                )
+                fold_avg_time = stats["p50"] if stats else None
 
             self.console.log("\n[bold]Scores:[/bold]")
             self.console.log(f"Original plan: {best_score:.2f}")
@@ -29,7 +29,7 @@ import json
 import os
 import shutil
 import time
-from collections import defaultdict
+from collections import Counter, defaultdict
 from typing import Any, Dict, List, Optional, Tuple, Union
 
 from dotenv import load_dotenv
@@ -657,6 +657,21 @@ class DSLRunner(ConfigWrapper):
 
         return builder.clean_optimized_config(), self.total_cost
 
+    def _log_prompt_cache_usage(self, op_name: str, usage_before: Counter) -> None:
+        """
+        Logs how many of an operation's input tokens the provider read from its
+        prompt cache.
+        """
+        usage = self.api.prompt_token_usage
+        input_tokens = usage["input"] - usage_before["input"]
+        cached_tokens = usage["cached"] - usage_before["cached"]
+        if input_tokens and (cached_tokens or self.config.get("prompt_caching")):
+            self.console.log(
+                f"[dim]{op_name}: {cached_tokens:,} cached and "
+                f"{input_tokens - cached_tokens:,} uncached input tokens "
+                f"({cached_tokens / input_tokens:.0%} cached)[/dim]"
+            )
+
     def _run_operation(
         self,
         op_config: Dict[str, Any],
@@ -691,6 +706,7 @@ class DSLRunner(ConfigWrapper):
             "status": self.status,
         }
         operation_instance = operation_class(**oc_kwargs)
+        usage_before = self.api.prompt_token_usage.copy()
         if op_config["type"] == "equijoin":
             output_data, cost = operation_instance.execute(
                 input_data["left_data"], input_data["right_data"]
@@ -701,6 +717,7 @@ class DSLRunner(ConfigWrapper):
             output_data, cost = operation_instance.execute(input_data)
 
         self.total_cost += cost
+        self._log_prompt_cache_usage(op_config["name"], usage_before)
 
         if return_instance:
             return output_data, operation_instance
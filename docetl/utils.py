@@ -1,3 +1,4 @@
+import functools
 import json
 import math
 import re
@@ -149,18 +150,50 @@ def load_config(config_path: str) -> Dict[str, Any]:
         raise yaml.YAMLError(f"Error parsing YAML configuration: {e}")
 
 
-def count_tokens(text: str, model: str) -> int:
+# Texts up to this length have their token counts cached. Short texts such as
+# system prompts and templates repeat across calls; the cap, together with the
+# cache size, bounds the memory held by cached strings to a few megabytes
+TOKEN_COUNT_CACHE_MAX_CHARS = 2_000
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoder(model: str) -> tiktoken.Encoding:
     """
-    Count the number of tokens in a string using the specified model.
+    Get the tiktoken encoder of a model, loading it once per process.
+
+    Provider prefixes (e.g. "azure/") are ignored, and models tiktoken doesn't
+    know fall back to the gpt-4o encoder.
     """
-    model_name = model.replace("azure/", "")
     try:
-        encoder = tiktoken.encoding_for_model(model_name)
-        return len(encoder.encode(text))
+        return tiktoken.encoding_for_model(model.split("/")[-1])
     except Exception:
-        # Use gpt-4o-mini to count tokens for other models
-        encoder = tiktoken.encoding_for_model("gpt-4o")
-        return len(encoder.encode(text))
+        return tiktoken.encoding_for_model("gpt-4o")
+
+
+@functools.lru_cache(maxsize=1024)
+def _count_tokens_cached(text: str, model: str) -> int:
+    return len(get_encoder(model).encode(text))
+
+
+def count_tokens(text: str, model: str) -> int:
+    """
+    Count the number of tokens in a string using the specified model.
+
+    Counts of short texts, such as system prompts and templates, are cached.
+    """
+    if len(text) <= TOKEN_COUNT_CACHE_MAX_CHARS:
+        return _count_tokens_cached(text, model)
+    return len(get_encoder(model).encode(text))
+
+
+def max_token_count(text: str) -> int:
+    """
+    An upper bound on the number of tokens in a string, without tokenizing it.
+
+    Every token of a byte-level BPE encoding covers at least one byte, so a
+    string never has more tokens than UTF-8 bytes.
+    """
+    return len(text.encode("utf-8"))
 
 
 def truncate_sample_data(
@@ -195,10 +228,7 @@ def truncate_sample_data(
                     remaining_tokens = available_tokens - current_tokens
 
                     # Encode the value
-                    try:
-                        encoder = tiktoken.encoding_for_model(model)
-                    except Exception:
-                        encoder = tiktoken.encoding_for_model("gpt-4o")
+                    encoder = get_encoder(model)
                     encoded_value = encoder.encode(str(data[key]))
 
                     # Calculate how many tokens to keep
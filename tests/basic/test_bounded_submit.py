@@ -0,0 +1,47 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from docetl.operations.utils import bounded_submit
+
+
+def test_bounded_submit_limits_items_in_flight():
+    pulled = []
+
+    def items():
+        for i in range(20):
+            pulled.append(i)
+            yield i
+
+    def work(i):
+        time.sleep(0.001 * (i % 3))
+        return i * 2
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = []
+        for index, result in bounded_submit(executor, work, items(), 3):
+            # Never more than 3 items pulled ahead of what has been yielded
+            assert len(pulled) - len(results) <= 3
+            results.append((index, result))
+
+    assert results == [(i, i * 2) for i in range(20)]
+
+
+def test_bounded_submit_unordered_yields_as_completed():
+    slow_started = threading.Event()
+
+    def work(i):
+        if i == 0:
+            slow_started.set()
+            time.sleep(0.2)
+        return i
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        order = [
+            index
+            for index, _ in bounded_submit(executor, work, range(4), 4, ordered=False)
+        ]
+
+    assert slow_started.is_set()
+    assert sorted(order) == [0, 1, 2, 3]
+    assert order[-1] == 0
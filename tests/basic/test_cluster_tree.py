@@ -0,0 +1,159 @@
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from docetl.operations.cluster import ClusterOperation
+from docetl.operations.clustering_utils import knn_graph_merges
+from docetl.operations.utils import LLMResult
+
+
+class MockAPI:
+    """Joins the child concepts, tracking the peak number of concurrent calls"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    def gen_embedding(self, model, input):
+        return {"data": [{"embedding": [float(len(text)), 1.0]} for text in input]}
+
+    def call_llm(self, model, op_type, messages, output_schema, **kwargs):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.001)
+        with self.lock:
+            self.active -= 1
+        return LLMResult(
+            response=messages[0]["content"], total_cost=1.0, validated=True
+        )
+
+    def parse_llm_response(self, response, schema=None, **kwargs):
+        return [{"concept": response}]
+
+
+class MockRunner:
+    def __init__(self):
+        self.config = {}
+        self.api = MockAPI()
+
+
+def cluster_op(runner, max_threads=4, **overrides):
+    config = {
+        "name": "topics",
+        "type": "cluster",
+        "embedding_keys": ["concept"],
+        "summary_schema": {"concept": "str"},
+        # Rendering fails unless every child is summarized first
+        "summary_prompt": "({% for input in inputs %}{{ input.concept }}{% endfor %})",
+        **overrides,
+    }
+    return ClusterOperation(runner, config, "gpt-4o-mini", max_threads)
+
+
+def chain(n):
+    # Merge i joins the previous merge with leaf i + 1, giving a tree of depth n - 1
+    children = [(0, 1)] + [(n + i - 1, i + 1) for i in range(1, n - 1)]
+    return children, [float(i + 1) for i in range(n - 1)]
+
+
+def test_deep_trees_are_built_and_annotated_without_recursion():
+    runner = MockRunner()
+    op = cluster_op(runner)
+    n = 2000
+    leaves = [{"concept": str(i % 10)} for i in range(n)]
+    tree = op.build_tree(leaves, *chain(n))
+    op.prompt_template = op.config["summary_prompt"]
+
+    assert op.annotate_clustering_tree(tree) == n - 1
+    assert tree["concept"].startswith("((((") and tree["concept"].endswith("9)")
+    op.annotate_leaves(tree)
+    assert len(leaves[0]["clusters"]) == n - 1 and len(leaves[-1]["clusters"]) == 1
+
+
+def test_collapse_keeps_child_order():
+    op = cluster_op(MockRunner())
+    leaves = [{"concept": c} for c in "abcd"]
+    # ((a b) c) and d merged far above
+    tree = op.build_tree(leaves, [(0, 1), (4, 2), (5, 3)], [1.0, 1.1, 5.0])
+
+    collapsed = op._collapse_tree(tree, collapse=0.5)[0]
+    # The merge at 1.1 is too close to the one at 1.0 and is dissolved
+    assert [child.get("concept") for child in collapsed["children"][0]["children"]] == [
+        "a",
+        "b",
+        "c",
+    ]
+    assert collapsed["children"][1] is leaves[3]
+
+
+def test_execute_runs_ready_nodes_concurrently_on_one_bounded_pool():
+    runner = MockRunner()
+    data = [{"concept": "x" * (i % 50 + 1)} for i in range(300)]
+    results, cost = cluster_op(runner, max_threads=3).execute(data)
+
+    assert cost == 299
+    assert runner.api.peak == 3
+    assert all(result["clusters"] for result in results)
+
+
+def leaves_and_heights(tree):
+    leaves, stack = [], [tree]
+    while stack:
+        node = stack.pop()
+        if "children" not in node:
+            leaves.append(node["id"])
+            continue
+        for child in node["children"]:
+            assert child.get("distance", 0) <= node["distance"]
+            stack.append(child)
+    return sorted(leaves)
+
+
+@pytest.mark.parametrize("method", ["kmeans", "birch"])
+def test_flat_then_centroid_clustering_builds_a_full_tree(method):
+    op = cluster_op(MockRunner(), clustering_method=method, leaf_cluster_size=20)
+    rng = np.random.default_rng(0)
+    items = [{"id": i} for i in range(300)]
+    tree = op.cluster_tree(items, rng.normal(size=(300, 8)))
+
+    # Every item is a leaf exactly once, and distances never decrease upwards
+    assert leaves_and_heights(tree) == list(range(300))
+
+
+def test_knn_graph_linkage_matches_exact_single_linkage():
+    from sklearn.cluster import AgglomerativeClustering
+    from sklearn.neighbors import NearestNeighbors
+
+    embeddings = np.random.default_rng(1).normal(size=(60, 4))
+    distances, neighbors = NearestNeighbors(n_neighbors=59).fit(embeddings).kneighbors()
+    children, merge_distances = knn_graph_merges(neighbors, distances)
+
+    exact = AgglomerativeClustering(linkage="single", compute_distances=True)
+    exact.fit(embeddings)
+    assert len(children) == 59
+    assert np.allclose(merge_distances, np.sort(exact.distances_))
+
+
+def test_knn_graph_linkage_joins_disconnected_components():
+    # Two pairs of points, each only knowing its partner
+    neighbors = np.array([[1], [0], [3], [2]])
+    distances = np.array([[1.0], [1.0], [2.0], [2.0]])
+    children, merge_distances = knn_graph_merges(neighbors, distances)
+
+    assert children == [(0, 1), (2, 3), (4, 5)]
+    assert merge_distances == [1.0, 2.0, 2.0]
+
+
+def test_hnsw_requires_hnswlib(monkeypatch):
+    monkeypatch.setitem(sys.modules, "hnswlib", None)
+    op = cluster_op(MockRunner(), clustering_method="hnsw")
+    with pytest.raises(ImportError, match="hnswlib"):
+        op.cluster_tree([{"id": 0}, {"id": 1}], [[0.0], [1.0]])
+
+    with pytest.raises(ValueError):
+        cluster_op(MockRunner(), clustering_method="spectral")
@@ -0,0 +1,108 @@
+import pytest
+
+from docetl.operations.code_operations import CodeFilterOperation, CodeMapOperation
+
+COLUMNS_CODE = """
+def batch_transform(docs):
+    return {
+        "length": [len(doc["text"]) for doc in docs],
+        "upper": [doc["text"].upper() for doc in docs],
+    }
+"""
+
+ROWS_CODE = """
+def batch_transform(docs):
+    return [{"length": len(doc["text"])} for doc in docs]
+"""
+
+MASK_CODE = """
+def batch_transform(docs):
+    return [len(doc["text"]) % 2 == 0 for doc in docs]
+"""
+
+
+class MockRunner:
+    def __init__(self):
+        self.config = {}
+
+
+def code_op(cls, op_type, code, **overrides):
+    config = {
+        "name": f"test_{op_type}",
+        "type": op_type,
+        "code": code,
+        "batch_size": 3,
+        **overrides,
+    }
+    return cls(MockRunner(), config, "gpt-4o-mini", 2)
+
+
+DOCS = [{"text": "a" * i} for i in range(10)]
+
+
+@pytest.mark.parametrize("executor", ["thread", "process"])
+def test_batch_code_map_columns(executor):
+    operation = code_op(
+        CodeMapOperation,
+        "code_map",
+        COLUMNS_CODE,
+        executor=executor,
+        drop_keys=["upper"],
+    )
+    results, cost = operation.execute(DOCS)
+
+    assert results == [{"text": doc["text"], "length": i} for i, doc in enumerate(DOCS)]
+    assert cost == 0.0
+
+
+def test_batch_code_map_rows_and_filter_mask():
+    results, _ = code_op(CodeMapOperation, "code_map", ROWS_CODE).execute(DOCS)
+    assert [r["length"] for r in results] == list(range(10))
+
+    kept, _ = code_op(CodeFilterOperation, "code_filter", MASK_CODE).execute(DOCS)
+    assert kept == DOCS[::2]
+
+
+def test_batch_transform_validation():
+    with pytest.raises(ValueError, match="batch_transform"):
+        code_op(CodeMapOperation, "code_map", "def transform(doc):\n    return doc\n")
+
+    with pytest.raises(ValueError, match="batch_size"):
+        code_op(CodeMapOperation, "code_map", ROWS_CODE, batch_size=0)
+
+    short = "def batch_transform(docs):\n    return [True]\n"
+    with pytest.raises(ValueError, match="returned 1 outputs for a batch of 3"):
+        code_op(CodeFilterOperation, "code_filter", short).execute(DOCS)
+
+
+def test_batch_transform_output_shapes_are_checked():
+    uneven = (
+        "def batch_transform(docs):\n"
+        "    return {'a': [1] * len(docs), 'b': [2] * (len(docs) - 1)}\n"
+    )
+    with pytest.raises(ValueError, match="columns of different lengths"):
+        code_op(CodeMapOperation, "code_map", uneven).execute(DOCS)
+
+    # A string is iterable, but isn't a list of booleans
+    not_a_list = "def batch_transform(docs):\n    return 'yny'\n"
+    with pytest.raises(ValueError, match="must return a sequence, got str"):
+        code_op(CodeFilterOperation, "code_filter", not_a_list).execute(DOCS)
+
+    # Only code_map splits dictionaries of columns
+    columns = "def batch_transform(docs):\n    return {'keep': [True] * len(docs)}\n"
+    with pytest.raises(ValueError, match="got dict"):
+        code_op(CodeFilterOperation, "code_filter", columns).execute(DOCS)
+
+
+def test_batch_transform_accepts_arrays_and_empty_columns():
+    numpy_mask = (
+        "import numpy as np\n"
+        "def batch_transform(docs):\n"
+        "    return np.array([len(doc['text']) % 2 == 0 for doc in docs])\n"
+    )
+    kept, _ = code_op(CodeFilterOperation, "code_filter", numpy_mask).execute(DOCS)
+    assert kept == DOCS[::2]
+
+    no_op = "def batch_transform(docs):\n    return {}\n"
+    results, _ = code_op(CodeMapOperation, "code_map", no_op).execute(DOCS)
+    assert results == DOCS
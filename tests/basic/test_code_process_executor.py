@@ -0,0 +1,141 @@
+import os
+import time
+
+import pytest
+
+from docetl.operations.code_operations import (
+    CodeFilterOperation,
+    CodeMapOperation,
+    CodeReduceOperation,
+)
+
+MAP_CODE = """
+import os
+import re
+
+def transform(doc):
+    return {"words": len(re.findall(r"\\w+", doc["text"])), "pid": os.getpid()}
+"""
+
+REDUCE_CODE = """
+def transform(items):
+    return {"total": sum(item["value"] for item in items)}
+"""
+
+FILTER_CODE = """
+def transform(doc):
+    return doc["value"] % 3 == 0
+"""
+
+
+class MockRunner:
+    def __init__(self):
+        self.config = {}
+
+
+def code_op(cls, op_type, code, executor, **overrides):
+    config = {
+        "name": f"test_{op_type}",
+        "type": op_type,
+        "code": code,
+        "executor": executor,
+        "concurrent_thread_count": 2,
+        **overrides,
+    }
+    return cls(MockRunner(), config, "gpt-4o-mini", 2)
+
+
+@pytest.mark.parametrize("chunk_size", [None, 7])
+def test_process_executor_matches_thread_executor(chunk_size):
+    docs = [{"text": "word " * i, "value": i} for i in range(50)]
+
+    thread_results, _ = code_op(
+        CodeMapOperation, "code_map", MAP_CODE, "thread"
+    ).execute(docs)
+    process_results, cost = code_op(
+        CodeMapOperation, "code_map", MAP_CODE, "process", chunk_size=chunk_size
+    ).execute(docs)
+
+    assert [r["words"] for r in process_results] == [r["words"] for r in thread_results]
+    assert process_results[3]["words"] == 3
+    assert [r["text"] for r in process_results] == [doc["text"] for doc in docs]
+    assert cost == 0.0
+    # The transform ran in worker processes
+    assert thread_results[0]["pid"] not in {r["pid"] for r in process_results}
+
+    filtered, _ = code_op(
+        CodeFilterOperation, "code_filter", FILTER_CODE, "process"
+    ).execute(docs)
+    assert [doc["value"] for doc in filtered] == list(range(0, 50, 3))
+
+    reduced, _ = code_op(
+        CodeReduceOperation,
+        "code_reduce",
+        REDUCE_CODE,
+        "process",
+        reduce_key="parity",
+    ).execute([{"parity": doc["value"] % 2, **doc} for doc in docs])
+    assert {r["parity"]: r["total"] for r in reduced} == {0: 600, 1: 625}
+
+
+def test_invalid_executor_config():
+    with pytest.raises(ValueError, match="Invalid executor"):
+        code_op(CodeMapOperation, "code_map", MAP_CODE, "gpu")
+
+    with pytest.raises(ValueError, match="chunk_size"):
+        code_op(CodeMapOperation, "code_map", MAP_CODE, "process", chunk_size=0)
+
+
+BENCHMARK_MAP_CODE = """
+def transform(doc):
+    return {"checksum": sum(i * i % 7 for i in range(doc["value"]))}
+"""
+
+BENCHMARK_REDUCE_CODE = """
+def transform(items):
+    return {"checksum": sum(i * i % 7 for item in items for i in range(item["value"]))}
+"""
+
+BENCHMARK_FILTER_CODE = """
+def transform(doc):
+    return sum(i * i % 7 for i in range(doc["value"])) % 2 == 0
+"""
+
+
+@pytest.mark.benchmark
+@pytest.mark.skipif(
+    not os.environ.get("DOCETL_RUN_BENCHMARKS"),
+    reason="set DOCETL_RUN_BENCHMARKS=1 to time the code executors",
+)
+@pytest.mark.parametrize(
+    "cls, op_type, code",
+    [
+        (CodeMapOperation, "code_map", BENCHMARK_MAP_CODE),
+        (CodeReduceOperation, "code_reduce", BENCHMARK_REDUCE_CODE),
+        (CodeFilterOperation, "code_filter", BENCHMARK_FILTER_CODE),
+    ],
+)
+def test_benchmark_thread_vs_process_executor(cls, op_type, code):
+    docs = [{"group": i % 50, "value": 20_000 + i} for i in range(2_000)]
+    workers = os.cpu_count()
+
+    timings, outputs = {}, {}
+    for executor in ["thread", "process"]:
+        op = code_op(
+            cls,
+            op_type,
+            code,
+            executor,
+            concurrent_thread_count=workers,
+            reduce_key="group",
+        )
+        start = time.perf_counter()
+        outputs[executor], _ = op.execute(docs)
+        timings[executor] = time.perf_counter() - start
+
+    print(
+        f"\n{op_type} on {len(docs)} items with {workers} workers: "
+        f"thread {timings['thread']:.2f}s, process {timings['process']:.2f}s "
+        f"({timings['thread'] / timings['process']:.1f}x)"
+    )
+    assert outputs["process"] == outputs["thread"]
@@ -0,0 +1,140 @@
+import pytest
+
+from docetl.operations.equijoin import EquijoinOperation
+from docetl.operations.resolve import ResolveOperation
+from docetl.operations.utils import LLMResult
+
+
+class MockAPI:
+    """Answers comparisons by checking whether the first letters of the names match"""
+
+    def __init__(self, batch_answer=None):
+        self.batch_answer = batch_answer
+        self.calls = []
+
+    def call_llm(self, model, op_type, messages, output_schema, **kwargs):
+        self.calls.append(op_type)
+        return LLMResult(
+            response=(op_type, messages[0]["content"]), total_cost=1.0, validated=True
+        )
+
+    def parse_llm_response(self, response, schema=None, **kwargs):
+        op_type, prompt = response
+        names = prompt.split()
+        if op_type == "batch compare":
+            if self.batch_answer is not None:
+                return [{"is_match": self.batch_answer}]
+            return [
+                {"is_match": [a[0] == b[0] for a, b in zip(names[::2], names[1::2])]}
+            ]
+        return [{"is_match": names[0][0] == names[1][0]}]
+
+    def validate_output(self, operation, output, console):
+        return True
+
+
+class MockRunner:
+    """A simple mock runner for testing"""
+
+    def __init__(self, api):
+        self.config = {}
+        self.console = None
+        self.api = api
+
+
+def make_equijoin(api):
+    return EquijoinOperation(
+        MockRunner(api),
+        {
+            "name": "join_names",
+            "type": "equijoin",
+            "left": "left",
+            "right": "right",
+            "comparison_prompt": "{{ left.name }} {{ right.name }}",
+            "compare_batch_prompt": "{% for pair in pairs %}{{ pair.left.name }} {{ pair.right.name }} {% endfor %}",
+            "compare_batch_prompt_size": 3,
+            "blocking_conditions": ["True"],
+        },
+        "gpt-4o-mini",
+        2,
+    )
+
+
+def test_equijoin_compares_pairs_in_batches():
+    api = MockAPI()
+    op = make_equijoin(api)
+    results, cost = op.execute(
+        [{"name": "apple"}, {"name": "banana"}],
+        [{"name": "avocado"}, {"name": "blueberry"}, {"name": "cherry"}],
+    )
+
+    assert api.calls == ["batch compare", "batch compare"]
+    assert cost == 2.0
+    assert sorted((r["name_left"], r["name_right"]) for r in results) == [
+        ("apple", "avocado"),
+        ("banana", "blueberry"),
+    ]
+
+
+def test_equijoin_batch_falls_back_to_single_pairs():
+    api = MockAPI(batch_answer=[True])
+    op = make_equijoin(api)
+    matches, cost = op.compare_batch(
+        op.config["comparison_prompt"],
+        op.config["compare_batch_prompt"],
+        "gpt-4o-mini",
+        [({"name": "apple"}, {"name": "avocado"}), ({"name": "apple"}, {"name": "kiwi"})],
+    )
+
+    assert matches == [True, False]
+    assert api.calls == ["batch compare", "compare", "compare"]
+    assert cost == 3.0
+
+
+def test_resolve_batch_skips_llm_for_identical_blocking_keys():
+    api = MockAPI()
+    op = ResolveOperation(
+        MockRunner(api),
+        {
+            "name": "resolve_names",
+            "type": "resolve",
+            "comparison_prompt": "{{ input1.name }} {{ input2.name }}",
+            "compare_batch_prompt": "{% for pair in pairs %}{{ pair.input1.name }} {{ pair.input2.name }} {% endfor %}",
+            "resolution_prompt": "{{ inputs }}",
+            "output": {"schema": {"name": "str"}},
+        },
+        "gpt-4o-mini",
+        2,
+    )
+    matches, cost, prompts = op.compare_batch(
+        op.config["comparison_prompt"],
+        op.config["compare_batch_prompt"],
+        "gpt-4o-mini",
+        [
+            ({"name": "Apple"}, {"name": "apple"}),
+            ({"name": "apple"}, {"name": "avocado"}),
+            ({"name": "apple"}, {"name": "kiwi"}),
+        ],
+        blocking_keys=["name"],
+    )
+
+    assert matches == [True, True, False]
+    assert api.calls == ["batch compare"]
+    assert prompts[0] == "" and prompts[1] == prompts[2] == "apple avocado apple kiwi "
+
+
+def test_resolve_rejects_batch_prompt_without_pairs():
+    with pytest.raises(ValueError):
+        ResolveOperation(
+            MockRunner(MockAPI()),
+            {
+                "name": "resolve_names",
+                "type": "resolve",
+                "comparison_prompt": "{{ input1.name }} {{ input2.name }}",
+                "compare_batch_prompt": "{{ input1.name }}",
+                "resolution_prompt": "{{ inputs }}",
+                "output": {"schema": {"name": "str"}},
+            },
+            "gpt-4o-mini",
+            2,
+        )
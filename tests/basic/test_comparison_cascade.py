@@ -0,0 +1,106 @@
+import random
+
+import pytest
+
+from docetl.operations.equijoin import EquijoinOperation
+from docetl.operations.utils import ComparisonCascade
+from tests.basic.test_compare_batch import MockAPI, MockRunner
+
+
+def test_cascade_calibrates_similarity_thresholds():
+    random.seed(0)
+    # Each pair is just its similarity score; pairs above 0.5 match
+    pairs = [i / 100 for i in range(100)]
+    calls = []
+
+    def compare(pair, model):
+        calls.append(model)
+        return pair >= 0.5, 1.0
+
+    cascade = ComparisonCascade({"sample_size": 100})
+    labels, cost = cascade.calibrate(pairs, lambda pair: pair, compare, "big", 4)
+
+    assert cost == 100.0 and calls == ["big"] * 100
+    assert labels == {i: pairs[i] >= 0.5 for i in range(100)}
+    assert cascade.decide_by_score(0.1) is False
+    assert cascade.decide_by_score(0.9) is True
+    assert cascade.compare(0.95, 0.95, compare, "big") == (True, 0.0)
+    assert len(calls) == 100
+
+
+def test_cascade_never_auto_accepts_high_scoring_non_matches():
+    # Matches score below 0.9; the single highest-scoring pair is a non-match
+    pairs = [0.85] * 10 + [0.89] * 30 + [0.97]
+
+    def compare(pair, model):
+        return pair < 0.9, 1.0
+
+    cascade = ComparisonCascade({"sample_size": len(pairs)})
+    cascade.calibrate(pairs, lambda pair: pair, compare, "big", 4)
+
+    assert cascade.decide_by_score(0.97) is not True
+
+
+def test_cascade_trusts_cheap_model_only_in_calibrated_direction():
+    # Identical scores leave every pair uncertain, so the cheap model decides
+    pairs = list(range(20))
+
+    def compare(pair, model):
+        is_match = pair % 2 == 0
+        if model == "cheap":
+            # The cheap model misses some matches but never invents one
+            return is_match and pair % 4 == 0, 0.1
+        return is_match, 1.0
+
+    cascade = ComparisonCascade({"cheap_model": "cheap", "sample_size": 20})
+    cascade.calibrate(pairs, lambda pair: 0.5, compare, "big", 4)
+
+    assert cascade.trust_cheap_match and not cascade.trust_cheap_non_match
+    assert cascade.compare(4, 0.5, compare, "big") == (True, 0.1)
+    assert cascade.compare(2, 0.5, compare, "big") == (True, 1.1)
+    assert cascade.stage_counts == {"cheap_model": 1, "comparison_model": 1}
+
+
+def test_equijoin_cascade_reuses_calibration_labels():
+    api = MockAPI()
+    op = EquijoinOperation(
+        MockRunner(api),
+        {
+            "name": "join_names",
+            "type": "equijoin",
+            "left": "left",
+            "right": "right",
+            "comparison_prompt": "{{ left.name }} {{ right.name }}",
+            "blocking_conditions": ["True"],
+            "cascade": {"sample_size": 100},
+        },
+        "gpt-4o-mini",
+        2,
+    )
+    results, cost = op.execute(
+        [{"name": "apple"}, {"name": "banana"}],
+        [{"name": "avocado"}, {"name": "blueberry"}, {"name": "cherry"}],
+    )
+
+    # Every pair fits in the calibration sample, so each is compared exactly once
+    assert api.calls == ["compare"] * 6
+    assert cost == 6.0
+    assert sorted((r["name_left"], r["name_right"]) for r in results) == [
+        ("apple", "avocado"),
+        ("banana", "blueberry"),
+    ]
+
+
+def test_cascade_config_is_validated():
+    with pytest.raises(ValueError):
+        EquijoinOperation(
+            MockRunner(MockAPI()),
+            {
+                "name": "join_names",
+                "type": "equijoin",
+                "comparison_prompt": "{{ left.name }} {{ right.name }}",
+                "cascade": {"similarity": "edit_distance"},
+            },
+            "gpt-4o-mini",
+            2,
+        )
@@ -0,0 +1,40 @@
+from docetl.operations.equijoin import EquijoinOperation, stratified_length_sample
+from tests.basic.test_compare_batch import MockAPI, MockRunner
+
+
+def test_stratified_length_sample_keeps_longest_matches_per_group():
+    # Right items are longer, so pairs are grouped by right item
+    left_lengths = [1, 5, 3, 5]
+    right_lengths = [10, 20]
+    pairs = [(0, 0), (1, 0), (2, 0), (3, 0), (0, 1), (2, 1)]
+    iterations = []
+
+    def blocked_pairs():
+        iterations.append(1)
+        return iter(pairs)
+
+    sample = stratified_length_sample(blocked_pairs, 3, left_lengths, right_lengths)
+
+    assert len(iterations) == 2
+    assert sample == [(1, 0), (3, 0), (2, 1)]
+
+
+def test_equijoin_samples_cross_product_without_blocking():
+    api = MockAPI()
+    op = EquijoinOperation(
+        MockRunner(api),
+        {
+            "name": "join_names",
+            "type": "equijoin",
+            "comparison_prompt": "{{ left.name }} {{ right.name }}",
+            "limit_comparisons": 4,
+        },
+        "gpt-4o-mini",
+        2,
+    )
+    op.execute(
+        [{"name": "apple"}, {"name": "banana"}, {"name": "cherry"}],
+        [{"name": "avocado"}, {"name": "blueberry"}, {"name": "kiwi"}],
+    )
+
+    assert api.calls == ["compare"] * 4
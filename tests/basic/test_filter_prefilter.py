@@ -0,0 +1,95 @@
+import threading
+
+import pytest
+
+from docetl.operations.filter import FilterOperation
+from docetl.operations.utils import LLMResult
+
+TOPICS = {"cats": [1.0, 0.0], "dogs": [0.8, 0.6], "tax": [0.0, 1.0]}
+
+
+class MockAPI:
+    """Keeps items with an even number, and embeds topics as fixed vectors"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.prompts = []
+
+    def call_llm(self, model, op_type, messages, output_schema, **kwargs):
+        with self.lock:
+            self.prompts.append(messages[0]["content"])
+        number = int(messages[0]["content"].split()[-1])
+        return LLMResult(
+            response={"keep": number % 2 == 0}, total_cost=1.0, validated=True
+        )
+
+    def gen_embedding(self, model, input):
+        return {"data": [{"embedding": TOPICS[text]} for text in input]}
+
+
+class RateLimiter:
+    def try_acquire(self, *args, **kwargs):
+        pass
+
+
+class MockRunner:
+    def __init__(self):
+        self.config = {}
+        self.rate_limiter = RateLimiter()
+        self.api = MockAPI()
+
+
+def make_filter(runner, **config):
+    return FilterOperation(
+        runner,
+        {
+            "name": "even",
+            "type": "filter",
+            "prompt": "Is this even? {{ input.number }}",
+            "output": {"schema": {"keep": "bool"}},
+            **config,
+        },
+        "gpt-4o-mini",
+        4,
+    )
+
+
+DOCS = [{"number": i, "topic": topic} for i, topic in enumerate(list(TOPICS) * 2)]
+
+
+def test_code_prefilter_skips_llm_calls():
+    runner = MockRunner()
+    code = "def transform(doc):\n    return doc['number'] < 4\n"
+    results, cost = make_filter(runner, prefilter={"code": code}).execute(DOCS)
+
+    assert [r["number"] for r in results] == [0, 2]
+    assert all(r["keep"] for r in results)
+    # Only the four items that passed the prefilter reached the LLM
+    assert len(runner.api.prompts) == 4
+    assert cost == 4.0
+
+
+def test_embedding_prefilter_keeps_similar_items():
+    runner = MockRunner()
+    prefilter = {"query": "cats", "threshold": 0.7, "embedding_keys": ["topic"]}
+    results, _ = make_filter(runner, prefilter=prefilter).execute(DOCS)
+
+    # cats and dogs pass the similarity threshold; of those, even numbers pass the LLM
+    assert [(r["number"], r["topic"]) for r in results] == [(0, "cats"), (4, "dogs")]
+    assert len(runner.api.prompts) == 4
+
+
+def test_build_phase_keeps_rejected_items():
+    results, _ = make_filter(MockRunner()).execute(DOCS, is_build=True)
+
+    assert [r["keep"] for r in results] == [True, False] * 3
+    assert results[1] == {**DOCS[1], "keep": False}
+
+
+def test_invalid_prefilter():
+    with pytest.raises(ValueError, match="exactly one"):
+        make_filter(MockRunner(), prefilter={})
+    with pytest.raises(TypeError, match="threshold"):
+        make_filter(MockRunner(), prefilter={"query": "cats"})
+    with pytest.raises(ValueError, match="Invalid code"):
+        make_filter(MockRunner(), prefilter={"code": "x = 1"})
@@ -0,0 +1,75 @@
+import pytest
+
+from docetl.operations.code_operations import CodeMapOperation
+from docetl.operations.utils import load_function
+from docetl.operations.utils.code import compile_code
+
+COUNTER_CODE = """
+import itertools
+
+runs = itertools.count()
+
+def transform(doc):
+    return {"run": next(runs)}
+"""
+
+
+class MockRunner:
+    def __init__(self):
+        self.config = {}
+
+
+def test_load_function_runs_code_in_a_fresh_namespace():
+    compiled = compile_code(COUNTER_CODE, "transform")
+    first = load_function(COUNTER_CODE, "transform")
+    second = load_function(COUNTER_CODE, "transform")
+
+    # The code object is compiled once, but module-level state is not shared
+    assert compile_code(COUNTER_CODE, "transform") is compiled
+    assert first is not second
+    assert [first({})["run"], first({})["run"], second({})["run"]] == [0, 1, 0]
+
+
+def test_load_function_uses_base_globals():
+    code = "def double(x):\n    return helper(x) * 2\n"
+    base_globals = {"__name__": "tools", "helper": lambda x: x + 1}
+    assert load_function(code, "double", base_globals)(1) == 4
+    # The code's definitions don't leak into the base globals
+    assert "double" not in base_globals
+
+
+def test_load_function_errors():
+    with pytest.raises(ValueError, match="must define a 'transform'"):
+        load_function("x = 1", "transform")
+    with pytest.raises(ValueError, match="must be a callable"):
+        load_function("transform = 1", "transform")
+    with pytest.raises(SyntaxError):
+        load_function("def transform(:", "transform")
+
+
+def test_code_map_state_does_not_carry_over_between_runs():
+    operation = CodeMapOperation(
+        MockRunner(),
+        {
+            "name": "runs",
+            "type": "code_map",
+            "code": COUNTER_CODE,
+            "concurrent_thread_count": 1,
+        },
+        "gpt-4o-mini",
+        4,
+    )
+    first, cost = operation.execute([{}, {}])
+    second, _ = operation.execute([{}, {}])
+
+    assert [result["run"] for result in first] == [0, 1]
+    assert [result["run"] for result in second] == [0, 1]
+    assert cost == 0.0
+
+    with pytest.raises(ValueError, match="Invalid code configuration"):
+        CodeMapOperation(
+            MockRunner(),
+            {"name": "broken", "type": "code_map", "code": "x = 1"},
+            "gpt-4o-mini",
+            4,
+        )
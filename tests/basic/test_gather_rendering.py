@@ -0,0 +1,91 @@
+import time
+
+from docetl.operations.gather import GatherOperation
+
+
+def make_gather(peripheral_chunks, **config):
+    return GatherOperation(
+        None,
+        {
+            "name": "gather",
+            "type": "gather",
+            "content_key": "text",
+            "doc_id_key": "doc",
+            "order_key": "order",
+            "doc_header_key": "headers",
+            "peripheral_chunks": peripheral_chunks,
+            **config,
+        },
+        "gpt-4o-mini",
+        4,
+    )
+
+
+def chunk(order, text, headers=()):
+    return {
+        "doc": 0,
+        "order": order,
+        "text": text,
+        "summary": f"summary {order}",
+        "headers": [{"header": header, "level": level} for header, level in headers],
+    }
+
+
+def test_gather_renders_context_and_headers():
+    chunks = [
+        chunk(0, "intro", [("Title", 1)]),
+        chunk(1, "aaaa", [("Part", 2)]),
+        chunk(2, "bbbbbb"),
+        chunk(3, "cc"),
+        chunk(4, "end", [("Appendix", 1)]),
+    ]
+    operation = make_gather(
+        {
+            "previous": {"head": {"count": 1}, "tail": {"count": 1}},
+            "next": {"head": {"count": 1, "content_key": "summary"}},
+        }
+    )
+    results, cost = operation.execute(list(reversed(chunks)))
+
+    assert [r["order"] for r in results] == [0, 1, 2, 3, 4]
+    assert results[3]["text_rendered"] == "\n".join(
+        [
+            "--- Previous Context ---",
+            "[Chunk 0]",
+            "intro",
+            "[... 4 characters skipped ...]",
+            "[Chunk 2]",
+            "bbbbbb",
+            "--- End Previous Context ---\n",
+            "_Current Section:_ # Title > ## Part",
+            "--- Begin Main Chunk ---",
+            "cc",
+            "--- End Main Chunk ---",
+            "\n--- Next Context ---",
+            "[Chunk 4 (Summary)]",
+            "summary 4",
+            "--- End Next Context ---",
+        ]
+    )
+    # A new top-level header clears the lower levels
+    assert "Part" not in results[4]["text_rendered"]
+    assert cost == 0.0
+
+
+def test_gather_scales_linearly_with_document_length():
+    chunks = [
+        chunk(i, "word " * 50, [(f"Section {i}", 1 + i % 3)]) for i in range(5000)
+    ]
+    operation = make_gather(
+        {
+            "previous": {"head": {"count": 1}, "tail": {"count": 2}},
+            "next": {"head": {"count": 2}},
+        }
+    )
+
+    start = time.time()
+    results, _ = operation.execute(chunks)
+
+    assert len(results) == 5000
+    assert "[... 1249000 characters skipped ...]" in results[-1]["text_rendered"]
+    assert time.time() - start < 5
@@ -0,0 +1,37 @@
+from docetl.operations.code_operations import CodeReduceOperation
+from docetl.operations.utils import group_items
+
+
+class MockRunner:
+    def __init__(self):
+        self.config = {}
+        self.console = None
+
+
+def rows():
+    return [
+        {"user": f"u{i % 7}", "tags": ["b", "a"] if i % 2 else ["a", "b"], "n": i}
+        for i in range(100)
+    ]
+
+
+def test_group_items_keeps_first_appearance_order():
+    groups = group_items(rows(), ["user", "tags"])
+
+    # List values are grouped as sorted tuples, so ["a", "b"] == ["b", "a"]
+    assert [key for key, _ in groups] == [(f"u{i}", ("a", "b")) for i in range(7)]
+    assert [item["n"] for item in groups[3][1]] == list(range(3, 100, 7))
+
+
+def test_code_reduce_groups_by_list_valued_keys():
+    config = {
+        "name": "sum_by_tags",
+        "type": "code_reduce",
+        "reduce_key": "tags",
+        "code": "def transform(items):\n    return {'total': sum(i['n'] for i in items)}",
+    }
+    results, _ = CodeReduceOperation(MockRunner(), config, "gpt-4o-mini", 4).execute(
+        rows()
+    )
+
+    assert [result["total"] for result in results] == [sum(range(100))]
@@ -0,0 +1,148 @@
+from docetl.operations import link_resolve as link_resolve_module
+from docetl.operations.link_resolve import LinkResolveOperation
+from docetl.operations.utils import LLMResult
+
+EMBEDDINGS = {
+    "Rudder": [1.0, 0.0],
+    "Rudder angle": [0.9, 0.44],
+    "Sheet (sailing)": [0.0, 1.0],
+    "rudder": [0.99, 0.1],
+    "sheet": [0.1, 0.99],
+}
+
+
+class MockAPI:
+    """Says a link matches any title that contains it"""
+
+    def __init__(self):
+        self.compared = []
+
+    def gen_embedding(self, model, input):
+        return {"data": [{"embedding": EMBEDDINGS[text]} for text in input]}
+
+    def call_llm(self, model, op_type, messages, output_schema, **kwargs):
+        link_value, id_value = messages[0]["content"].split("|")
+        self.compared.append((link_value, id_value))
+        return LLMResult(
+            response=link_value.lower() in id_value.lower(),
+            total_cost=1.0,
+            validated=True,
+        )
+
+    def parse_llm_response(self, response, schema=None, **kwargs):
+        return [{"is_same": response}]
+
+
+class MockRunner:
+    """A simple mock runner for testing"""
+
+    def __init__(self):
+        self.config = {}
+        self.console = None
+        self.api = MockAPI()
+
+
+def test_link_resolve_stops_at_most_similar_match():
+    runner = MockRunner()
+    op = LinkResolveOperation(
+        runner,
+        {
+            "name": "fix_links",
+            "type": "link_resolve",
+            "id_key": "title",
+            "link_key": "related_to",
+            "blocking_threshold": 0.5,
+            "comparison_prompt": "{{ link_value }}|{{ id_value }}",
+        },
+        "gpt-4o-mini",
+        2,
+    )
+    input_data = [
+        {"title": "Rudder", "related_to": ["rudder"]},
+        {"title": "Rudder angle", "related_to": ["rudder", "sheet"]},
+        {"title": "Sheet (sailing)", "related_to": []},
+    ]
+    results, cost = op.execute(input_data)
+
+    # "Rudder angle" is a candidate for both links, but each link stops after
+    # its most similar candidate matches
+    assert sorted(runner.api.compared) == [
+        ("rudder", "Rudder"),
+        ("sheet", "Sheet (sailing)"),
+    ]
+    assert cost == 2.0
+    assert [item["related_to"] for item in results] == [
+        ["Rudder"],
+        ["Rudder", "Sheet (sailing)"],
+        [],
+    ]
+
+
+class CalibratedCascade:
+    """Labels the first candidate as a match during calibration"""
+
+    similarity = "embedding"
+
+    def __init__(self, config, console):
+        pass
+
+    def calibrate(self, positions, score, compare, model, max_threads):
+        return {0: True}, 0.0
+
+    def compare(self, candidate, score, compare, model):
+        return compare(candidate, model)
+
+    def log_summary(self):
+        pass
+
+
+class RecordingBar:
+    """Records the progress bar's total and how far it got"""
+
+    bars = []
+
+    def __init__(self, total, desc, console):
+        self.total, self.n = total, 0
+        self.bars.append(self)
+
+    def update(self, n=1):
+        self.n += n
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+def test_link_resolve_progress_completes_after_calibration(monkeypatch):
+    monkeypatch.setattr(link_resolve_module, "ComparisonCascade", CalibratedCascade)
+    monkeypatch.setattr(link_resolve_module, "RichLoopBar", RecordingBar)
+    RecordingBar.bars = []
+    runner = MockRunner()
+    op = LinkResolveOperation(
+        runner,
+        {
+            "name": "fix_links",
+            "type": "link_resolve",
+            "id_key": "title",
+            "link_key": "related_to",
+            "blocking_threshold": 0.5,
+            "comparison_prompt": "{{ link_value }}|{{ id_value }}",
+            "cascade": {"sample_size": 1},
+        },
+        "gpt-4o-mini",
+        2,
+    )
+    op.execute(
+        [
+            {"title": "Rudder", "related_to": ["rudder"]},
+            {"title": "Rudder angle", "related_to": ["rudder", "sheet"]},
+            {"title": "Sheet (sailing)", "related_to": []},
+        ]
+    )
+
+    # One link was resolved by calibration; the other finds its match first
+    (bar,) = RecordingBar.bars
+    assert bar.n == bar.total == 2
+    assert len(runner.api.compared) == 1
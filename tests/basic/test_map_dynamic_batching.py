@@ -0,0 +1,55 @@
+import pytest
+
+from docetl.operations import map as map_module
+from docetl.operations.map import MapOperation
+
+
+@pytest.fixture(autouse=True)
+def count_words(monkeypatch):
+    # Count whitespace-separated words as tokens
+    monkeypatch.setattr(
+        map_module, "count_tokens", lambda text, model: len(text.split())
+    )
+
+
+def make_map(**config):
+    return MapOperation(
+        None,
+        {
+            "name": "classify",
+            "type": "map",
+            "prompt": "Classify {{ input.text }}",
+            "batch_prompt": "Classify each: {% for input in inputs %}{{ input.text }}{% endfor %}",
+            "dynamic_batching": True,
+            "output": {"schema": {"category": "str"}},
+            **config,
+        },
+        "gpt-4o-mini",
+        4,
+    )
+
+
+def test_dynamic_batching_packs_documents_up_to_budget():
+    # Each document counts as n + 2 tokens
+    docs = [{"text": "word " * n} for n in [9, 9, 9, 99, 9, 9]]
+    op = make_map(batch_token_budget=33)
+
+    # The long document doesn't fit with anything else and gets its own batch
+    assert op._token_budget_batch_bounds(docs) == [(0, 3), (3, 4), (4, 6)]
+
+
+def test_dynamic_batching_respects_max_batch_size():
+    docs = [{"text": "short"} for _ in range(5)]
+    op = make_map(batch_token_budget=10_000, max_batch_size=2)
+
+    assert op._token_budget_batch_bounds(docs) == [(0, 2), (2, 4), (4, 5)]
+
+
+def test_dynamic_batching_defaults_to_model_context():
+    docs = [{"text": "word " * 9}] * 20_000
+    op = make_map()
+
+    # 80% of gpt-4o-mini's 128k input tokens, minus the 12-token batch prompt,
+    # fits 9308 of these 11-token documents
+    bounds = op._token_budget_batch_bounds(docs)
+    assert [end - start for start, end in bounds] == [9308, 9308, 1384]
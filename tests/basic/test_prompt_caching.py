@@ -0,0 +1,159 @@
+import pytest
+from litellm import ModelResponse
+
+import docetl.operations.utils.api as api_module
+from docetl.operations.link_resolve import LinkResolveOperation
+from docetl.operations.map import MapOperation
+from docetl.operations.utils import APIWrapper, LLMResult, split_prompt_message
+
+TEMPLATE = "Classify the sentiment of this review.\n\nReview: {{ input.text }}"
+
+
+class Runner:
+    def __init__(self, config):
+        self.config = config
+        self.api = APIWrapper(self)
+
+
+@pytest.fixture(autouse=True)
+def no_truncation(monkeypatch):
+    # Prompts are short; skip tokenizing them for truncation
+    monkeypatch.setattr(api_module, "truncate_messages", lambda messages, _: messages)
+
+
+def test_split_prompt_message_marks_static_prefix():
+    message = split_prompt_message(
+        TEMPLATE, "Classify the sentiment of this review.\n\nReview: great"
+    )
+    assert message["content"] == [
+        {
+            "type": "text",
+            "text": "Classify the sentiment of this review.\n\nReview: ",
+            "cache_control": {"type": "ephemeral"},
+        },
+        {"type": "text", "text": "great"},
+    ]
+    # Without static text before the first variable, there is nothing to cache
+    assert split_prompt_message("{{ input.text }} is it good?", "ok is it good?") == {
+        "role": "user",
+        "content": "ok is it good?",
+    }
+
+
+def test_operations_split_prompts_only_with_prompt_caching():
+    config = {
+        "name": "sentiment",
+        "type": "map",
+        "prompt": TEMPLATE,
+        "output": {"schema": {"sentiment": "str"}},
+    }
+    prompt = "Classify the sentiment of this review.\n\nReview: great"
+    op = MapOperation(Runner({}), config, "gpt-4o-mini", 4)
+    assert op.prompt_message(TEMPLATE, prompt) == {"role": "user", "content": prompt}
+
+    op = MapOperation(Runner({"prompt_caching": True}), config, "gpt-4o-mini", 4)
+    assert isinstance(op.prompt_message(TEMPLATE, prompt)["content"], list)
+
+
+def test_link_resolve_splits_comparison_prompt_with_prompt_caching(monkeypatch):
+    runner = Runner({"prompt_caching": True})
+    sent = []
+
+    def call_llm(model, op_type, messages, output_schema, **kwargs):
+        sent.append(messages)
+        return LLMResult(response=True, total_cost=0.0, validated=True)
+
+    monkeypatch.setattr(runner.api, "call_llm", call_llm)
+    monkeypatch.setattr(
+        runner.api,
+        "parse_llm_response",
+        lambda response, **kwargs: [{"is_same": response}],
+    )
+    monkeypatch.setattr(
+        runner.api,
+        "gen_embedding",
+        lambda model, input: {
+            "data": [{"embedding": [float("udder" in text), 1.0]} for text in input]
+        },
+    )
+    config = {
+        "name": "fix_links",
+        "type": "link_resolve",
+        "id_key": "title",
+        "link_key": "related_to",
+        "blocking_threshold": 0.5,
+        "comparison_prompt": "Do these name the same thing?\n{{ link_value }} / {{ id_value }}",
+    }
+    op = LinkResolveOperation(runner, config, "gpt-4o-mini", 4)
+    results, _ = op.execute(
+        [
+            {"title": "Rudder", "related_to": []},
+            {"title": "Sheet", "related_to": ["rudder"]},
+        ]
+    )
+    assert results[1]["related_to"] == ["Rudder"]
+
+    assert sent[0][0]["content"] == [
+        {
+            "type": "text",
+            "text": "Do these name the same thing?\n",
+            "cache_control": {"type": "ephemeral"},
+        },
+        {"type": "text", "text": "rudder / Rudder"},
+    ]
+
+
+def completion_request(api, model, text, scratchpad):
+    return api.completion_request(
+        model,
+        "reduce",
+        [
+            split_prompt_message(
+                TEMPLATE, f"Classify the sentiment of this review.\n\nReview: {text}"
+            )
+        ],
+        {"sentiment": "str"},
+        scratchpad=scratchpad,
+    )
+
+
+def test_claude_requests_share_a_cached_system_prompt():
+    api = Runner({"prompt_caching": True}).api
+    first = completion_request(api, "anthropic/claude-3-5-haiku", "great", "a: 1")
+    second = completion_request(api, "anthropic/claude-3-5-haiku", "bad", "a: 2")
+
+    assert first["messages"][0] == second["messages"][0]
+    assert first["messages"][0]["content"][0]["cache_control"] == {"type": "ephemeral"}
+    assert first["messages"][1]["content"][0] == second["messages"][1]["content"][0]
+    # The per-call scratchpad goes after the data
+    assert first["messages"][-1] == {
+        "role": "user",
+        "content": "Current scratchpad: a: 1",
+    }
+
+
+def test_openai_requests_get_plain_text_and_a_prompt_cache_key():
+    api = Runner({"prompt_caching": True}).api
+    first = completion_request(api, "gpt-4o-mini", "great", None)
+    second = completion_request(api, "gpt-4o-mini", "bad", None)
+
+    assert first["messages"][1]["content"] == (
+        "Classify the sentiment of this review.\n\nReview: great"
+    )
+    assert first["prompt_cache_key"] == second["prompt_cache_key"]
+
+
+def test_record_usage_counts_cached_input_tokens():
+    api = Runner({}).api
+    response = ModelResponse(
+        usage={
+            "prompt_tokens": 1200,
+            "completion_tokens": 10,
+            "total_tokens": 1210,
+            "prompt_tokens_details": {"cached_tokens": 1024},
+        }
+    )
+    api.record_usage(response)
+    api.record_usage(response)
+
+    assert api.prompt_token_usage == {"input": 2400, "cached": 2048}
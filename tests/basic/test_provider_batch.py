@@ -0,0 +1,228 @@
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+import docetl.operations.utils.api as api_module
+import docetl.operations.utils.batch as batch_module
+from docetl.console import DOCETL_CONSOLE
+from docetl.operations.map import MapOperation
+from docetl.operations.utils import APIWrapper
+
+
+def shout_response(request):
+    """Answers a batch request with the uppercased prompt"""
+    prompt = request["body"]["messages"][-1]["content"]
+    tool_call = {
+        "id": "call-1",
+        "type": "function",
+        "function": {
+            "name": "send_output",
+            "arguments": json.dumps({"shout": prompt.upper()}),
+        },
+    }
+    body = {
+        "id": "chatcmpl-1",
+        "object": "chat.completion",
+        "created": 0,
+        "model": request["body"]["model"],
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "tool_calls",
+                "message": {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [tool_call],
+                },
+            }
+        ],
+        "usage": {"prompt_tokens": 100, "completion_tokens": 10, "total_tokens": 110},
+    }
+    return {
+        "custom_id": request["custom_id"],
+        "response": {"status_code": 200, "body": body},
+        "error": None,
+    }
+
+
+class MockBatchServer(BaseHTTPRequestHandler):
+    """Implements the OpenAI files and batches endpoints used by batch jobs"""
+
+    files = {}
+    batches = {}
+    polls = 0
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, content_type="application/json"):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _file(self, file_id):
+        return {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(self.files[file_id]),
+            "created_at": 0,
+            "filename": f"{file_id}.jsonl",
+            "purpose": "batch",
+            "status": "processed",
+        }
+
+    def _batch(self, batch_id):
+        batch = self.batches[batch_id]
+        return {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": "/v1/chat/completions",
+            "input_file_id": batch["input_file_id"],
+            "completion_window": "24h",
+            "status": batch["status"],
+            "output_file_id": batch.get("output_file_id"),
+            "created_at": 0,
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path.endswith("/files"):
+            # Pull the JSONL payload out of the multipart upload
+            content = re.search(
+                rb'filename="[^"]*"\r\n[^\r]*\r\n\r\n(.*)\r\n--', body, re.S
+            ).group(1)
+            file_id = f"file-{len(self.files)}"
+            self.files[file_id] = content
+            self._send(self._file(file_id))
+        else:
+            batch_id = f"batch-{len(self.batches)}"
+            request = json.loads(body)
+            self.batches[batch_id] = {
+                "input_file_id": request["input_file_id"],
+                "status": "in_progress",
+            }
+            self._send(self._batch(batch_id))
+
+    def do_GET(self):
+        if self.path.endswith("/content"):
+            self._send(self.files[self.path.split("/")[-2]], "application/jsonl")
+            return
+        batch_id = self.path.split("/")[-1]
+        MockBatchServer.polls += 1
+        batch = self.batches[batch_id]
+        if batch["status"] == "in_progress":
+            # Finish on the second poll
+            batch["status"] = "completed"
+            batch["output_file_id"] = f"file-{len(self.files)}"
+            lines = []
+            for line in self.files[batch["input_file_id"]].decode().splitlines():
+                request = json.loads(line)
+                lines.append(json.dumps(shout_response(request)))
+            self.files[batch["output_file_id"]] = "\n".join(lines).encode()
+            self._send(self._batch(batch_id) | {"status": "in_progress"})
+            return
+        self._send(self._batch(batch_id))
+
+
+class RateLimiter:
+    def try_acquire(self, *args, **kwargs):
+        pass
+
+
+class Runner:
+    def __init__(self):
+        self.config = {}
+        self.console = DOCETL_CONSOLE
+        self.rate_limiter = RateLimiter()
+        self.api = APIWrapper(self)
+
+
+@pytest.fixture
+def batch_server(monkeypatch, tmp_path):
+    MockBatchServer.files, MockBatchServer.batches = {}, {}
+    MockBatchServer.polls = 0
+    server = HTTPServer(("127.0.0.1", 0), MockBatchServer)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(batch_module, "BATCH_STATE_DIR", str(tmp_path))
+    # Prompts are short; skip tokenizing them for truncation
+    monkeypatch.setattr(api_module, "truncate_messages", lambda messages, _: messages)
+
+    def no_sync_calls(**kwargs):
+        raise AssertionError("batch mode should not make synchronous calls")
+
+    monkeypatch.setattr(api_module, "completion", no_sync_calls)
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+
+
+def shout_map(api_base):
+    return {
+        "name": "shout",
+        "type": "map",
+        "prompt": "say {{ input.word }}",
+        "output": {"schema": {"shout": "str"}},
+        "bypass_cache": True,
+        "execution_mode": "batch",
+        "batch_job": {"api_base": api_base, "api_key": "test", "poll_interval": 0.01},
+    }
+
+
+def test_map_runs_through_provider_batch(batch_server, tmp_path):
+    runner = Runner()
+    op = MapOperation(runner, shout_map(batch_server), "gpt-4o-mini", 4)
+    results, cost = op.execute([{"word": "hi"}, {"word": "bye"}])
+
+    assert [r["shout"] for r in results] == ["SAY HI", "SAY BYE"]
+    assert len(MockBatchServer.batches) == 1 and MockBatchServer.polls == 2
+    assert cost > 0
+    # Finished jobs forget their state and leave no responses behind
+    assert list(tmp_path.iterdir()) == [] and runner.api.batch_results == {}
+
+
+def test_map_resumes_submitted_batch(batch_server, tmp_path, monkeypatch):
+    config = shout_map(batch_server)
+    data = [{"word": "hi"}]
+
+    # Interrupt the first run while it polls
+    def interrupt(*args):
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(batch_module.time, "sleep", interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        MapOperation(Runner(), config, "gpt-4o-mini", 4).execute(data)
+    assert len(list(tmp_path.iterdir())) == 1
+
+    monkeypatch.setattr(batch_module.time, "sleep", lambda _: None)
+    results, _ = MapOperation(Runner(), config, "gpt-4o-mini", 4).execute(data)
+
+    assert results[0]["shout"] == "SAY HI"
+    assert len(MockBatchServer.batches) == 1
+
+
+def test_execution_mode_is_validated():
+    with pytest.raises(ValueError):
+        MapOperation(
+            Runner(),
+            {**shout_map("http://localhost"), "execution_mode": "offline"},
+            "gpt-4o-mini",
+            4,
+        )
+
+
+def test_batch_mode_rejects_non_openai_models():
+    config = {**shout_map("http://localhost"), "model": "anthropic/claude-3-haiku"}
+    with pytest.raises(ValueError, match="OpenAI-compatible"):
+        MapOperation(Runner(), config, "gpt-4o-mini", 4)
+
+    # The default model is only known at run time
+    batch = batch_module.ProviderBatch(Runner(), shout_map("http://localhost"))
+    with pytest.raises(ValueError, match="anthropic/claude-3-haiku"):
+        batch.add("anthropic/claude-3-haiku", "map", [], {})
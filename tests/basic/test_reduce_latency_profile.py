@@ -0,0 +1,66 @@
+import pytest
+
+import docetl.operations.utils.latency as latency_module
+from docetl.operations.reduce import ReduceOperation
+from docetl.operations.utils import LatencyProfile
+
+
+class MockRunner:
+    def __init__(self):
+        self.config = {}
+        self.api = None
+
+
+def test_profiles_persist_percentiles_across_runs(tmp_path, monkeypatch):
+    monkeypatch.setattr(latency_module, "MAX_PROFILE_SAMPLES", 20)
+    path = str(tmp_path / "latency.json")
+
+    first_run = LatencyProfile(path)
+    for seconds in range(1, 11):
+        first_run.record("gpt-4o-mini", "fold {{ inputs }}", 10, float(seconds))
+    first_run.save()
+
+    second_run = LatencyProfile(path)
+    assert second_run.stats("gpt-4o-mini", "fold {{ inputs }}", 10) == {
+        "count": 10,
+        "p50": 5.5,
+        "p95": pytest.approx(9.55),
+    }
+    # Profiles are keyed by model, prompt and batch size
+    assert second_run.stats("gpt-4o-mini", "fold {{ inputs }}", 20) is None
+    assert second_run.stats("gpt-4o", "fold {{ inputs }}", 10) is None
+
+    # New samples are appended, keeping only the most recent ones
+    for _ in range(15):
+        second_run.record("gpt-4o-mini", "fold {{ inputs }}", 10, 100.0)
+    second_run.save()
+    stats = LatencyProfile(path).stats("gpt-4o-mini", "fold {{ inputs }}", 10)
+    assert stats["count"] == 20 and stats["p50"] == 100.0
+
+
+def test_reduce_starts_from_persisted_latencies(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        latency_module, "LATENCY_PROFILE_PATH", str(tmp_path / "latency.json")
+    )
+    config = {
+        "name": "summarize",
+        "type": "reduce",
+        "reduce_key": "group",
+        "prompt": "{{ inputs }}",
+        "fold_prompt": "{{ output }} {{ inputs }}",
+        "fold_batch_size": 4,
+        "merge_prompt": "{{ outputs }}",
+        "merge_batch_size": 2,
+        "output": {"schema": {"summary": "str"}},
+    }
+    op = ReduceOperation(MockRunner(), config, "gpt-4o-mini", 4)
+    assert op.get_fold_time() == (1.0, True)
+
+    for _ in range(op.min_samples):
+        op._update_fold_time(3.0)
+        op._update_merge_time(0.5)
+    op.latency_profile.save()
+
+    next_run = ReduceOperation(MockRunner(), config, "gpt-4o-mini", 4)
+    assert next_run.get_fold_time() == (3.0, False)
+    assert next_run.get_merge_time() == (0.5, False)
@@ -0,0 +1,72 @@
+import random
+import threading
+import time
+
+import pytest
+
+from docetl.operations.reduce import ReduceOperation
+from docetl.operations.utils import LLMResult
+
+
+class MockAPI:
+    """Echoes the rendered prompt, after a random delay so calls finish out of order"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = []
+
+    def call_llm(self, model, op_type, messages, output_schema, **kwargs):
+        with self.lock:
+            self.calls.append(op_type)
+        time.sleep(random.uniform(0, 0.01))
+        return LLMResult(
+            response=messages[0]["content"], total_cost=1.0, validated=True
+        )
+
+    def parse_llm_response(self, response, schema=None, **kwargs):
+        return [{"text": response}]
+
+
+class MockRunner:
+    def __init__(self):
+        self.config = {}
+        self.api = MockAPI()
+
+
+def ordered_reduce(runner, **overrides):
+    config = {
+        "name": "concat",
+        "type": "reduce",
+        "reduce_key": "group",
+        "prompt": "{% for input in inputs %}{{ input.letter }}{% endfor %}",
+        "merge_prompt": "{% for output in outputs %}{{ output.text }}{% endfor %}",
+        "output": {"schema": {"text": "str"}},
+        "ordered_merge": True,
+        "fold_batch_size": 2,
+        "merge_batch_size": 2,
+        **overrides,
+    }
+    config = {key: value for key, value in config.items() if value is not None}
+    return ReduceOperation(runner, config, "gpt-4o-mini", 8)
+
+
+def test_ordered_merge_preserves_sequence():
+    random.seed(0)
+    runner = MockRunner()
+    letters = "abcdefghijklm"
+    results, cost = ordered_reduce(runner).execute(
+        [{"group": 1, "letter": letter} for letter in letters]
+    )
+
+    assert results[0]["text"] == letters
+    # 7 batch reductions, then 3 + 2 + 1 merges of adjacent results
+    assert runner.api.calls == ["reduce"] * 7 + ["merge"] * 6
+    assert cost == 13.0
+
+
+def test_ordered_merge_requires_merge_prompt():
+    with pytest.raises(ValueError):
+        ordered_reduce(MockRunner(), merge_prompt=None)
+
+    with pytest.raises(ValueError):
+        ordered_reduce(MockRunner(), merge_batch_size=1)
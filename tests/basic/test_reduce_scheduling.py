@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+
+import docetl.operations.utils.latency as latency_module
+from docetl.operations.reduce import ReduceOperation
+from docetl.operations.utils import LLMResult
+
+
+class MockAPI:
+    """Records the order of calls and the peak number of concurrent calls"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.prompts = []
+        self.active = 0
+        self.peak = 0
+
+    def call_llm(self, model, op_type, messages, output_schema, **kwargs):
+        with self.lock:
+            self.prompts.append(messages[0]["content"])
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.01)
+        with self.lock:
+            self.active -= 1
+        return LLMResult(response="done", total_cost=1.0, validated=True)
+
+    def parse_llm_response(self, response, schema=None, **kwargs):
+        return [{"text": response}]
+
+
+class MockRunner:
+    def __init__(self):
+        self.config = {}
+        self.api = MockAPI()
+
+
+@pytest.fixture(autouse=True)
+def latency_profiles(tmp_path, monkeypatch):
+    # Start every test without latencies persisted by earlier runs
+    monkeypatch.setattr(
+        latency_module, "LATENCY_PROFILE_PATH", str(tmp_path / "latency.json")
+    )
+
+
+def reduce_op(runner, max_threads, **overrides):
+    config = {
+        "name": "summarize",
+        "type": "reduce",
+        "reduce_key": "group",
+        "prompt": "{{ inputs[0].group }}: {{ inputs | length }}",
+        "output": {"schema": {"text": "str"}},
+        **overrides,
+    }
+    return ReduceOperation(runner, config, "gpt-4o-mini", max_threads)
+
+
+def test_largest_groups_start_first():
+    runner = MockRunner()
+    data = [{"group": "small"}] + [{"group": "large"}] * 5 + [{"group": "mid"}] * 2
+    results, _ = reduce_op(runner, 1).execute(data)
+
+    assert runner.api.prompts == ["large: 5", "mid: 2", "small: 1"]
+    assert len(results) == 3
+
+
+def test_fold_and_merge_calls_share_one_bounded_pool():
+    runner = MockRunner()
+    op = reduce_op(
+        runner,
+        2,
+        fold_prompt="{{ output.text }} {{ inputs | length }}",
+        fold_batch_size=2,
+        merge_prompt="{{ outputs | length }}",
+        merge_batch_size=2,
+    )
+    data = [{"group": group} for group in "abcd" for _ in range(8)]
+    results, _ = op.execute(data)
+
+    assert len(results) == 4
+    # Every group folds in parallel, but no more calls than the pool size run at once
+    assert runner.api.peak == 2
@@ -0,0 +1,87 @@
+from docetl.operations.reduce import ReduceOperation
+from docetl.operations.utils import LLMResult
+
+
+class MockAPI:
+    """Embeds texts as [1, n] for the number n in them, and echoes reduce prompts"""
+
+    def __init__(self):
+        self.embedded = []
+
+    def gen_embedding(self, model, input):
+        self.embedded.append(list(input))
+        vectors = [[1.0, float(text.split()[-1])] for text in input]
+        return {"data": [{"embedding": vector} for vector in vectors]}
+
+    def call_llm(self, model, op_type, messages, output_schema, **kwargs):
+        return LLMResult(
+            response=messages[0]["content"], total_cost=0.0, validated=True
+        )
+
+    def parse_llm_response(self, response, schema=None, **kwargs):
+        return [{"values": response}]
+
+
+class MockRunner:
+    def __init__(self):
+        self.config = {}
+        self.api = MockAPI()
+
+
+def sampled_reduce(runner, method):
+    config = {
+        "name": "sampled",
+        "type": "reduce",
+        "reduce_key": ["group"],
+        "prompt": "{% for input in inputs %}{{ input.value }} {% endfor %}",
+        "output": {"schema": {"values": "str"}},
+        "value_sampling": {
+            "enabled": True,
+            "method": method,
+            "sample_size": 3,
+            "embedding_model": "text-embedding-3-small",
+            "embedding_keys": ["value"],
+            "query_text": "query {{ reduce_key.group }}",
+        },
+    }
+    return ReduceOperation(runner, config, "gpt-4o-mini", 4)
+
+
+def test_sem_sim_sampling_embeds_all_groups_in_one_pass():
+    runner = MockRunner()
+    data = (
+        [{"group": 100, "value": v} for v in [5, 90, 1, 80, 70, 2]]
+        + [{"group": 0, "value": v} for v in [6, 3, 9, 1, 0, 4]]
+        + [{"group": 7, "value": v} for v in [8, 2]]
+    )
+    results, _ = sampled_reduce(runner, "sem_sim").execute(data)
+
+    # One request for the items of both large groups, one for their queries
+    assert runner.api.embedded == [
+        [str(v) for v in [5, 90, 1, 80, 70, 2, 6, 3, 9, 1, 0, 4]],
+        ["query 100", "query 0"],
+    ]
+    values = {result["group"]: result["values"] for result in results}
+    # The closest items to each query, in their original order
+    assert values == {100: "90 80 70 ", 0: "3 1 0 ", 7: "8 2 "}
+
+
+def test_random_sampling_keeps_original_order():
+    runner = MockRunner()
+    data = [{"group": 1, "value": v} for v in range(20)]
+    results, _ = sampled_reduce(runner, "random").execute(data)
+
+    sampled = [int(v) for v in results[0]["values"].split()]
+    assert len(sampled) == 3 and sampled == sorted(sampled)
+    assert runner.api.embedded == []
+
+
+def test_sem_sim_query_texts_are_embedded_in_batches():
+    runner = MockRunner()
+    op = sampled_reduce(runner, "sem_sim")
+    groups = [((g,), [{"group": g, "value": v} for v in range(4)]) for g in range(1001)]
+    group_embeddings, _ = op._embed_for_sampling(groups, op.config["value_sampling"])
+
+    queries = [batch for batch in runner.api.embedded if batch[0].startswith("query")]
+    assert [len(batch) for batch in queries] == [1000, 1]
+    assert group_embeddings[1000][1] == [1.0, 1000.0]
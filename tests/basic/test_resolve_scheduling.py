@@ -0,0 +1,136 @@
+import pytest
+
+from docetl.operations import resolve as resolve_module
+from docetl.operations.resolve import ResolveOperation
+from docetl.operations.utils import LLMResult, UnionFind
+
+
+class MockAPI:
+    """Answers resolution calls with a fixed output"""
+
+    def call_llm(self, model, op_type, messages, output_schema, **kwargs):
+        return LLMResult(response={"name": "resolved"}, total_cost=0.0, validated=True)
+
+    def parse_llm_response(self, response, schema=None, **kwargs):
+        return [response]
+
+    def validate_output(self, operation, output, console):
+        return True
+
+
+class MockRunner:
+    """A simple mock runner for testing"""
+
+    def __init__(self):
+        self.config = {}
+        self.console = None
+        self.api = MockAPI()
+
+
+def test_union_find_tracks_transitive_merges():
+    union_find = UnionFind(5)
+    assert union_find.union(0, 1)
+    assert union_find.union(1, 2)
+    assert not union_find.union(0, 2)
+    assert union_find.connected(0, 2)
+    assert not union_find.connected(0, 3)
+    assert union_find.groups() == [{0, 1, 2}, {3}, {4}]
+
+
+@pytest.fixture
+def resolve_op():
+    return ResolveOperation(
+        MockRunner(),
+        {
+            "name": "resolve_names",
+            "type": "resolve",
+            "comparison_prompt": "Same? {{ input1.name }} {{ input2.name }}",
+            "resolution_prompt": "Resolve {{ inputs }}",
+            "output": {"schema": {"name": "str"}},
+            "blocking_keys": ["name"],
+            "blocking_conditions": ["True"],
+            "compare_batch_size": 1,
+        },
+        "gpt-4o-mini",
+        1,
+    )
+
+
+def test_resolve_skips_pairs_implied_by_transitivity(resolve_op):
+    compared = []
+
+    def compare_pair(prompt, model, item1, item2, blocking_keys, **kwargs):
+        compared.append((item1["name"], item2["name"]))
+        return item1["name"][0] == item2["name"][0], 0.0, ""
+
+    resolve_op.compare_pair = compare_pair
+    input_data = [{"name": "a1"}, {"name": "a2"}, {"name": "a3"}, {"name": "b1"}]
+    results, _ = resolve_op.execute(input_data)
+
+    # (a2, a3) is implied by (a1, a2) and (a1, a3), so it is never compared
+    assert ("a2", "a3") not in compared
+    assert len(compared) == 5
+    assert sorted(r["name"] for r in results) == ["b1"] + ["resolved"] * 3
+
+
+class SettlingCascade:
+    """Matches (a1, a2) and (a2, a3), and rejects (a1, b1), without the comparison model"""
+
+    similarity = "string"
+    decisions = {(0, 1): True, (1, 2): True, (0, 3): False}
+
+    def __init__(self, config, console):
+        pass
+
+    def calibrate(self, pairs, pair_score, compare, model, max_threads):
+        return {}, 0.0
+
+    def decide(self, pair, score, compare):
+        return self.decisions.get(pair), 0.0
+
+    def log_summary(self):
+        pass
+
+
+class RecordingBatch:
+    """Records the comparisons queued for the provider batch job"""
+
+    queued = []
+
+    def __init__(self, runner, config, console):
+        self.enabled = True
+
+    def add(self, model, op_type, messages, output_schema, **kwargs):
+        self.queued.append(messages[0]["content"])
+
+    def run(self):
+        return 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+def test_batch_mode_queues_only_pairs_the_cascade_leaves_open(resolve_op, monkeypatch):
+    monkeypatch.setattr(resolve_module, "ComparisonCascade", SettlingCascade)
+    monkeypatch.setattr(resolve_module, "ProviderBatch", RecordingBatch)
+    RecordingBatch.queued = []
+    resolve_op.config.update(
+        {"cascade": {"sample_size": 10}, "execution_mode": "batch"}
+    )
+    compared = []
+
+    def compare_pair(prompt, model, item1, item2, blocking_keys, **kwargs):
+        compared.append((item1["name"], item2["name"]))
+        return False, 0.0, ""
+
+    resolve_op.compare_pair = compare_pair
+    input_data = [{"name": "a1"}, {"name": "a2"}, {"name": "a3"}, {"name": "b1"}]
+    results, _ = resolve_op.execute(input_data)
+
+    # Pairs the cascade settled, and (a1, a3) which its matches imply, are not queued
+    assert RecordingBatch.queued == ["Same? a2 b1", "Same? a3 b1"]
+    assert compared == [("a2", "b1"), ("a3", "b1")]
+    assert sorted(r["name"] for r in results) == ["b1"] + ["resolved"] * 3
@@ -0,0 +1,141 @@
+import re
+
+import pytest
+
+from docetl.operations import split as split_module
+from docetl.operations.split import SplitOperation, split_sentences
+
+
+class WordEncoder:
+    """Treats each word, with its trailing whitespace, as one token"""
+
+    def __init__(self):
+        self.decode_calls = 0
+
+    def encode_batch(self, texts, num_threads=8):
+        return [re.findall(r"\S+\s*", text) for text in texts]
+
+    def decode_batch(self, batch, num_threads=8):
+        self.decode_calls += 1
+        return ["".join(tokens) for tokens in batch]
+
+
+class MockAPI:
+    """Embeds sentences about cats and about taxes as orthogonal vectors"""
+
+    def gen_embedding(self, model, input):
+        return {
+            "data": [
+                {"embedding": [1.0, 0.0] if "cat" in text else [0.0, 1.0]}
+                for text in input
+            ]
+        }
+
+
+class MockRunner:
+    def __init__(self):
+        self.config = {}
+        self.api = MockAPI()
+
+
+@pytest.fixture(autouse=True)
+def word_encoder(monkeypatch):
+    encoder = WordEncoder()
+    monkeypatch.setattr(split_module, "get_encoder", lambda model: encoder)
+    return encoder
+
+
+def make_split(method, drop_split_key=False, **method_kwargs):
+    return SplitOperation(
+        MockRunner(),
+        {
+            "name": "chunks",
+            "type": "split",
+            "split_key": "text",
+            "method": method,
+            "method_kwargs": method_kwargs,
+            "drop_split_key": drop_split_key,
+        },
+        "gpt-4o-mini",
+        4,
+    )
+
+
+def chunk_texts(results):
+    return [result["text_chunk"] for result in results]
+
+
+def test_token_count_with_overlap(word_encoder):
+    docs = [{"text": "a b c d e f g"}, {"text": ""}, {"text": "x y"}]
+    results, cost = make_split("token_count", num_tokens=3, overlap=1).execute(docs)
+
+    assert chunk_texts(results) == ["a b c ", "c d e ", "e f g", "x y"]
+    # The windows of all documents are decoded together
+    assert word_encoder.decode_calls == 1
+    assert [r["chunks_chunk_num"] for r in results] == [1, 2, 3, 1]
+    assert results[0]["chunks_id"] != results[-1]["chunks_id"]
+    assert cost == 0.0
+
+    # Without overlap, windows tile the document as before
+    results, _ = make_split("token_count", num_tokens=3).execute(docs[:1])
+    assert chunk_texts(results) == ["a b c ", "d e f ", "g"]
+
+
+def test_sentence_chunks_pack_whole_sentences():
+    text = "One two three. Four five! Six seven eight nine ten.\nEleven?"
+    assert split_sentences(text) == [
+        "One two three. ",
+        "Four five! ",
+        "Six seven eight nine ten.\n",
+        "Eleven?",
+    ]
+
+    results, _ = make_split("sentence", num_tokens=5).execute([{"text": text}])
+    assert chunk_texts(results) == [
+        "One two three. Four five!",
+        "Six seven eight nine ten.",
+        "Eleven?",
+    ]
+
+
+def test_semantic_chunks_break_on_topic_shifts():
+    text = "My cat sleeps. The cat purrs. Taxes are due. File them soon. A cat again."
+    results, _ = make_split("semantic", breakpoint_percentile=50).execute(
+        [{"text": text}]
+    )
+
+    assert chunk_texts(results) == [
+        "My cat sleeps. The cat purrs.",
+        "Taxes are due. File them soon.",
+        "A cat again.",
+    ]
+
+
+def test_drop_split_key():
+    results, _ = make_split("delimiter", drop_split_key=True, delimiter="\n").execute(
+        [{"text": "a\nb", "id": 1}]
+    )
+
+    assert results == [
+        {
+            "id": 1,
+            "text_chunk": "a",
+            "chunks_id": results[0]["chunks_id"],
+            "chunks_chunk_num": 1,
+        },
+        {
+            "id": 1,
+            "text_chunk": "b",
+            "chunks_id": results[0]["chunks_id"],
+            "chunks_chunk_num": 2,
+        },
+    ]
+
+
+def test_invalid_split_config():
+    with pytest.raises(ValueError, match="overlap"):
+        make_split("token_count", num_tokens=3, overlap=3)
+    with pytest.raises(ValueError, match="num_tokens"):
+        make_split("sentence")
+    with pytest.raises(ValueError, match="breakpoint_percentile"):
+        make_split("semantic", breakpoint_percentile=0)
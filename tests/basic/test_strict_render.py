@@ -0,0 +1,38 @@
+import pytest
+from jinja2.exceptions import UndefinedError
+
+from docetl.operations.map import MapOperation
+from docetl.operations.utils import compile_template, strict_render
+
+
+def test_compile_template_is_cached_by_source():
+    template = compile_template("Hello {{ input.name }}")
+    assert compile_template("Hello {{ input.name }}") is template
+    assert strict_render("Hello {{ input.name }}", {"input": {"name": "Ada"}}) == (
+        "Hello Ada"
+    )
+
+
+def test_strict_render_rejects_undefined_variables():
+    with pytest.raises(UndefinedError):
+        strict_render("Hello {{ input.missing }}", {"input": {"name": "Ada"}})
+
+
+def test_operations_precompile_prompts():
+    prompt = "Summarize {{ input.text }} in one sentence"
+    compile_template.cache_clear()
+    MapOperation(
+        None,
+        {
+            "name": "summarize",
+            "type": "map",
+            "prompt": prompt,
+            "output": {"schema": {"summary": "str"}},
+        },
+        "gpt-4o-mini",
+        4,
+    )
+
+    assert compile_template.cache_info().currsize == 1
+    compile_template(prompt)
+    assert compile_template.cache_info().hits == 1
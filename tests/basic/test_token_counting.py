@@ -0,0 +1,87 @@
+import pytest
+
+from docetl import utils as utils_module
+from docetl.operations.utils import llm as llm_module
+from docetl.operations.utils import truncate_messages
+from docetl.utils import count_tokens, get_encoder, max_token_count
+
+
+class WordEncoder:
+    """Treats each space-separated word as one token, and counts encode calls"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, text):
+        self.calls += 1
+        return text.split(" ")
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+
+@pytest.fixture
+def encoder(monkeypatch):
+    encoder = WordEncoder()
+    monkeypatch.setattr(utils_module, "get_encoder", lambda model: encoder)
+    monkeypatch.setattr(llm_module, "get_encoder", lambda model: encoder)
+    utils_module._count_tokens_cached.cache_clear()
+    yield encoder
+    utils_module._count_tokens_cached.cache_clear()
+
+
+def test_count_tokens_caches_short_texts(encoder):
+    prompt = "You are a helpful assistant"
+    assert count_tokens(prompt, "gpt-4o-mini") == 5
+    assert count_tokens(prompt, "gpt-4o-mini") == 5
+    assert encoder.calls == 1
+
+    long_text = "word " * utils_module.TOKEN_COUNT_CACHE_MAX_CHARS
+    count_tokens(long_text, "gpt-4o-mini")
+    count_tokens(long_text, "gpt-4o-mini")
+    assert encoder.calls == 3
+
+
+def test_get_encoder_loads_each_model_once(monkeypatch):
+    loaded = []
+
+    def encoding_for_model(model):
+        loaded.append(model)
+        if model != "gpt-4o":
+            raise KeyError(model)
+        return WordEncoder()
+
+    monkeypatch.setattr(utils_module.tiktoken, "encoding_for_model", encoding_for_model)
+    get_encoder.cache_clear()
+    try:
+        encoder = get_encoder("azure/gpt-4o")
+        assert get_encoder("azure/gpt-4o") is encoder
+        # Unknown models fall back to the gpt-4o encoder
+        get_encoder("claude-3-5-sonnet")
+        get_encoder("claude-3-5-sonnet")
+        assert loaded == ["gpt-4o", "claude-3-5-sonnet", "gpt-4o"]
+    finally:
+        get_encoder.cache_clear()
+
+
+def test_truncate_messages_counts_exactly_only_near_the_limit(encoder):
+    assert max_token_count("abcd" * 10) == 40
+    assert max_token_count("é") == 2
+
+    short = [{"role": "user", "content": "hello " * 1000}]
+    assert truncate_messages(short, "gpt-4o-mini") is short
+    # Even a single dense token per byte would fit in gpt-4o-mini's 128k context
+    dense = [{"role": "user", "content": "x" * 120_000}]
+    assert truncate_messages(dense, "gpt-4o-mini") is dense
+    assert encoder.calls == 0
+
+    # 300k bytes could be more tokens than the context holds, so they are
+    # counted exactly: 50k words fit without truncation
+    near = [{"role": "user", "content": "abcde " * 50_000}]
+    assert truncate_messages(near, "gpt-4o-mini") is near
+    assert encoder.calls == 1
+
+    over = [{"role": "user", "content": "a " * 200_000}]
+    truncated = truncate_messages(over, "gpt-4o-mini")
+    assert "tokens truncated" in truncated[0]["content"]
+    assert len(truncated[0]["content"].split(" ")) < 128_000
@@ -0,0 +1,32 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from docetl.operations.utils import compile_rule, safe_eval
+
+
+def test_safe_eval(capsys):
+    assert safe_eval("output['count'] > 2", {"count": 3})
+    assert not safe_eval("output['count'] > 2", {"count": 1})
+    # Missing keys, runtime errors and invalid rules fail quietly
+    assert not safe_eval("output['missing'] > 2", {"count": 3})
+    assert not safe_eval("len(output['count']) > 2", {"count": 3})
+    assert not safe_eval("output['count'] >", {"count": 3})
+    assert capsys.readouterr().err == ""
+
+
+def test_rules_are_parsed_once():
+    compile_rule.cache_clear()
+    results = [safe_eval("output['label'] == 'a'", {"label": l}) for l in "aba"]
+    assert results == [True, False, True]
+    assert compile_rule.cache_info().misses == 1
+
+
+def test_concurrent_evaluation_sees_its_own_output():
+    def check(n):
+        return all(
+            safe_eval(f"output['n'] == {n}", {"n": n})
+            and not safe_eval(f"output['n'] == {n}", {"n": n + 1})
+            for _ in range(300)
+        )
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assert all(executor.map(check, range(32)))